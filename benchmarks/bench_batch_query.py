@@ -0,0 +1,93 @@
+"""Dashboard-style batches: N separate query_news calls vs one query_news_batch
+
+    python -m benchmarks.bench_batch_query --docs 2000 --batch 8 32 --llm-latency 0.3
+
+For each batch size, answers the same N queries three ways against a NumPy
+index and an echo LLM that sleeps `--llm-latency` seconds per call:
+sequentially (one query message after another, as a dashboard does today),
+as N concurrent query_news calls, and as one query_news_batch. Reports the
+wall time for the whole batch and when the first result arrived. The answer
+cache is cleared between runs so every query goes to the LLM.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from src.answer_cache import SemanticAnswerCache
+from src.embedding import EmbeddingManager
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+from benchmarks.common import EchoLLM, print_table, synthetic_corpus, synthetic_queries, temp_directory
+
+
+async def sequential(pipeline, queries, top_k):
+    start = time.perf_counter()
+    first = None
+    for query in queries:
+        await pipeline.query_news(query, top_k)
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first
+
+
+async def concurrent(pipeline, queries, top_k):
+    start = time.perf_counter()
+    done = []
+
+    async def one(query):
+        await pipeline.query_news(query, top_k)
+        done.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(query) for query in queries))
+    return time.perf_counter() - start, min(done)
+
+
+async def batched(pipeline, queries, top_k):
+    start = time.perf_counter()
+    first = None
+    async for event in pipeline.query_news_batch(queries, top_k):
+        if event["type"] == "batch_result":
+            first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first
+
+
+async def run(args, root):
+    # No query embedding cache, so every method encodes its queries
+    embedding_manager = EmbeddingManager(args.model, cache_dir=None, query_cache_size=0)
+    store = VectorStore(persist_directory=os.path.join(root, "store"), backend="numpy")
+    docs = synthetic_corpus(args.docs)
+    store.add_documents(docs, embedding_manager.generate_embeddings([d.page_content for d in docs]))
+    pipeline = NewsPipeline(store, embedding_manager, data_directory=root, sources=[],
+                            llm_client=EchoLLM(latency=args.llm_latency),
+                            answer_cache=SemanticAnswerCache(similarity_threshold=2))
+    await pipeline.warm_up()
+    rows = []
+    for size in args.batch:
+        queries = synthetic_queries(size, seed=size)
+        for name, method in (("sequential query_news", sequential), ("concurrent query_news", concurrent),
+                             ("query_news_batch", batched)):
+            pipeline.answer_cache.invalidate()
+            total, first = await method(pipeline, queries, args.top_k)
+            rows.append({"batch": size, "method": name, "total_ms": total * 1000, "first_result_ms": first * 1000,
+                         "queries_per_s": size / total})
+    await pipeline.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    with temp_directory() as root:
+        rows = asyncio.run(run(args, root))
+    print_table(rows, title=f"{args.docs} docs, LLM latency {args.llm_latency * 1000:.0f} ms, "
+                            f"at most 4 concurrent LLM calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Prompt size with and without the token-budgeted context builder
+
+    python -m benchmarks.bench_context_builder --articles 200 --top-k 3 5 10 20
+
+Chunks synthetic articles with split_documents (1000 chars, 200 overlap) and
+simulates retrieval returning top_k chunks, a share of them neighbours from the
+same article. Reports prompt tokens for the plain join versus the packed
+context, and the time spent packing. Prompt tokens are what Groq latency and
+cost scale with, so the packed column bounds both as top_k grows.
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from langchain_core.documents import Document
+
+from src.chunking import split_documents
+from src.context_builder import ContextBuilder, estimate_tokens
+from benchmarks.common import print_table, summarize, synthetic_corpus
+
+
+def retrieve(rng, by_article, top_k, neighbour_share):
+    """top_k chunks; with probability neighbour_share the next hit continues the previous one's article"""
+    hits, last = [], None
+    while len(hits) < top_k:
+        if last is not None and rng.random() < neighbour_share and last[1] + 1 < len(by_article[last[0]]):
+            last = (last[0], last[1] + 1)
+        else:
+            article = rng.choice(list(by_article))
+            last = (article, rng.randrange(len(by_article[article])))
+        chunk = by_article[last[0]][last[1]]
+        hit = {"id": f"{last[0]}:{last[1]}", "content": chunk.page_content, "metadata": chunk.metadata}
+        if hit not in hits:
+            hits.append(hit)
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10, 20])
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--neighbour-share", type=float, default=0.5)
+    parser.add_argument("--trials", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Concatenate synthetic stories into multi-chunk articles
+    stories = [doc.page_content for doc in synthetic_corpus(args.articles * 8)]
+    articles = [Document(page_content=" ".join(stories[i * 8:(i + 1) * 8]), metadata={"source": f"article_{i}"})
+                for i in range(args.articles)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = split_documents(articles)
+    by_article = {}
+    for chunk in chunks:
+        by_article.setdefault(chunk.metadata["source"], []).append(chunk)
+
+    builder = ContextBuilder(max_tokens=args.budget)
+    rows = []
+    for top_k in args.top_k:
+        plain, packed, latencies = [], [], []
+        for _ in range(args.trials):
+            hits = retrieve(rng, by_article, top_k, args.neighbour_share)
+            plain.append(estimate_tokens("\n\n".join(hit["content"] for hit in hits)))
+            start = time.perf_counter()
+            context = builder.build("latest markets growth", hits)
+            latencies.append(time.perf_counter() - start)
+            packed.append(context.tokens)
+        rows.append({"top_k": top_k, "plain_tokens": sum(plain) / len(plain),
+                     "packed_tokens": sum(packed) / len(packed),
+                     "build_p50_ms": summarize(latencies)["p50_ms"]})
+    print_table(rows, title=f"Context tokens, budget {args.budget}, {args.neighbour_share:.0%} neighbouring hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Embedding throughput of the PyTorch, ONNX Runtime and int8 CPU backends
+
+    python -m benchmarks.bench_embedding_backends --chunks 1000 --queries 200 --threads 4
+
+Chunks are synthetic news documents encoded in batches (the ingestion path);
+queries are short strings encoded one at a time (the request path). Caches
+are disabled so every text reaches the model. Parity is the cosine similarity
+of each backend's chunk embeddings to the PyTorch ones.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.embedding import EmbeddingManager
+from src.embedding_backends import EMBEDDING_BACKENDS, cosine_parity
+from benchmarks.common import print_table, synthetic_corpus, synthetic_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--onnx-dir", default="data/onnx_models")
+    args = parser.parse_args()
+
+    chunks = [doc.page_content for doc in synthetic_corpus(args.chunks)]
+    queries = synthetic_queries(args.queries)
+    reference = None
+    rows = []
+    for backend in args.backends:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            manager = EmbeddingManager(args.model, cache_dir=None, query_cache_size=0, backend=backend,
+                                       threads=args.threads, onnx_dir=args.onnx_dir, parity_threshold=None)
+            load_seconds = time.perf_counter() - start
+            manager.model.encode(chunks[:args.batch_size], batch_size=args.batch_size)  # warm up
+
+            start = time.perf_counter()
+            embeddings = manager.model.encode(chunks, batch_size=args.batch_size)
+            chunk_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            for query in queries:
+                manager.generate_embeddings([query], is_query=True)
+            query_seconds = time.perf_counter() - start
+        if reference is None and backend == "torch":
+            reference = embeddings
+        parity = cosine_parity(embeddings, reference) if reference is not None else {}
+        rows.append({
+            "backend": backend,
+            "load_s": load_seconds,
+            "chunks_per_s": len(chunks) / chunk_seconds,
+            "queries_per_s": len(queries) / query_seconds,
+            "min_cosine": parity.get("min_cosine", float("nan")),
+            "mean_cosine": parity.get("mean_cosine", float("nan")),
+        })
+    print_table(rows, title=f"{args.model}, {args.threads or 'default'} threads, batch {args.batch_size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Pushing refresh deltas to 1k WebSocket subscribers
+
+    python -m benchmarks.bench_fanout --subscribers 1000 --distinct-queries 200 --chunks 500 --slow 10
+
+Simulated clients record when each frame arrives; `--slow` of them take
+`--slow-delay` seconds per frame. Compares NewsServer's old broadcast (one
+json.dumps per client inside a single gather, so the broadcast takes as long
+as the slowest client) with SubscriptionHub (serialized once, per-client
+bounded queues), for a plain broadcast and for a refresh delta of `--chunks`
+new chunks matched against the subscribers' saved queries (`--distinct-queries`
+different ones, shared by several subscribers each) and topics.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from src.subscriptions import CorpusDelta, SubscriptionHub
+from benchmarks.common import TOPICS, print_table, summarize, synthetic_corpus
+
+
+class SimulatedClient:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.arrivals = []
+
+    async def send(self, payload):
+        await asyncio.sleep(self.delay)
+        self.arrivals.append(time.perf_counter())
+
+
+def random_unit_vectors(n, dim, rng):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def wait_for(clients, count, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while any(len(client.arrivals) < count for client in clients) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+def delivery_row(name, clients, start, elapsed):
+    fast = [client for client in clients if not client.delay and client.arrivals]
+    stats = summarize([client.arrivals[-1] - start for client in fast])
+    return {"method": name, "call_ms": elapsed * 1000, "fast_p50_ms": stats["p50_ms"],
+            "fast_p95_ms": stats["p95_ms"], "fast_max_ms": max(c.arrivals[-1] - start for c in fast) * 1000}
+
+
+async def run(args):
+    rng = np.random.default_rng(0)
+    message = {"type": "corpus_update", "data": {"generation": 1, "added": args.chunks,
+                                                 "articles": [d.page_content for d in synthetic_corpus(20)]}}
+    rows = []
+
+    # Old NewsServer.broadcast: dumps per client, one gather for all
+    clients = [SimulatedClient(args.slow_delay if i < args.slow else 0.0) for i in range(args.subscribers)]
+    start = time.perf_counter()
+    await asyncio.gather(*[client.send(json.dumps(message)) for client in clients])
+    rows.append(delivery_row("broadcast: dumps per client + gather", clients, start, time.perf_counter() - start))
+
+    # Hub broadcast: one dumps, per-client queues
+    clients = [SimulatedClient(args.slow_delay if i < args.slow else 0.0) for i in range(args.subscribers)]
+    query_vectors = random_unit_vectors(args.distinct_queries, args.dim, rng)
+
+    async def embed(text):
+        return query_vectors[int(text.split()[-1])]
+
+    hub = SubscriptionHub(embed=embed)
+    client_ids = [hub.connect(client.send) for client in clients]
+    start = time.perf_counter()
+    hub.broadcast(message)
+    elapsed = time.perf_counter() - start
+    await wait_for([c for c in clients if not c.delay], 1)
+    rows.append(delivery_row("hub broadcast: dumps once + queues", clients, start, elapsed))
+
+    # Refresh delta: every subscriber has a saved query (shared) or a topic
+    for i, client_id in enumerate(client_ids):
+        if i % 4 == 3:
+            await hub.subscribe(client_id, topic=TOPICS[i % len(TOPICS)])
+        else:
+            await hub.subscribe(client_id, query=f"saved query {i % args.distinct_queries}", top_k=3,
+                                min_score=args.min_score)
+    docs = synthetic_corpus(args.chunks)
+    # New chunks near some of the saved queries, so a share of the subscriptions match
+    embeddings = query_vectors[rng.integers(0, args.distinct_queries, args.chunks)] \
+        + 0.5 * random_unit_vectors(args.chunks, args.dim, rng)
+    delta = CorpusDelta(2, [f"chunk_{i}" for i in range(args.chunks)], [d.page_content for d in docs],
+                        [dict(d.metadata) for d in docs], embeddings.astype(np.float32))
+    received = [len(client.arrivals) for client in clients]
+    match_start = time.perf_counter()
+    matches = hub.match(delta, list(hub.subscriptions.values()))
+    match_elapsed = time.perf_counter() - match_start
+    start = time.perf_counter()
+    await hub.publish(delta)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05)
+    fast = [c for i, c in enumerate(clients) if not c.delay and len(c.arrivals) > received[i]]
+    stats = summarize([client.arrivals[-1] - start for client in fast])
+    rows.append({"method": "hub refresh delta: match + fan-out", "call_ms": elapsed * 1000,
+                 "fast_p50_ms": stats["p50_ms"], "fast_p95_ms": stats["p95_ms"],
+                 "fast_max_ms": max(c.arrivals[-1] - start for c in fast) * 1000})
+    hub_stats = hub.stats()
+    for client_id in client_ids:
+        hub.disconnect(client_id)
+    return rows, match_elapsed, len(matches), hub_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--distinct-queries", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500, help="New chunks in the refresh delta")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--min-score", type=float, default=0.8)
+    parser.add_argument("--slow", type=int, default=10, help="Clients that are slow to receive")
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rows, match_elapsed, matched, hub_stats = asyncio.run(run(args))
+    print_table(rows, title=f"{args.subscribers} subscribers ({args.slow} taking {args.slow_delay * 1000:.0f} ms "
+                            f"per frame); latency until the fast clients have the message")
+    print(f"Matching {args.chunks} new chunks against {hub_stats['subscriptions']} subscriptions: "
+          f"{match_elapsed * 1000:.1f} ms, {matched} subscriptions matched; "
+          f"sent {hub_stats['sent']}, dropped {hub_stats['dropped']}, coalesced {hub_stats['coalesced']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""What queries see and pay while a refresh rebuilds the index
+
+    python -m benchmarks.bench_generations --files 300 --clients 4
+
+Builds a NumPy index from `--files` local news files, then runs `--clients`
+concurrent retrieval loops while refresh_news(rebuild=True) re-embeds and
+re-writes the whole index in a new generation. Reports query latency before
+and during the rebuild, and the number of chunks each query could see: with
+generations it stays at the full count until the swap, where an in-place
+rebuild would expose a partially written index. Also times begin_generation
+(a hard-link copy of the current generation) and the commit/swap.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from src.embedding import EmbeddingManager
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+from benchmarks.common import EchoLLM, Timer, print_table, summarize, synthetic_queries, temp_directory, write_corpus_files
+
+
+async def run(args, root):
+    write_corpus_files(os.path.join(root, "files"), args.files)
+    store = VectorStore(persist_directory=os.path.join(root, "store"), backend=args.backend)
+    # No document embedding cache, so the rebuild really re-embeds everything
+    embedding_manager = EmbeddingManager(args.model, cache_dir=None)
+    pipeline = NewsPipeline(store, embedding_manager, data_directory=os.path.join(root, "files"), sources=[],
+                            llm_client=EchoLLM())
+    await pipeline.refresh_news()
+    chunks = store.count()
+    queries = synthetic_queries(2000)
+
+    async def clients(stop: asyncio.Event):
+        latencies, visible = [], []
+
+        async def client(offset):
+            i = offset
+            while not stop.is_set():
+                query = queries[i % len(queries)]
+                embedding = await pipeline.query_batcher.embed(query)
+                start = time.perf_counter()
+                await pipeline.execution.run_io("vector", pipeline.retriever.search, query, embedding, top_k=5)
+                latencies.append(time.perf_counter() - start)
+                visible.append(store.snapshot().count())
+                i += args.clients
+
+        await asyncio.gather(*(client(i) for i in range(args.clients)))
+        return latencies, visible
+
+    rows = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(clients(stop))
+    await asyncio.sleep(args.idle_seconds)
+    stop.set()
+    latencies, visible = await task
+    rows.append({"phase": "idle", **summarize(latencies),
+                 "min_visible": min(visible), "max_visible": max(visible)})
+
+    stop = asyncio.Event()
+    task = asyncio.create_task(clients(stop))
+    with Timer() as rebuild:
+        await pipeline.refresh_news(rebuild=True)
+    stop.set()
+    latencies, visible = await task
+    rows.append({"phase": "during rebuild", **summarize(latencies),
+                 "min_visible": min(visible), "max_visible": max(visible)})
+
+    # The two generation operations on their own
+    with Timer() as begin:
+        store.begin_generation()
+    with Timer() as commit:
+        store.commit_generation()
+    await pipeline.close()
+    return chunks, rows, rebuild.elapsed, begin.elapsed, commit.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "partitioned"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    with temp_directory() as root:
+        chunks, rows, rebuild, begin, commit = asyncio.run(run(args, root))
+    print_table(rows, title=f"{chunks} chunks, {args.clients} query clients, rebuild took {rebuild:.1f} s")
+    print(f"begin_generation (hard-link copy): {begin * 1000:.1f} ms, commit and swap: {commit * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
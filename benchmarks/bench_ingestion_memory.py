@@ -0,0 +1,72 @@
+"""Peak RSS of a full refresh as the corpus grows
+
+    python -m benchmarks.bench_ingestion_memory --files 500 2000 8000
+
+Each corpus size is ingested by NewsPipeline.refresh_news in a fresh
+subprocess and the process's peak RSS is reported. With the streaming
+ingestion stages the peak should stay flat instead of growing with the
+number of files.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table, temp_directory, write_corpus_files
+
+
+def ingest(files: int, batch_size: int):
+    from src.embedding import EmbeddingManager
+    from src.vectorstore import VectorStore
+    from src.pipeline import NewsPipeline
+
+    with temp_directory() as root:
+        data_dir = os.path.join(root, "all_files")
+        write_corpus_files(data_dir, files)
+        pipeline = NewsPipeline(
+            VectorStore(collection_name="bench_memory", persist_directory=os.path.join(root, "store")),
+            EmbeddingManager(cache_dir=None),
+            data_directory=data_dir,
+            sources=[],
+            embed_batch_size=batch_size,
+        )
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = asyncio.run(pipeline.refresh_news())
+        seconds = time.perf_counter() - start
+        asyncio.run(pipeline.close())
+    # ru_maxrss is in KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"files": files, "chunks": stats["added"], "refresh_s": seconds, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        ingest(args.child, args.batch_size)
+        return
+
+    rows = []
+    for files in args.files:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_ingestion_memory", "--child", str(files),
+             "--batch-size", str(args.batch_size)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+    print_table(rows, title=f"refresh_news peak RSS (batch_size={args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
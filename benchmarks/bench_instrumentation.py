@@ -0,0 +1,66 @@
+"""Per-call overhead of the hot-path instrumentation
+
+    python -m benchmarks.bench_instrumentation --calls 100000
+
+Compares what one instrumented call costs: the two progress prints the hot
+path used to make (written to /dev/null, so terminal speed does not count),
+stage_timer with debug logging off (the default) and on, and a disabled
+logger.debug call. Also times rendering /metrics.
+"""
+import argparse
+import logging
+import os
+import time
+from contextlib import redirect_stdout
+
+from src.metrics import REGISTRY, stage_timer
+from benchmarks.common import print_table
+
+
+def per_call_us(func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    metrics_logger = logging.getLogger("src.metrics")
+    metrics_logger.addHandler(logging.NullHandler())
+    metrics_logger.propagate = False
+    hot_logger = logging.getLogger("src.embedding")
+    texts = ["headline"] * 32
+
+    def prints():
+        print(f"Generating Embeddings for {len(texts)} text(s)...")
+        print(f"Generated Embedding Model with shape {(len(texts), 384)}")
+
+    def timer():
+        with stage_timer("bench", batch_size=len(texts)):
+            pass
+
+    def disabled_debug():
+        hot_logger.debug("Embedded %d text(s) into %s", len(texts), (len(texts), 384))
+
+    rows = []
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        rows.append({"instrumentation": "2 x print (old)", "us_per_call": per_call_us(prints, args.calls)})
+    metrics_logger.setLevel(logging.INFO)
+    rows.append({"instrumentation": "stage_timer, debug off", "us_per_call": per_call_us(timer, args.calls)})
+    metrics_logger.setLevel(logging.DEBUG)
+    rows.append({"instrumentation": "stage_timer, debug on", "us_per_call": per_call_us(timer, args.calls)})
+    hot_logger.setLevel(logging.INFO)
+    rows.append({"instrumentation": "logger.debug, disabled", "us_per_call": per_call_us(disabled_debug, args.calls)})
+    print_table(rows, title=f"Overhead per instrumented call ({args.calls} calls)")
+
+    start = time.perf_counter()
+    text = REGISTRY.render()
+    print(f"\nRendering /metrics: {(time.perf_counter() - start) * 1000:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Local document loading: serial DirectoryLoader passes vs the process-pool loader
+
+    python -m benchmarks.bench_parallel_loading --txt 500 --pdf 300 --workers 1 2 4 8
+
+Generates a corpus of TXT and multi-page PDF files, then times the old
+two-pass DirectoryLoader load and ParallelDocumentLoader at each worker count
+(cold = including worker start-up, warm = second run on the same pool).
+The last row is a re-run with a manifest, where every file is skipped.
+"""
+import argparse
+import os
+import time
+
+import pymupdf
+
+from src.data_ingestion import ParallelDocumentLoader, list_local_files
+from src.manifest import IngestionManifest
+from benchmarks.common import print_table, synthetic_corpus, temp_directory, write_corpus_files
+
+
+def write_pdfs(directory, n_files, pages=4):
+    docs = synthetic_corpus(n_files * pages, seed=7)
+    for i in range(n_files):
+        pdf = pymupdf.open()
+        for page_no in range(pages):
+            page = pdf.new_page()
+            page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), docs[i * pages + page_no].page_content * 3, fontsize=9)
+        pdf.save(os.path.join(directory, f"report_{i:05d}.pdf"))
+        pdf.close()
+
+
+def serial_load(directory):
+    # Imported lazily so spawned loader workers, which re-import this module, skip it
+    from langchain_community.document_loaders import DirectoryLoader, PyMuPDFLoader, TextLoader
+    docs = DirectoryLoader(directory, glob="**/*.txt", loader_cls=TextLoader, show_progress=False).load()
+    docs += DirectoryLoader(directory, glob="**/*.pdf", loader_cls=PyMuPDFLoader, show_progress=False).load()
+    return docs
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--txt", type=int, default=500)
+    parser.add_argument("--pdf", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with temp_directory() as root:
+        write_corpus_files(root, args.txt)
+        write_pdfs(root, args.pdf)
+        paths = list_local_files(root)
+
+        rows = []
+        serial_load(root)  # warm the import and page cache so the baseline is not penalised
+        seconds, docs = timed(lambda: serial_load(root))
+        rows.append({"loader": "DirectoryLoader x2 (before)", "workers": 1, "cold_s": seconds, "warm_s": seconds,
+                     "files_per_s": len(paths) / seconds, "documents": len(docs)})
+
+        for workers in args.workers:
+            loader = ParallelDocumentLoader(max_workers=workers, min_parallel_files=1)
+            cold, loaded = timed(lambda: list(loader.iter_load(paths)))
+            warm, loaded = timed(lambda: list(loader.iter_load(paths)))
+            loader.shutdown()
+            rows.append({"loader": "ParallelDocumentLoader", "workers": workers, "cold_s": cold, "warm_s": warm,
+                         "files_per_s": len(paths) / warm, "documents": sum(len(f.documents) for f in loaded)})
+
+        # Second refresh: everything unchanged, nothing is parsed
+        manifest = IngestionManifest(os.path.join(root, "manifest.json"))
+        for path in paths:
+            manifest.update_file(str(path), path.stat(), [])
+        loader = ParallelDocumentLoader(manifest=manifest)
+        seconds, loaded = timed(lambda: list(loader.iter_load(p for p, _ in loader.changed_files(paths))))
+        rows.append({"loader": "unchanged re-run (manifest)", "workers": loader.max_workers, "cold_s": seconds,
+                     "warm_s": seconds, "files_per_s": len(paths) / seconds, "documents": len(loaded)})
+
+    print_table(rows, title=f"loading {args.txt} TXT + {args.pdf} PDF files")
+
+
+if __name__ == "__main__":
+    main()
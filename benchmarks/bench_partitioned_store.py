@@ -0,0 +1,95 @@
+"""Query latency and disk footprint over simulated months of ingestion
+
+    python -m benchmarks.bench_partitioned_store --days 90 --per-day 500
+
+Simulates an hourly-refreshed deployment one day at a time: every day adds
+`--per-day` new chunks (a share of them near-duplicates of earlier stories),
+then maintain() runs. A single NumPy index keeps growing, while the
+partitioned store with retention stays bounded. The "last 24h" query only
+touches the newest partitions.
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+
+from src.filters import MetadataFilter
+from src.partitions import PartitionedBackend
+from src.vector_backends import NumpyBackend, normalize_rows
+from benchmarks.common import print_table, summarize, temp_directory
+
+DAY = 86400
+
+
+def disk_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1e6
+
+
+def day_batch(rng, day: int, per_day: int, dim: int, start: float, duplicate_share: float):
+    vectors = normalize_rows(rng.standard_normal((per_day, dim)))
+    # Syndicated copies: a share of stories repeats an earlier one almost verbatim
+    n_dup = int(per_day * duplicate_share)
+    vectors[per_day - n_dup:] = normalize_rows(vectors[:n_dup] + 0.01 * rng.standard_normal((n_dup, dim)))
+    ids = [f"day{day}_{i}" for i in range(per_day)]
+    published = start + day * DAY + np.sort(rng.uniform(0, DAY, per_day))
+    metadatas = [{"source": "BBC", "published_at": float(t)} for t in published]
+    return ids, vectors, metadatas, ["" for _ in ids]
+
+
+def measure(backend, queries, filters):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.query(query[None, :], n_results=5, filters=filters)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)["p50_ms"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--per-day", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--retention-days", type=float, default=30)
+    parser.add_argument("--duplicate-share", type=float, default=0.1)
+    parser.add_argument("--report-every", type=int, default=15)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = normalize_rows(rng.standard_normal((50, args.dim)))
+    start = 1_700_000_000.0
+    clock_now = [start]
+    rows = []
+    with temp_directory() as root, contextlib.redirect_stdout(io.StringIO()):
+        single = NumpyBackend(os.path.join(root, "single"), mode="exact")
+        partitioned = PartitionedBackend(os.path.join(root, "partitioned"), retention_days=args.retention_days,
+                                         min_partition_size=args.per_day * 2, clock=lambda: clock_now[0],
+                                         mode="exact")
+        for day in range(args.days):
+            batch = day_batch(rng, day, args.per_day, args.dim, start, args.duplicate_share)
+            clock_now[0] = start + (day + 1) * DAY
+            for backend in (single, partitioned):
+                backend.upsert(*batch)
+                backend.flush()
+                backend.maintain()
+            if (day + 1) % args.report_every == 0 or day + 1 == args.days:
+                last_day = MetadataFilter(since=clock_now[0] - DAY)
+                for name, backend, path in (("single index", single, "single"),
+                                            ("partitioned", partitioned, "partitioned")):
+                    rows.append({
+                        "day": day + 1, "store": name, "chunks": backend.count(),
+                        "disk_mb": disk_mb(os.path.join(root, path)),
+                        "p50_all_ms": measure(backend, queries, None),
+                        "p50_last24h_ms": measure(backend, queries, last_day),
+                    })
+    print_table(rows, title=f"{args.per_day} chunks/day, retention {args.retention_days:g} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Query embedding throughput with and without micro-batching
+
+    python -m benchmarks.bench_query_batching --seconds 5
+
+Reports queries/second for 1, 8 and 64 concurrent clients when every query
+is encoded on its own versus coalesced by EmbeddingBatcher. The query cache
+is disabled so every query reaches the model.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from src.embedding import EmbeddingManager
+from src.execution import ExecutionLayer
+from src.batching import EmbeddingBatcher
+from benchmarks.common import print_table, synthetic_queries
+
+
+async def run(embed, queries, clients, seconds):
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset):
+        nonlocal done
+        i = offset
+        while time.perf_counter() < deadline:
+            # Unique text per call so the query cache never short-circuits the model
+            await embed(f"{queries[i % len(queries)]} #{i}")
+            done += 1
+            i += clients
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return done / (time.perf_counter() - start)
+
+
+async def main_async(args):
+    embedding_manager = EmbeddingManager(cache_dir=None, query_cache_size=0)
+    execution = ExecutionLayer()
+    queries = synthetic_queries(500)
+
+    async def unbatched(text):
+        return (await execution.run_cpu("query_embed", embedding_manager.generate_embeddings, [text], is_query=True))[0]
+
+    rows = []
+    for clients in args.clients:
+        batcher = EmbeddingBatcher(embedding_manager, execution,
+                                   max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        single_qps = await run(unbatched, queries, clients, args.seconds)
+        batched_qps = await run(batcher.embed, queries, clients, args.seconds)
+        rows.append({
+            "clients": clients,
+            "unbatched_qps": single_qps,
+            "batched_qps": batched_qps,
+            "speedup": batched_qps / single_qps,
+            "mean_batch": batcher.stats()["mean_batch_size"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(main_async(args))
+    print_table(rows, title=f"query embedding throughput (max_batch_size={args.max_batch_size}, max_wait_ms={args.max_wait_ms})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Per-query latency of the old double-retrieval path vs the single-retrieval path
+
+    python -m benchmarks.bench_query_path --docs 500 --queries 50
+
+The LLM is replaced with an instant stub so the numbers isolate retrieval cost
+(query encoding + Chroma query).
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.embedding import EmbeddingManager
+from src.vectorstore import VectorStore
+from src.retriever import RAGRetriever
+from src.llm_interface import rag_simple, generate_answer
+from benchmarks.common import EchoLLM, print_table, summarize, synthetic_corpus, synthetic_queries, temp_directory
+
+
+def old_path(retriever, llm, query, top_k):
+    articles = retriever.retrieve(query, top_k=top_k)
+    summary = rag_simple(query, retriever, llm, top_k=top_k)
+    return articles, summary
+
+
+def new_path(retriever, llm, query, top_k):
+    result = retriever.retrieve_result(query, top_k=top_k)
+    summary = generate_answer(result, llm)
+    return result.documents, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    embedding_manager = EmbeddingManager()
+    llm = EchoLLM()
+    with temp_directory() as path:
+        vector_store = VectorStore(collection_name="bench_query_path", persist_directory=path)
+        docs = synthetic_corpus(args.docs)
+        vector_store.add_documents(docs, embedding_manager.generate_embeddings([d.page_content for d in docs]))
+        retriever = RAGRetriever(vector_store, embedding_manager)
+        queries = synthetic_queries(args.queries)
+
+        rows = []
+        for name, path_fn in (("double retrieval (before)", old_path), ("single retrieval (after)", new_path)):
+            path_fn(retriever, llm, queries[0], args.top_k)  # warm-up
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                # Silence the per-call progress prints so they do not dominate timings
+                with contextlib.redirect_stdout(io.StringIO()):
+                    path_fn(retriever, llm, query, args.top_k)
+                latencies.append(time.perf_counter() - start)
+            rows.append({"path": name, **summarize(latencies)})
+        print_table(rows, title=f"query_news latency, {args.docs} docs, top_k={args.top_k}")
+
+
+if __name__ == "__main__":
+    main()
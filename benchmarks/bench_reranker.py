@@ -0,0 +1,75 @@
+"""Retrieval quality vs added latency of cross-encoder re-ranking on CPU
+
+    python -m benchmarks.bench_reranker --filler 2000 --k 5 --candidates 10 20 50
+
+Uses the labelled corpus of eval_hybrid_recall (filler news plus articles about
+specific companies, tickers and dates). For each candidate depth the bi-encoder
+fetches that many hits and the cross-encoder re-scores them; the table reports
+recall@k and MRR against plain vector retrieval, the p50/p95 re-rank time added
+per query, and how often the latency budget forced the bi-encoder fallback.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.embedding import EmbeddingManager
+from src.reranker import CrossEncoderReranker
+from src.retriever import RAGRetriever
+from src.vectorstore import VectorStore
+from benchmarks.common import print_table, summarize, temp_directory
+from benchmarks.eval_hybrid_recall import labelled_corpus
+
+
+def evaluate(retriever, queries, k):
+    recall, reciprocal_ranks, latencies = 0.0, 0.0, []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        hits = retriever.retrieve(query, top_k=k, score_threshold=-1.0, mode="vector")
+        latencies.append(time.perf_counter() - start)
+        ids = [hit["id"] for hit in hits]
+        recall += len(set(ids) & relevant) / len(relevant)
+        reciprocal_ranks += next((1 / rank for rank, doc_id in enumerate(ids, start=1) if doc_id in relevant), 0.0)
+    return recall / len(queries), reciprocal_ranks / len(queries), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filler", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--budget-ms", type=float, default=None, help="latency budget (default: none)")
+    args = parser.parse_args()
+
+    documents, queries = labelled_corpus(args.filler)
+    embedding_manager = EmbeddingManager()
+    rows = []
+    with temp_directory() as path, contextlib.redirect_stdout(io.StringIO()):
+        vector_store = VectorStore(collection_name="bench_rerank", persist_directory=path)
+        for start in range(0, len(documents), 256):
+            batch = documents[start:start + 256]
+            vector_store.add_documents(batch, embedding_manager.generate_embeddings([d.page_content for d in batch]))
+
+        recall, mrr, baseline = evaluate(RAGRetriever(vector_store, embedding_manager), queries, args.k)
+        baseline_p50 = summarize(baseline)["p50_ms"]
+        rows.append({"ranking": "bi-encoder", "candidates": args.k, f"recall@{args.k}": recall, "mrr": mrr,
+                     "added_p50_ms": 0.0, "added_p95_ms": 0.0, "fallbacks": 0})
+
+        reranker = CrossEncoderReranker(args.model, batch_size=args.batch_size, latency_budget_ms=args.budget_ms)
+        reranker.warm_up()
+        for candidates in args.candidates:
+            reranker.fallbacks = 0
+            retriever = RAGRetriever(vector_store, embedding_manager, reranker=reranker, rerank_candidates=candidates)
+            recall, mrr, latencies = evaluate(retriever, queries, args.k)
+            added = [max(0.0, latency - baseline_p50 / 1000) for latency in latencies]
+            stats = summarize(added)
+            rows.append({"ranking": "cross-encoder", "candidates": candidates, f"recall@{args.k}": recall,
+                         "mrr": mrr, "added_p50_ms": stats["p50_ms"], "added_p95_ms": stats["p95_ms"],
+                         "fallbacks": reranker.fallbacks})
+    print_table(rows, title=f"{len(queries)} labelled queries, {len(documents)} documents, {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Serializing query results: json.dumps vs orjson / msgpack, field projection and cached payloads
+
+    python -m benchmarks.bench_serialization --top-k 5 10 --chunk-chars 1000 --cache-entries 200 --connections 100
+
+Builds query_news-shaped results (`--top-k` articles whose chunks have
+`--chunk-chars` characters) and reports, per response, the time to serialize
+and the size on the wire with stdlib json.dumps (what both servers did), the
+negotiated encodings, a "fields" projection without the chunk text, and a
+cache hit served from the bytes stored with the cached answer. deflate_bytes
+is the size after per-message compression (raw deflate, as permessage-deflate
+sends it). The second table sends an answer cache of `--cache-entries`
+entries to `--connections` new WebSocket connections.
+"""
+import argparse
+import json
+import time
+import zlib
+
+import numpy as np
+
+from src.answer_cache import SemanticAnswerCache
+from src.serialization import available_encodings, encode, encode_frame, parse_fields, project
+from benchmarks.common import print_table, synthetic_corpus
+
+
+def make_result(query, docs, rng, chunk_chars):
+    articles = []
+    for rank, doc in enumerate(docs, start=1):
+        text = (doc.page_content + " ") * (chunk_chars // (len(doc.page_content) + 1) + 1)
+        articles.append({"id": f"chunk_{rng.integers(1 << 40):x}", "content": text[:chunk_chars],
+                         "metadata": {**doc.metadata, "title": doc.page_content[:60],
+                                      "url": f"https://news.example/{rank}", "published_at": 1.7e9 + rank},
+                         "similarity_score": float(rng.random()), "distance": float(rng.random()), "rank": rank})
+    return {"query": query, "summary": "A summary of the latest news. " * 12, "articles": articles,
+            "prompt_tokens": 1200, "timestamp": "2024-05-01T12:00:00"}
+
+
+def deflated(payload):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def per_call(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload = function()
+    return (time.perf_counter() - start) / repeat, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--cache-entries", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    docs = synthetic_corpus(max(args.top_k))
+    fields = parse_fields("id,rank,similarity_score,metadata.source,metadata.title,metadata.url")
+    cache = SemanticAnswerCache()
+    rows = []
+    for top_k in args.top_k:
+        result = make_result("latest markets news", docs[:top_k], rng, args.chunk_chars)
+        entry = cache.put(result["query"], np.ones(4), top_k, 0, result)
+        methods = [
+            ("json.dumps", lambda: json.dumps(result).encode("utf-8")),
+            ("json (orjson if installed)", lambda: encode(result)),
+        ]
+        if "msgpack" in available_encodings():
+            methods.append(("msgpack", lambda: encode(result, "msgpack")))
+        methods += [
+            ("json + fields (no chunk text)", lambda: encode(project(result, fields))),
+            ("cache hit, stored payload", lambda: cache.payload(entry, ("json", None), lambda: encode(result))),
+        ]
+        for name, function in methods:
+            seconds, payload = per_call(function, args.repeat)
+            rows.append({"top_k": top_k, "method": name, "us_per_response": seconds * 1e6,
+                         "bytes": len(payload), "deflate_bytes": deflated(payload)})
+    print_table(rows, title=f"Per response, chunks of {args.chunk_chars} chars, {args.repeat} repetitions")
+
+    # Sending the answer cache to every new connection
+    cache = SemanticAnswerCache(max_entries=args.cache_entries)
+    for i in range(args.cache_entries):
+        cache.put(f"query {i}", rng.random(4), 5, 0, make_result(f"query {i}", docs[:5], rng, args.chunk_chars))
+    rows = []
+    start = time.perf_counter()
+    for _ in range(args.connections):
+        payload = json.dumps({"type": "cache_update", "data": cache.snapshot(0)})
+    rows.append({"method": "json.dumps per connection", "total_ms": (time.perf_counter() - start) * 1000,
+                 "bytes": len(payload)})
+    start = time.perf_counter()
+    for _ in range(args.connections):
+        payload = cache.snapshot_payload(0, ("json", None), lambda snapshot: encode_frame(
+            {"type": "cache_update", "data": snapshot}))
+    rows.append({"method": "snapshot_payload (once)", "total_ms": (time.perf_counter() - start) * 1000,
+                 "bytes": len(payload)})
+    print_table(rows, title=f"cache_update of {args.cache_entries} answers to {args.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time from process start to the first healthy, ready and refreshed API response
+
+    python -m benchmarks.bench_startup --files 200 --runs 3
+
+Starts the FastAPI app under uvicorn in a fresh process (working directory is
+a temporary directory holding `--files` local news files) and polls it:
+
+    healthy    GET / answers 200 (the server is accepting requests)
+    ready      GET /ready answers 200 (model, vector store and LLM client loaded)
+    refreshed  /ready reports the first background refresh as completed
+
+With lazy initialisation the first healthy response no longer waits for the
+model load or the initial refresh. Pass --no-warm-up to leave every component
+to load on the first query instead.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import print_table, temp_directory, write_corpus_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_once(files: int, warm_up: bool, backend: str, timeout: float):
+    with temp_directory() as root:
+        write_corpus_files(os.path.join(root, "data", "all_files"), files)
+        port = free_port()
+        env = dict(os.environ, WARM_UP="1" if warm_up else "0", VECTOR_BACKEND=backend,
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-m", "uvicorn", "src.api.main:app", "--port", str(port),
+                                    "--log-level", "warning"], cwd=root, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times = {"healthy_s": None, "ready_s": None, "refreshed_s": None}
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+                while time.perf_counter() - start < timeout and None in times.values():
+                    try:
+                        if times["healthy_s"] is None and client.get("/").status_code == 200:
+                            times["healthy_s"] = time.perf_counter() - start
+                        if times["healthy_s"] is not None:
+                            report = client.get("/ready")
+                            if times["ready_s"] is None and report.status_code == 200:
+                                times["ready_s"] = time.perf_counter() - start
+                            if times["refreshed_s"] is None and report.json()["refresh"]["completed"]:
+                                times["refreshed_s"] = time.perf_counter() - start
+                    except (httpx.HTTPError, KeyError):
+                        pass
+                    time.sleep(0.02)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--no-warm-up", action="store_true")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    rows = []
+    for run in range(args.runs):
+        times = start_once(args.files, not args.no_warm_up, args.backend, args.timeout)
+        rows.append({"run": run + 1, **{k: v if v is not None else float("nan") for k, v in times.items()}})
+    print_table(rows, title=f"API startup, {args.files} local files, warm-up {'off' if args.no_warm_up else 'on'}")
+
+
+if __name__ == "__main__":
+    main()
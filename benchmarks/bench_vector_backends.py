@@ -0,0 +1,89 @@
+"""Recall vs latency of the vector store backends
+
+    python -m benchmarks.bench_vector_backends --vectors 50000 --queries 200
+
+Indexes the same synthetic, topic-clustered unit vectors (384 dims, like
+all-MiniLM-L6-v2) into ChromaDB, the exact NumPy index and the NumPy IVF index
+at several n_probe settings, and reports recall@k against brute-force search
+alongside per-query latency and index build time.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.vector_backends import ChromaBackend, NumpyBackend, normalize_rows
+from benchmarks.common import print_table, summarize, temp_directory
+
+
+def clustered_vectors(n: int, dim: int, topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)) * 2
+    return normalize_rows(centers[rng.integers(topics, size=n)] + rng.standard_normal((n, dim)))
+
+
+def build(backend, ids, vectors, batch_size=5000):
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        batch = slice(i, i + batch_size)
+        backend.upsert(ids[batch], vectors[batch], [{"i": j} for j in range(i, min(i + batch_size, len(ids)))],
+                       [""] * len(ids[batch]))
+    backend.flush()
+    return time.perf_counter() - start
+
+
+def measure(backend, queries, truth, top_k):
+    backend.query(queries[:1], n_results=top_k)  # warm-up
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = backend.query(query[None, :], n_results=top_k)["ids"][0]
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found) & expected)
+    return latencies, hits / (len(queries) * top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.vectors, args.dim, args.topics)
+    ids = [f"chunk_{i}" for i in range(args.vectors)]
+    rng = np.random.default_rng(1)
+    queries = normalize_rows(vectors[rng.integers(args.vectors, size=args.queries)]
+                             + 0.5 * rng.standard_normal((args.queries, args.dim)))
+    top = np.argpartition(-(vectors @ queries.T), args.top_k, axis=0)[:args.top_k].T
+    truth = [{ids[i] for i in row} for row in top]
+
+    rows = []
+    with temp_directory() as root:
+        backends = []
+        if not args.skip_chroma:
+            backends.append(("chroma (hnsw)", ChromaBackend(os.path.join(root, "chroma"), "bench")))
+        backends.append(("numpy exact", NumpyBackend(os.path.join(root, "exact"), mode="exact")))
+        ivf = NumpyBackend(os.path.join(root, "ivf"), mode="ivf")
+        for name, backend in backends + [("numpy ivf", ivf)]:
+            build_seconds = build(backend, ids, vectors)
+            if backend is ivf:
+                for n_probe in args.n_probe:
+                    ivf.n_probe = n_probe
+                    latencies, recall = measure(ivf, queries, truth, args.top_k)
+                    rows.append({"backend": f"numpy ivf (n_probe={n_probe})", f"recall@{args.top_k}": recall,
+                                 "build_s": build_seconds, **summarize(latencies)})
+            else:
+                latencies, recall = measure(backend, queries, truth, args.top_k)
+                rows.append({"backend": name, f"recall@{args.top_k}": recall,
+                             "build_s": build_seconds, **summarize(latencies)})
+    print_table(rows, title=f"vector search, {args.vectors} x {args.dim}, top_k={args.top_k}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Query throughput and memory of 1/2/4/8 serving workers sharing one index
+
+    python -m benchmarks.bench_workers --files 500 --workers 1 2 4 8 --duration 10
+
+Builds a NumPy index from `--files` local news files with one writable
+pipeline (the refresh leader), then starts N worker processes the way
+`API_WORKERS=N python run_api.py` does: each opens the same index read-only
+(vectors memory-mapped) with its own embedding model, and runs `--clients`
+concurrent query_news loops against an echo LLM for `--duration` seconds.
+Reports total queries per second and per-worker memory; PSS splits shared
+pages (the mapped vectors, library code) between the processes mapping them,
+so it is the figure that shows what the index sharing saves.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+
+from src.answer_cache import SemanticAnswerCache
+from src.coordination import RefreshCoordinator
+from src.embedding import EmbeddingManager
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+from benchmarks.common import EchoLLM, print_table, summarize, synthetic_queries, temp_directory, write_corpus_files
+
+
+def memory_mb():
+    """(PSS, RSS) of this process in MB, from /proc (NaN where unavailable)"""
+    values = {"Pss:": float("nan"), "Rss:": float("nan")}
+    with contextlib.suppress(OSError):
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in values:
+                    values[parts[0]] = int(parts[1]) / 1024
+    return values["Pss:"], values["Rss:"]
+
+
+def make_pipeline(root, model, backend, read_only):
+    store = VectorStore(persist_directory=os.path.join(root, "store"), backend=backend, read_only=read_only)
+    return NewsPipeline(store, EmbeddingManager(model, cache_dir=None), data_directory=os.path.join(root, "files"),
+                        sources=[], llm_client=EchoLLM(), answer_cache=SemanticAnswerCache(similarity_threshold=2))
+
+
+def worker(rank, root, model, backend, clients, duration, barrier, results):
+    async def serve():
+        pipeline = make_pipeline(root, model, backend, read_only=True)
+        await pipeline.warm_up()
+        barrier.wait()
+        # Unique queries, so the answer cache never short-cuts the query path
+        queries = [f"{q} {rank}-{i}" for i, q in enumerate(synthetic_queries(5000, seed=rank))]
+        latencies = []
+        deadline = time.perf_counter() + duration
+
+        async def client(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await pipeline.query_news(queries[i % len(queries)], top_k=5)
+                latencies.append(time.perf_counter() - start)
+                i += clients
+
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        pss, rss = memory_mb()
+        await pipeline.close()
+        return latencies, pss, rss
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.put(asyncio.run(serve()))
+
+
+def run_workers(n, root, args):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(n)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(rank, root, args.model, args.backend, args.clients,
+                                                      args.duration, barrier, results))
+                 for rank in range(n)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    latencies = [latency for outcome in outcomes for latency in outcome[0]]
+    stats = summarize(latencies)
+    return {
+        "workers": n,
+        "queries_per_s": len(latencies) / args.duration,
+        "p50_ms": stats["p50_ms"],
+        "p95_ms": stats["p95_ms"],
+        "pss_mb_per_worker": sum(outcome[1] for outcome in outcomes) / n,
+        "rss_mb_per_worker": sum(outcome[2] for outcome in outcomes) / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent queries per worker")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "partitioned"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    with temp_directory() as root:
+        write_corpus_files(os.path.join(root, "files"), args.files)
+        # The leader builds the shared index once and bumps the index version
+        leader = make_pipeline(root, args.model, args.backend, read_only=False)
+        coordinator = RefreshCoordinator(os.path.join(root, "store"))
+        coordinator.try_lead()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(coordinator.step(leader))
+        chunks = leader.vector_store.count()
+        asyncio.run(leader.close())
+
+        rows = [run_workers(n, root, args) for n in args.workers]
+        coordinator.close()
+    print_table(rows, title=f"{chunks} chunks, {args.clients} clients per worker, {os.cpu_count()} CPUs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Shared helpers for the benchmark scripts
+
+Run benchmarks from the repository root, e.g. `python -m benchmarks.bench_query_path`.
+"""
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+TOPICS = [
+    "election", "inflation", "climate", "football", "space", "technology",
+    "health", "markets", "energy", "education", "transport", "housing",
+]
+WORDS = [
+    "government", "report", "minister", "announced", "record", "growth", "crisis",
+    "new", "plan", "talks", "rise", "fall", "warning", "study", "league", "launch",
+    "prices", "storm", "vote", "deal", "court", "company", "shares", "mission",
+]
+
+
+def synthetic_corpus(n_docs: int, seed: int = 0) -> List[Document]:
+    """Generate news-like documents with a topic in their metadata"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(n_docs):
+        topic = rng.choice(TOPICS)
+        words = [rng.choice(WORDS) for _ in range(rng.randint(40, 120))]
+        text = f"{topic.title()} news: " + " ".join(words) + f" ({topic} update {i})"
+        documents.append(Document(page_content=text, metadata={"source": f"synthetic/{topic}_{i}.txt", "topic": topic}))
+    return documents
+
+
+def write_corpus_files(directory, n_files: int, docs_per_file: int = 5, seed: int = 0) -> List[Path]:
+    """Write synthetic TXT files for ingestion benchmarks"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    docs = synthetic_corpus(n_files * docs_per_file, seed=seed)
+    paths = []
+    for i in range(n_files):
+        path = directory / f"article_{i:05d}.txt"
+        path.write_text("\n\n".join(d.page_content for d in docs[i * docs_per_file:(i + 1) * docs_per_file]), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def synthetic_queries(n_queries: int, seed: int = 1) -> List[str]:
+    """Generate short topic queries matching the synthetic corpus"""
+    rng = random.Random(seed)
+    return [f"latest {rng.choice(TOPICS)} {rng.choice(WORDS)}" for _ in range(n_queries)]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize a list of latencies (seconds) in milliseconds"""
+    ordered = sorted(latencies)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+    }
+
+
+def print_table(rows: List[Dict], title: str = ""):
+    """Print a list of dicts as an aligned table"""
+    if title:
+        print(f"\n{title}")
+    if not rows:
+        print("(no rows)")
+        return
+    headers = list(rows[0].keys())
+    def fmt(v):
+        return f"{v:.2f}" if isinstance(v, float) else str(v)
+    widths = [max(len(h), *(len(fmt(r[h])) for r in rows)) for h in headers]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print("  ".join(fmt(r[h]).ljust(w) for h, w in zip(headers, widths)))
+
+
+@contextmanager
+def temp_directory():
+    """Temporary directory for throwaway vector stores"""
+    with tempfile.TemporaryDirectory(prefix="newsrag_bench_") as path:
+        yield path
+
+
+class Timer:
+    """Minimal wall clock timer"""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class EchoLLM:
+    """Stand-in LLM so benchmarks measure the pipeline, not Groq
+
+    `latency` simulates a remote call: invoke blocks for it, ainvoke awaits it.
+    """
+    class _Response:
+        def __init__(self, content):
+            self.content = content
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def invoke(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._Response(f"{len(prompt)} chars")
+
+    async def ainvoke(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._Response(f"{len(prompt)} chars")
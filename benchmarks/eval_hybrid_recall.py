@@ -0,0 +1,110 @@
+"""Recall@k of vector, BM25 and hybrid retrieval on a labelled query set
+
+    python -m benchmarks.eval_hybrid_recall --filler 2000 --k 5
+
+The corpus mixes synthetic filler news with labelled articles about specific
+companies, tickers and dates. Each labelled query names the entity the way a
+reader would ("TSLA deliveries 2024-07-02", "Ørsted wind farm"), and its relevant
+set is the article(s) about it. Also compares BM25 lookup latency against the
+linear substring scan it replaces.
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+from typing import Dict, List, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.embedding import EmbeddingManager
+from src.lexical_index import BM25Index
+from src.retriever import RAGRetriever
+from src.vectorstore import VectorStore, chunk_id
+from benchmarks.common import print_table, summarize, synthetic_corpus, temp_directory
+
+COMPANIES = [
+    ("Tesla", "TSLA"), ("Nvidia", "NVDA"), ("Apple", "AAPL"), ("Microsoft", "MSFT"), ("Amazon", "AMZN"),
+    ("Ørsted", "ORSTED"), ("Rolls-Royce", "RR.L"), ("Berkshire Hathaway", "BRK.B"), ("Shell", "SHEL"),
+    ("Unilever", "ULVR"), ("Barclays", "BARC"), ("BP", "BP.L"), ("Toyota", "7203.T"), ("Samsung", "005930.KS"),
+]
+EVENTS = [
+    ("deliveries beat estimates", "deliveries"), ("profit warning issued", "profit warning"),
+    ("chief executive resigns", "chief executive resigns"), ("wind farm project cancelled", "wind farm"),
+    ("shares suspended pending announcement", "shares suspended"), ("record quarterly dividend", "dividend"),
+]
+
+
+def labelled_corpus(filler: int, seed: int = 0) -> Tuple[List[Document], List[Tuple[str, Set[str]]]]:
+    """Filler documents plus one article per (company, event) pair, with queries labelled by chunk ID"""
+    rng = random.Random(seed)
+    documents = synthetic_corpus(filler, seed=seed)
+    queries = []
+    for name, ticker in COMPANIES:
+        for event, keyword in EVENTS:
+            date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            doc = Document(
+                page_content=f"{name} ({ticker}) {event} on {date}. Analysts said the markets news was "
+                             f"unexpected and the company report would follow.",
+                metadata={"source": f"labelled/{ticker}_{keyword}.txt"},
+            )
+            documents.append(doc)
+            relevant = {chunk_id(doc)}
+            queries.append((f"{ticker} {keyword} {date}", relevant))
+            queries.append((f"{name} {keyword}", relevant))
+    return documents, queries
+
+
+def recall_at_k(retriever: RAGRetriever, queries, k: int, mode: str) -> Tuple[float, List[float]]:
+    hits, latencies = 0, []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        found = {doc["id"] for doc in retriever.retrieve(query, top_k=k, score_threshold=-1.0, mode=mode)}
+        latencies.append(time.perf_counter() - start)
+        hits += len(found & relevant) / len(relevant)
+    return hits / len(queries), latencies
+
+
+def linear_scan(texts: List[str], query: str, max_results: int) -> List[int]:
+    """The previous lexical lookup: substring test over every document"""
+    query_lower = query.lower()
+    return [i for i, text in enumerate(texts) if query_lower in text.lower()][:max_results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filler", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    documents, queries = labelled_corpus(args.filler)
+    embedding_manager = EmbeddingManager()
+    rows = []
+    with temp_directory() as path, contextlib.redirect_stdout(io.StringIO()):
+        vector_store = VectorStore(collection_name="eval_hybrid", persist_directory=path)
+        for start in range(0, len(documents), 256):
+            batch = documents[start:start + 256]
+            vector_store.add_documents(batch, embedding_manager.generate_embeddings([d.page_content for d in batch]))
+        retriever = RAGRetriever(vector_store, embedding_manager)
+        for mode in ("vector", "lexical", "hybrid"):
+            recall, latencies = recall_at_k(retriever, queries, args.k, mode)
+            rows.append({"mode": mode, f"recall@{args.k}": recall, **summarize(latencies)})
+    print_table(rows, title=f"{len(queries)} labelled queries, {len(documents)} documents")
+
+    # Lexical lookup cost alone: inverted index vs linear scan
+    texts = [d.page_content for d in documents]
+    index = BM25Index()
+    index.add([str(i) for i in range(len(texts))], texts)
+    timings: Dict[str, List[float]] = {"linear scan (before)": [], "bm25 index (after)": []}
+    for query, _ in queries:
+        for name, lookup in (("linear scan (before)", lambda: linear_scan(texts, query, args.k)),
+                             ("bm25 index (after)", lambda: index.search(query, top_k=args.k))):
+            start = time.perf_counter()
+            lookup()
+            timings[name].append(time.perf_counter() - start)
+    print_table([{"lookup": name, **summarize(values)} for name, values in timings.items()],
+                title="lexical lookup latency")
+
+
+if __name__ == "__main__":
+    main()
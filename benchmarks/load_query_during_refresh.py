@@ -0,0 +1,92 @@
+"""Load test: query latency while an hourly refresh is running
+
+    python -m benchmarks.load_query_during_refresh --clients 16 --files 300
+
+Concurrent clients call NewsPipeline.query_news in a loop. Latency is first
+measured on an idle pipeline, then again while refresh_news re-ingests every
+local file. With blocking work moved off the event loop, p99 should stay close
+to the idle value instead of jumping to the refresh duration.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+from src.embedding import EmbeddingManager
+from src.vectorstore import VectorStore
+from src.pipeline import NewsPipeline
+from benchmarks.common import EchoLLM, print_table, summarize, synthetic_queries, temp_directory, write_corpus_files
+
+
+async def run_clients(pipeline, queries, clients, stop):
+    latencies = []
+
+    async def client(offset):
+        i = offset
+        while not stop.is_set():
+            start = time.perf_counter()
+            await pipeline.query_news(queries[i % len(queries)], top_k=5)
+            latencies.append(time.perf_counter() - start)
+            i += clients
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return latencies
+
+
+async def measure(pipeline, queries, clients, duration=None, during=None):
+    stop = asyncio.Event()
+    task = asyncio.create_task(run_clients(pipeline, queries, clients, stop))
+    start = time.perf_counter()
+    if during is not None:
+        await during
+    else:
+        await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return await task, elapsed
+
+
+async def main_async(args):
+    with temp_directory() as root:
+        data_dir = os.path.join(root, "all_files")
+        write_corpus_files(data_dir, args.files)
+        pipeline = NewsPipeline(
+            VectorStore(collection_name="bench_load", persist_directory=os.path.join(root, "store")),
+            EmbeddingManager(cache_dir=None),
+            data_directory=data_dir,
+            llm_client=EchoLLM(latency=args.llm_latency_ms / 1000),
+            sources=[],
+        )
+        await pipeline.refresh_news()
+        queries = synthetic_queries(200)
+
+        idle, _ = await measure(pipeline, queries, args.clients, duration=args.idle_seconds)
+
+        # Rewrite every file so the refresh has to re-chunk and re-embed everything
+        write_corpus_files(data_dir, args.files, seed=1)
+        busy, refresh_seconds = await measure(pipeline, queries, args.clients, during=pipeline.refresh_news())
+
+    rows = [
+        {"phase": "idle", **summarize(idle)},
+        {"phase": "during refresh", **summarize(busy)},
+    ]
+    return rows, refresh_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+    # Keep the per-call progress prints out of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows, refresh_seconds = asyncio.run(main_async(args))
+    print_table(rows, title=f"query_news latency, {args.clients} clients, refresh took {refresh_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,29 @@ import os
 if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
-    
+
     # Ensure required API keys are present
     required_keys = ["GROQ_API_KEY"]
     missing_keys = [key for key in required_keys if not os.getenv(key)]
     if missing_keys:
         raise ValueError(f"Missing required environment variables: {missing_keys}")
-    
+
+    # API_WORKERS > 1 is the production mode: worker processes share one memory-mapped
+    # NumPy index and only one of them (the refresh leader) runs the refreshes
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1:
+        if os.getenv("VECTOR_BACKEND") == "chroma":
+            raise ValueError("API_WORKERS > 1 needs VECTOR_BACKEND=numpy or partitioned; "
+                             "a Chroma store cannot be shared between processes")
+
     # Run FastAPI server
     uvicorn.run(
         "src.api.main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True  # Enable auto-reload during development
-    )
\ No newline at end of file
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=workers,
+        # Per-message deflate for WebSocket clients that offer it (WS_COMPRESSION=0 turns it off,
+        # e.g. when clients already receive compact msgpack frames and CPU matters more than bandwidth)
+        ws_per_message_deflate=os.getenv("WS_COMPRESSION", "1") != "0",
+        reload=workers == 1  # Auto-reload during development (single process only)
+    )
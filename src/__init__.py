@@ -1,7 +1,27 @@
-# To make imports cleaner, you can selectively expose core classes/functions here
-from .data_ingestion import process_all_docs
-from .chunking import split_documents
-from .embedding import EmbeddingManager
-from .vectorstore import VectorStore
-from .retriever import RAGRetriever
-from .llm_interface import llm, rag_simple
\ No newline at end of file
+# To make imports cleaner, you can selectively expose core classes/functions here.
+# They are imported on first access, so importing a single submodule (e.g. from a
+# loader worker process) does not pull in the embedding model or LLM client.
+import importlib
+
+_EXPORTS = {
+    "process_all_docs": ".data_ingestion",
+    "aprocess_all_docs": ".data_ingestion",
+    "split_documents": ".chunking",
+    "EmbeddingManager": ".embedding",
+    "VectorStore": ".vectorstore",
+    "RAGRetriever": ".retriever",
+    "RetrievalResult": ".retriever",
+    "ContextBuilder": ".context_builder",
+    "llm": ".llm_interface",
+    "get_llm": ".llm_interface",
+    "rag_simple": ".llm_interface",
+    "generate_answer": ".llm_interface",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+#USE
+#answer_cache = SemanticAnswerCache(max_entries=512, ttl_seconds=3600, similarity_threshold=0.95)
+#entry = answer_cache.lookup(query, embedding, top_k, corpus_version)
+#body = answer_cache.payload(entry, ("json", None), lambda: encode(entry.value))   # serialized once per entry
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    embedding: np.ndarray
+    top_k: int
+    corpus_version: int
+    created_at: float
+    value: Dict[str, Any]
+    scope: Hashable = None
+    # Serialized forms of the value (per encoding, fields...), built on first use
+    payloads: Dict[Hashable, Any] = field(default_factory=dict)
+
+
+class SemanticAnswerCache:
+    """Bounded, TTL'd cache of query_news results with near-duplicate lookup
+
+    Entries are keyed by the normalised query text, top_k and a scope (any other
+    request option that changes the result, e.g. source/time filters). On an exact
+    miss, the query embedding is compared with the cached ones of the same top_k
+    and scope, and a cosine similarity above `similarity_threshold` counts as a hit. Every entry is tagged with the corpus
+    version it was computed against; a lookup for another version misses, so a
+    refresh that changes the corpus invalidates all earlier answers.
+
+    Entries also keep their serialized forms (see payload()), so serving a hit
+    again in the same format costs no serialization.
+    """
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.95,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: Maximum number of cached answers (least recently used evicted first)
+            ttl_seconds: Age after which an answer is no longer served
+            similarity_threshold: Minimum cosine similarity for a near-duplicate hit (> 1 disables)
+            clock: Time source, monotonic seconds
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, int, Hashable], CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # Bumped on every change; the encoded snapshot is rebuilt only after one
+        self.version = 0
+        self._snapshot_payloads: Dict[Hashable, Tuple[int, int, float, Any]] = {}
+
+    @staticmethod
+    def _key(query: str, top_k: int, scope: Hashable = None) -> Tuple[str, int, Hashable]:
+        return " ".join(query.lower().split()), top_k, scope
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live(self, entry: CachedAnswer, corpus_version: int, now: float) -> bool:
+        return entry.corpus_version == corpus_version and now - entry.created_at <= self.ttl_seconds
+
+    def get(self, query: str, embedding, top_k: int, corpus_version: int,
+            scope: Hashable = None) -> Optional[Dict[str, Any]]:
+        """Return a cached result for the query, or None on a miss"""
+        entry = self.lookup(query, embedding, top_k, corpus_version, scope)
+        return entry.value if entry is not None else None
+
+    def lookup(self, query: str, embedding, top_k: int, corpus_version: int,
+               scope: Hashable = None) -> Optional[CachedAnswer]:
+        """Same as get(), returning the whole entry"""
+        now = self.clock()
+        key = self._key(query, top_k, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._live(entry, corpus_version, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            # Near-duplicate lookup among live entries with the same top_k and scope
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if e.top_k == top_k and e.scope == scope and self._live(e, corpus_version, now)
+            ]
+            if candidates and embedding is not None and self.similarity_threshold <= 1:
+                matrix = np.stack([e.embedding for _, e in candidates])
+                scores = matrix @ self._normalize(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    best_key, best_entry = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return best_entry
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding, top_k: int, corpus_version: int, value: Dict[str, Any],
+            scope: Hashable = None) -> CachedAnswer:
+        now = self.clock()
+        with self._lock:
+            self.version += 1
+            key = self._key(query, top_k, scope)
+            entry = self._entries[key] = CachedAnswer(
+                query=query,
+                embedding=self._normalize(embedding),
+                top_k=top_k,
+                corpus_version=corpus_version,
+                created_at=now,
+                value=value,
+                scope=scope,
+            )
+            self._entries.move_to_end(key)
+            # Drop entries that can no longer be served, then enforce the size bound
+            for stale_key in [k for k, e in self._entries.items() if e.corpus_version != corpus_version or now - e.created_at > self.ttl_seconds]:
+                del self._entries[stale_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def payload(entry: CachedAnswer, key: Hashable, build: Callable[[], Any], max_payloads: int = 8) -> Any:
+        """Serialized form of an entry's value under `key`, built by `build` the first time
+
+        An entry keeps at most `max_payloads` forms (oldest dropped first).
+        """
+        payload = entry.payloads.get(key)
+        if payload is None:
+            payload = entry.payloads[key] = build()
+            while len(entry.payloads) > max_payloads:
+                del entry.payloads[next(iter(entry.payloads))]
+        return payload
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after the corpus changed)"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._snapshot_payloads.clear()
+
+    def snapshot(self, corpus_version: int) -> Dict[str, Dict[str, Any]]:
+        """Live unscoped cached results keyed by their original query"""
+        now = self.clock()
+        with self._lock:
+            return {e.query: e.value for e in self._entries.values()
+                    if e.scope is None and self._live(e, corpus_version, now)}
+
+    def snapshot_payload(self, corpus_version: int, key: Hashable,
+                         build: Callable[[Dict[str, Dict[str, Any]]], Any]) -> Any:
+        """build(snapshot(corpus_version)), reused until the cache changes or an included answer expires
+
+        Lets a server send the whole cache to every new connection while
+        serializing it once. `key` tells apart differently built payloads
+        (e.g. per encoding).
+        """
+        now = self.clock()
+        memo = self._snapshot_payloads.get(key)
+        if memo is not None and memo[:2] == (corpus_version, self.version) and now < memo[2]:
+            return memo[3]
+        with self._lock:
+            version = self.version
+            live = [e for e in self._entries.values() if e.scope is None and self._live(e, corpus_version, now)]
+        expires = min((e.created_at for e in live), default=now) + self.ttl_seconds
+        payload = build({e.query: e.value for e in live})
+        self._snapshot_payloads[key] = (corpus_version, version, expires, payload)
+        return payload
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
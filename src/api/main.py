@@ -1,12 +1,22 @@
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
 import asyncio
+import json
 import logging
+import os
 from ..pipeline import NewsPipeline
 from ..embedding import EmbeddingManager
 from ..vectorstore import VectorStore
+from ..filters import message_query_options, query_options
+from ..reranker import CrossEncoderReranker
+from ..metrics import REGISTRY
+from ..coordination import RefreshCoordinator
+from ..subscriptions import SubscriptionHub
+from ..serialization import (JSON, available_encodings, decode, encode, encode_frame, media_type, negotiate,
+                             parse_fields, project, resolve_encoding)
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -29,72 +39,300 @@ app.add_middleware(
 )
 
 # Pydantic models for request/response validation
-class QueryRequest(BaseModel):
-    query: str
+class QueryOptions(BaseModel):
     top_k: Optional[int] = 5
+    # Restrict to these sources (e.g. "BBC") and/or a published-time window
+    sources: Optional[List[str]] = None
+    since: Optional[Union[float, str]] = None  # epoch seconds or ISO 8601
+    until: Optional[Union[float, str]] = None
+    last_hours: Optional[float] = None
+    # Favour recent articles: scores decay by half every N hours
+    recency_half_life_hours: Optional[float] = None
+    # Article fields to return, e.g. ["id", "rank", "metadata.source"] to skip the chunk text
+    fields: Optional[List[str]] = None
+
+    def options(self) -> Dict[str, Any]:
+        return query_options(self.sources, self.since, self.until, self.last_hours, self.recency_half_life_hours)
+
+class QueryRequest(QueryOptions):
+    query: str
+
+class BatchQueryRequest(QueryOptions):
+    # Answered together; the options apply to every query
+    queries: List[str]
 
 class NewsResponse(BaseModel):
     query: str
     summary: str
     articles: List[Dict[str, Any]]
+    prompt_tokens: Optional[int] = None
     timestamp: str
 
 # Global state
 pipeline: Optional[NewsPipeline] = None
+coordinator: Optional[RefreshCoordinator] = None
+hub: Optional[SubscriptionHub] = None
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize components on startup"""
-    global pipeline
+    """Initialize components on startup
+
+    Models, the vector store and the LLM client load lazily, so the server
+    accepts requests immediately; warm-up and the initial refresh run in the
+    background and /ready reports when the components are loaded.
+
+    With several worker processes (API_WORKERS, see run_api.py) they share the
+    on-disk index: the worker that wins the refresh lock opens it writable and
+    runs the refreshes, the others open it read-only and reload it whenever the
+    leader bumps the index version.
+    """
+    global pipeline, coordinator, hub
     try:
-        embedding_manager = EmbeddingManager()
-        vector_store = VectorStore()
-        pipeline = NewsPipeline(vector_store, embedding_manager)
-        # Initial refresh of news
-        await pipeline.refresh_news()
-        # Start background task for periodic refresh
-        asyncio.create_task(periodic_refresh())
+        # EMBEDDING_BACKEND=onnx|int8 runs the embedding model on ONNX Runtime, EMBEDDING_THREADS caps its threads
+        embedding_threads = int(os.environ["EMBEDDING_THREADS"]) if os.getenv("EMBEDDING_THREADS") else None
+        embedding_manager = EmbeddingManager(backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+                                             threads=embedding_threads)
+        # Search is served from the versioned in-process NumPy index (VECTOR_BACKEND=numpy);
+        # VECTOR_BACKEND=partitioned splits it per day with VECTOR_RETENTION_DAYS of retention, and
+        # VECTOR_BACKEND=chroma keeps ChromaDB, whose refreshes write in place (no atomic swap or rebuild)
+        backend = os.getenv("VECTOR_BACKEND", "numpy")
+        backend_options = {}
+        if backend == "partitioned" and os.getenv("VECTOR_RETENTION_DAYS"):
+            backend_options["retention_days"] = float(os.environ["VECTOR_RETENTION_DAYS"])
+        vector_store = VectorStore(backend=backend, **backend_options)
+        # REFRESH_INTERVAL_SECONDS between refreshes, run only by the worker holding the refresh lock
+        coordinator = RefreshCoordinator(vector_store.persist_directory,
+                                         refresh_interval=float(os.getenv("REFRESH_INTERVAL_SECONDS", "3600")))
+        vector_store.read_only = not coordinator.try_lead()
+        # RERANK_MODEL=cross-encoder/ms-marco-MiniLM-L-6-v2 re-scores RERANK_CANDIDATES hits per query
+        reranker = None
+        if os.getenv("RERANK_MODEL"):
+            reranker = CrossEncoderReranker(os.environ["RERANK_MODEL"],
+                                            latency_budget_ms=float(os.getenv("RERANK_BUDGET_MS", "150")))
+        rerank_candidates = int(os.environ["RERANK_CANDIDATES"]) if os.getenv("RERANK_CANDIDATES") else None
+        # DEDUP_THRESHOLD=0.8 drops near-duplicate chunks before embedding (their sources are not kept)
+        dedup_threshold = float(os.environ["DEDUP_THRESHOLD"]) if os.getenv("DEDUP_THRESHOLD") else None
+        pipeline = NewsPipeline(vector_store, embedding_manager, reranker=reranker,
+                                rerank_candidates=rerank_candidates, dedup_threshold=dedup_threshold)
+        # WebSocket subscribers get the new chunks of every refresh (or, in a follower, every reload)
+        hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution,
+                              max_pending=int(os.getenv("WS_MAX_PENDING_MESSAGES", "64")))
+        pipeline.add_delta_listener(hub.publish)
+        # Warm-up, initial refresh and periodic refresh run in the background
+        asyncio.create_task(background_startup())
     except Exception as e:
         logger.error(f"Startup failed: {e}")
         raise
 
-async def periodic_refresh():
-    """Background task to refresh news periodically"""
-    while True:
-        try:
-            await asyncio.sleep(3600)  # 1 hour
-            await pipeline.refresh_news()
-        except Exception as e:
-            logger.error(f"Refresh failed: {e}")
+async def background_startup():
+    """Warm up the components (unless WARM_UP=0), then refresh (leader) or follow index versions"""
+    if os.getenv("WARM_UP", "1") != "0":
+        await pipeline.warm_up()
+    await coordinator.run(pipeline)
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"status": "healthy", "service": "NewsRAG API"}
 
-@app.post("/api/query", response_model=NewsResponse)
-async def query_news(request: QueryRequest):
-    """Query the news database"""
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the model, vector store and LLM client are loaded, else 503"""
+    if pipeline is None:
+        return JSONResponse({"ready": False, "components": {}}, status_code=503)
+    report = pipeline.readiness()
+    if coordinator is not None:
+        report["refresh"].update(coordinator.status())
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Stage timings, batch sizes, cache hit rates, queue depths and refresh durations for Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/index/rollback")
+async def rollback_index():
+    """Switch the index back to its previous generation (served by the refresh leader only)"""
+    if pipeline is None or coordinator is None:
+        raise HTTPException(status_code=503, detail="Pipeline is not initialised")
+    if not coordinator.is_leader:
+        raise HTTPException(status_code=409, detail="This worker is not the refresh leader")
+    try:
+        generation = await coordinator.rollback(pipeline)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"index_generation": generation, "index_version": coordinator.loaded_version}
+
+# The body is serialized by the pipeline (and may be msgpack or field-projected), so NewsResponse
+# only documents the full JSON shape; FastAPI does not validate the returned bytes against it
+@app.post("/api/query", response_class=Response, responses={200: {
+    "model": NewsResponse,
+    "description": "The answer and its articles, as JSON or, with Accept: application/msgpack, as msgpack",
+    "content": {"application/msgpack": {}},
+}})
+async def query_news(request: QueryRequest, http_request: Request):
+    """Query the news database
+
+    The response is JSON, or msgpack when the Accept header asks for
+    application/msgpack (and it is installed). Cached answers are served from
+    their stored serialized bytes.
+    """
     try:
-        results = await pipeline.query_news(request.query, request.top_k)
-        return results
+        options = request.options()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    encoding = negotiate(http_request.headers.get("accept"))
+    try:
+        payload = await pipeline.query_news_payload(request.query, request.top_k, **options, encoding=encoding,
+                                                    fields=parse_fields(request.fields))
     except Exception as e:
         logger.error(f"Query failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    return Response(payload, media_type=media_type(encoding), headers={"Vary": "Accept"})
+
+async def sse_events(events: AsyncIterator[Dict[str, Any]], fields=None):
+    """Format pipeline events (query_news_stream, query_news_batch) as Server-Sent Events"""
+    try:
+        async for event in events:
+            yield f"event: {event['type']}\ndata: {encode(project(event['data'], fields)).decode('utf-8')}\n\n"
+    except Exception as e:
+        logger.error(f"Streaming query failed: {e}")
+        yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], fields: Optional[List[str]] = None) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(events, parse_fields(fields)),
+        media_type="text/event-stream",
+        # Disable proxy buffering so each event reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/query/stream")
+async def query_news_stream(query: str, top_k: int = 5, sources: Optional[List[str]] = Query(None),
+                            since: Optional[str] = None, until: Optional[str] = None,
+                            last_hours: Optional[float] = None, recency_half_life_hours: Optional[float] = None,
+                            fields: Optional[List[str]] = Query(None)):
+    """Stream a query as Server-Sent Events (EventSource compatible)
+
+    Sends an `articles` event as soon as retrieval finishes, `summary_delta`
+    events as LLM tokens arrive and a final `query_result` event. Accepts the
+    same filters and article `fields` as POST /api/query (`sources` and
+    `fields` may be repeated or comma separated).
+    """
+    try:
+        options = query_options(sources, since, until, last_hours, recency_half_life_hours)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sse_response(pipeline.query_news_stream(query, top_k, **options), fields)
+
+@app.post("/api/query/stream")
+async def query_news_stream_post(request: QueryRequest):
+    """Same as GET /api/query/stream with a JSON body"""
+    try:
+        options = request.options()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sse_response(pipeline.query_news_stream(request.query, request.top_k, **options), request.fields)
+
+@app.post("/api/query/batch")
+async def query_news_batch(request: BatchQueryRequest):
+    """Answer several queries at once, streamed as Server-Sent Events
+
+    The queries are embedded and searched together and their LLM calls run
+    concurrently. Sends a `batch_result` event per query as soon as it is
+    answered (in completion order; `index` gives the query's position) and a
+    final `batch_done` event.
+    """
+    try:
+        options = request.options()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not request.queries or len(request.queries) > pipeline.max_batch_queries:
+        raise HTTPException(status_code=400,
+                            detail=f"Send between 1 and {pipeline.max_batch_queries} queries")
+    return sse_response(pipeline.query_news_batch(request.queries, request.top_k, **options), request.fields)
+
+async def receive_message(websocket: WebSocket, encoding: str) -> Dict[str, Any]:
+    """Next message from a WebSocket: text frames are JSON, binary frames use the connection's encoding"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is not None:
+        return decode(message["text"], JSON)
+    return decode(message["bytes"], encoding)
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """Queries, batches, streams and subscriptions over one connection
+
+    The connection receives JSON text frames unless it asks for msgpack binary
+    frames, either when connecting (`/ws?encoding=msgpack&fields=id,rank`) or
+    with a `configure` message; `fields` limits the article fields of every
+    result (a message may bring its own `fields`). Per-message compression is
+    negotiated by the server (WS_COMPRESSION, see run_api.py).
+    """
     await websocket.accept()
+
+    async def send(frame):
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+    client_id = hub.connect(send, encoding=resolve_encoding(websocket.query_params.get("encoding")),
+                            fields=parse_fields(websocket.query_params.getlist("fields")))
+    connection = hub.clients[client_id]
+
+    async def send_message(message: Dict[str, Any], fields=None):
+        await send(encode_frame(message, connection.encoding, fields or connection.fields))
+
     try:
         while True:
-            data = await websocket.receive_json()
-            if data["type"] == "query":
-                results = await pipeline.query_news(data["query"])
-                await websocket.send_json({
-                    "type": "query_result",
-                    "data": results
-                })
+            data = await receive_message(websocket, connection.encoding)
+            fields = parse_fields(data["fields"]) if "fields" in data else connection.fields
+            if data["type"] == "configure":
+                hub.configure(client_id, resolve_encoding(data.get("encoding")), parse_fields(data.get("fields")))
+                await send_message({"type": "configured", "data": {
+                    "encoding": connection.encoding, "fields": list(connection.fields or []) or None,
+                    "available": available_encodings()
+                }})
+                continue
+            if data["type"] in ("subscribe", "unsubscribe"):
+                # subscription_update frames follow whenever a refresh adds matching chunks
+                try:
+                    await send_message(await hub.handle(client_id, data))
+                except (ValueError, KeyError) as e:
+                    await send_message({"type": "error", "data": str(e)})
+                continue
+            if data["type"] in ("query", "batch_query"):
+                top_k = data.get("top_k", 5)
+                try:
+                    options = message_query_options(data)
+                except ValueError as e:
+                    await send_message({"type": "error", "data": str(e)})
+                    continue
+                if data["type"] == "batch_query":
+                    # a batch_result frame per query as it is answered, then batch_done
+                    try:
+                        async for event in pipeline.query_news_batch(data["queries"], top_k, **options):
+                            await send_message(event, fields)
+                    except ValueError as e:
+                        await send_message({"type": "error", "data": str(e)})
+                    continue
+                if data.get("stream"):
+                    # articles, then summary_delta frames, then the full query_result
+                    async for event in pipeline.query_news_stream(data["query"], top_k, **options):
+                        await send_message(event, fields)
+                    continue
+                # Cached answers come with their serialized frame
+                await send(await pipeline.query_news_payload(data["query"], top_k, **options,
+                                                             encoding=connection.encoding, fields=fields,
+                                                             message_type="query_result"))
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        await websocket.close()
\ No newline at end of file
+        await websocket.close()
+    finally:
+        hub.disconnect(client_id)
@@ -0,0 +1,92 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .embedding import EmbeddingManager
+from .execution import ExecutionLayer
+
+#USE
+#batcher = EmbeddingBatcher(embedding_manager, execution, max_batch_size=32, max_wait_ms=5)
+#query_embedding = await batcher.embed("latest election results")
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into a single model.encode call
+
+    Query texts arriving within `max_wait_ms` of the first pending one (or until
+    `max_batch_size` texts are pending) are encoded together, and every caller gets
+    its own row back. A lone query waits at most `max_wait_ms`.
+    """
+    def __init__(self, embedding_manager: EmbeddingManager,
+                 execution: Optional[ExecutionLayer] = None,
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0):
+        """
+        Args:
+            embedding_manager: Manager used to encode each coalesced batch
+            execution: Execution layer the encode runs on (a private one if omitted)
+            max_batch_size: Flush as soon as this many queries are pending
+            max_wait_ms: Flush this long after the first query of a batch arrived
+        """
+        self.embedding_manager = embedding_manager
+        self.execution = execution or ExecutionLayer()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.batched_queries = 0
+        self.largest_batch = 0
+
+    def pending(self) -> int:
+        """Queries waiting for the next batch to be flushed"""
+        return len(self._pending)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Return the embedding for one query text, batched with concurrent callers"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches += 1
+        self.batched_queries += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            embeddings = await self.execution.run_cpu(
+                "query_embed", self.embedding_manager.generate_embeddings,
+                [text for text, _ in batch], is_query=True
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "largest_batch": self.largest_batch,
+            "mean_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+        }
@@ -1,6 +1,12 @@
 ###  Chunking 
+import logging
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
 # USE
 #chunks=split_documents(all_documents)
 
@@ -13,13 +19,12 @@ def split_documents(documents,chunk_size=1000,chunk_overlap=200):
         length_function=len,
         separators=["\n\n", "\n", " ", ""]
     )
-    split_docs = text_splitter.split_documents(documents)
-    print(f"Split {len(documents)} documents into {len(split_docs)} chunks")
+    with stage_timer("chunk", batch_size=len(documents)):
+        split_docs = text_splitter.split_documents(documents)
+    logger.debug("Split %d documents into %d chunks", len(documents), len(split_docs))
 
     # Show example of a chunk
-    if split_docs:
-        print(f"\nExample chunk:")
-        print(f"Content: {split_docs[0].page_content[:200]}...")
-        print(f"Metadata: {split_docs[0].metadata}")
+    if split_docs and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Example chunk: %s... metadata=%s", split_docs[0].page_content[:200], split_docs[0].metadata)
 
     return split_docs
@@ -0,0 +1,182 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .lexical_index import tokenize
+
+#USE
+#builder = ContextBuilder(max_tokens=1500)
+#packed = builder.build(query, retrieved_docs)
+#packed.text, packed.tokens, packed.input_tokens   # prompt context and its size before/after packing
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate subword token count: one per punctuation mark, one per ~4 characters of a word
+
+    Close enough to BPE tokenizers on English news text to budget prompts
+    without loading the model's tokenizer.
+    """
+    return sum(math.ceil(len(token) / 4) for token in _TOKEN_RE.findall(text))
+
+
+def overlap_length(left: str, right: str, max_overlap: int = 200, min_overlap: int = 20) -> int:
+    """Length of the longest suffix of `left` (at most max_overlap chars) that starts `right`"""
+    probe = right[:min_overlap]
+    if not probe:
+        return 0
+    position = left.find(probe, max(0, len(left) - max_overlap))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+@dataclass
+class ContextSpan:
+    """Consecutive chunks of one source, merged with their overlap removed"""
+    text: str
+    priority: int
+    chunk_ids: List[str]
+    source: Optional[str]
+
+
+@dataclass
+class PackedContext:
+    """LLM context assembled from retrieved chunks, with its size before and after packing"""
+    text: str
+    tokens: int
+    input_tokens: int
+    chunks: int
+    spans: int
+    truncated: bool = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"context_tokens": self.tokens, "input_tokens": self.input_tokens, "chunks": self.chunks,
+                "spans": self.spans, "truncated": self.truncated}
+
+
+class ContextBuilder:
+    """Packs retrieved chunks into a token-budgeted prompt context
+
+    Chunks of the same source (and page) that overlap are stitched back into a
+    single span, dropping the text split_documents repeated at every chunk
+    boundary. Spans are then added best-ranked first while they fit the budget;
+    the first span that does not fit is cut down to its sentences with the most
+    query terms, kept in reading order, and everything after it is left out.
+    """
+    def __init__(self, max_tokens: Optional[int] = 1500, max_overlap: int = 200, min_overlap: int = 20,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            max_tokens: Context token budget (None only merges and de-overlaps)
+            max_overlap: Longest overlap searched for between neighbouring chunks (the chunk_overlap)
+            min_overlap: Shortest suffix/prefix match treated as a chunk boundary
+            token_counter: Function returning the token count of a text
+        """
+        self.max_tokens = max_tokens
+        self.max_overlap = max_overlap
+        self.min_overlap = min_overlap
+        self.count_tokens = token_counter
+
+    def build(self, query: str, documents: List[Dict[str, Any]]) -> PackedContext:
+        """
+        Assemble the context for `query` from ranked retrieval results
+
+        Args:
+            query: The user query, used to score sentences when a span must be cut
+            documents: Retrieved documents, best first (dicts with content, metadata and optionally id)
+
+        Returns:
+            PackedContext with the text and its token counts
+        """
+        input_tokens = sum(self.count_tokens(doc['content']) for doc in documents)
+        spans = self.merge(documents)
+        separator_tokens = self.count_tokens("\n\n")
+        parts: List[str] = []
+        used_tokens = 0
+        chunks = 0
+        truncated = False
+        for span in spans:
+            cost = self.count_tokens(span.text) + (separator_tokens if parts else 0)
+            if self.max_tokens is None or used_tokens + cost <= self.max_tokens:
+                parts.append(span.text)
+                used_tokens += cost
+                chunks += len(span.chunk_ids)
+                continue
+            truncated = True
+            remaining = self.max_tokens - used_tokens - (separator_tokens if parts else 0)
+            excerpt = self._best_sentences(query, span.text, remaining)
+            if excerpt:
+                parts.append(excerpt)
+                chunks += len(span.chunk_ids)
+            break
+        text = "\n\n".join(parts)
+        return PackedContext(text=text, tokens=self.count_tokens(text), input_tokens=input_tokens,
+                             chunks=chunks, spans=len(parts), truncated=truncated)
+
+    def merge(self, documents: List[Dict[str, Any]]) -> List[ContextSpan]:
+        """Stitch overlapping chunks of the same source into spans, ordered by their best rank"""
+        groups: Dict[Tuple, List[Tuple[int, Dict[str, Any]]]] = {}
+        for priority, doc in enumerate(documents):
+            metadata = doc.get('metadata') or {}
+            key = (metadata.get('source'), metadata.get('page'))
+            groups.setdefault(key, []).append((priority, doc))
+
+        spans: List[ContextSpan] = []
+        for (source, _), members in groups.items():
+            texts = [doc['content'] for _, doc in members]
+            # successor[i] = (j, overlap) when chunk j continues chunk i
+            successor: Dict[int, Tuple[int, int]] = {}
+            has_predecessor = set()
+            for i, left in enumerate(texts):
+                for j, right in enumerate(texts):
+                    if i == j or j in has_predecessor:
+                        continue
+                    overlap = overlap_length(left, right, self.max_overlap, self.min_overlap)
+                    if overlap:
+                        successor[i] = (j, overlap)
+                        has_predecessor.add(j)
+                        break
+            visited = set()
+            for start in range(len(texts)):
+                if start in has_predecessor:
+                    continue
+                chain = [start]
+                text = texts[start]
+                while chain[-1] in successor and successor[chain[-1]][0] not in visited | set(chain):
+                    following, overlap = successor[chain[-1]]
+                    text += texts[following][overlap:]
+                    chain.append(following)
+                visited.update(chain)
+                spans.append(self._span(text, chain, members, source))
+            # A cycle of mutually overlapping chunks has no start; keep its chunks as they are
+            for i in range(len(texts)):
+                if i not in visited:
+                    spans.append(self._span(texts[i], [i], members, source))
+        return sorted(spans, key=lambda span: span.priority)
+
+    @staticmethod
+    def _span(text: str, chain: List[int], members, source) -> ContextSpan:
+        return ContextSpan(text=text, priority=min(members[i][0] for i in chain),
+                           chunk_ids=[members[i][1].get('id') for i in chain], source=source)
+
+    def _best_sentences(self, query: str, text: str, budget: int) -> str:
+        """Highest scoring sentences of `text` that fit `budget` tokens, in their original order"""
+        if budget <= 0:
+            return ""
+        sentences = [s for s in _SENTENCE_RE.split(text) if s.strip()]
+        terms = set(tokenize(query))
+        scored = sorted(range(len(sentences)),
+                        key=lambda i: (-len(terms.intersection(tokenize(sentences[i]))), i))
+        chosen, used = [], 0
+        for i in scored:
+            cost = self.count_tokens(sentences[i]) + (1 if chosen else 0)
+            if used + cost <= budget:
+                chosen.append(i)
+                used += cost
+        return " ".join(sentences[i] for i in sorted(chosen))
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .metrics import INDEX_VERSION, REFRESH_LEADER, REGISTRY
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+#USE
+#coordinator = RefreshCoordinator("data/vector_store", refresh_interval=3600)
+#pipeline = NewsPipeline(VectorStore(backend="numpy", read_only=not coordinator.try_lead()), embedding_manager)
+#await coordinator.run(pipeline)   # the leader refreshes and bumps the index version, the others reload
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Exclusive, non-blocking advisory lock on a file
+
+    The operating system drops the lock when the holding process exits, even if
+    it crashes, so another process can take over on its next acquire().
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Take the lock if it is free; True if this process holds it"""
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        # The holder's pid, for whoever wonders which worker is the leader
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+
+class IndexVersion:
+    """Version counter of the on-disk index, kept in a small JSON file
+
+    The refresh leader bumps it after its writes are flushed; other processes
+    compare it with the version they loaded to know when to reload.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def read(self) -> int:
+        try:
+            return int(json.loads(self.path.read_text(encoding="utf-8"))["version"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def bump(self) -> int:
+        """Increment the version (atomically replacing the file) and return it"""
+        version = self.read() + 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"version": version, "updated_at": time.time(), "pid": os.getpid()}),
+                            encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        return version
+
+
+class RefreshCoordinator:
+    """Runs refreshes in exactly one of several processes serving the same index
+
+    Every serving worker runs one coordinator on the shared store directory.
+    The worker holding the leader lock refreshes every `refresh_interval`
+    seconds and, once a refresh that changed the corpus has committed its
+    index generation, bumps the index version; the others open the store
+    read-only and, every `poll_interval` seconds, reload it when the version
+    moved. If the leader dies its lock is released and the next worker to poll
+    takes over, re-opening its store writable.
+    """
+    LOCK_FILE = "refresh.lock"
+    VERSION_FILE = "index_version.json"
+
+    def __init__(self, directory: str, refresh_interval: float = 3600, poll_interval: float = 5.0):
+        """
+        Args:
+            directory: Directory of the shared store (the lock and version files live there)
+            refresh_interval: Seconds between refreshes run by the leader
+            poll_interval: Seconds between leadership attempts and version checks
+        """
+        self.lock = LeaderLock(os.path.join(directory, self.LOCK_FILE))
+        self.version = IndexVersion(os.path.join(directory, self.VERSION_FILE))
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self.loaded_version = self.version.read()
+        self.last_refresh_at: Optional[float] = None
+        self.reloads = 0
+        REGISTRY.register_collector(self._collect_metrics)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    def try_lead(self) -> bool:
+        """Take the leader lock if it is free; True if this worker is the leader"""
+        return self.lock.acquire()
+
+    async def step(self, pipeline) -> str:
+        """One round for this worker's NewsPipeline: refresh if leading and due, else reload on a version bump
+
+        Returns:
+            "refreshed", "reloaded" or "idle"
+        """
+        was_leader = self.is_leader
+        if self.try_lead():
+            if not was_leader and pipeline.vector_store.read_only:
+                # Took over from a leader that went away: continue from what it flushed, writable
+                logger.info("Became the refresh leader (pid %d)", os.getpid())
+                await pipeline.reload_index(read_only=False)
+                self.loaded_version = self.version.read()
+            due = self.last_refresh_at is None or time.monotonic() - self.last_refresh_at >= self.refresh_interval
+            if not due:
+                return "idle"
+            self.last_refresh_at = time.monotonic()
+            # A failed refresh discards its generation, and one with nothing to do commits none:
+            # only a committed change is announced, so followers keep their index and answer cache
+            stats = await pipeline.refresh_news()
+            if stats["committed"]:
+                self.loaded_version = self.version.bump()
+            return "refreshed"
+
+        version = self.version.read()
+        if version == self.loaded_version:
+            return "idle"
+        await pipeline.reload_index()
+        self.loaded_version = version
+        self.reloads += 1
+        logger.info("Reloaded the index at version %d", version)
+        return "reloaded"
+
+    async def rollback(self, pipeline) -> int:
+        """Roll the shared index back to its previous generation and have the other workers reload it
+
+        Returns:
+            The number of the now current generation
+        """
+        if not self.is_leader:
+            raise RuntimeError("Only the refresh leader can roll the index back")
+        generation = await pipeline.rollback_index()
+        self.loaded_version = self.version.bump()
+        return generation
+
+    async def run(self, pipeline):
+        """Coordinate until cancelled"""
+        while True:
+            try:
+                await self.step(pipeline)
+            except Exception as e:
+                logger.error(f"Refresh coordination failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def close(self):
+        self.lock.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {"role": "leader" if self.is_leader else "follower", "index_version": self.loaded_version,
+                "reloads": self.reloads}
+
+    def _collect_metrics(self):
+        INDEX_VERSION.set(self.loaded_version)
+        REFRESH_LEADER.set(1 if self.is_leader else 0)
@@ -1,58 +1,345 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PyMuPDFLoader
 import requests
+import httpx
+import asyncio
 from bs4 import BeautifulSoup
 import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from dataclasses import dataclass
 from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from .lexical_index import BM25Index
+from .file_loaders import LOCAL_FILE_LOADERS, LoadedFile, init_loader_worker, load_file, load_file_worker
+from .metrics import STAGE_ERRORS, stage_timer
 
 logger = logging.getLogger(__name__)
 
+BBC_NEWS_URL = "https://www.bbc.com/news"
+
+def parse_headlines(html, source) -> List[Document]:
+    """Extract one Document per headline element matched by the source's CSS selector"""
+    soup = BeautifulSoup(html, "html.parser")
+    documents = []
+    for heading in soup.select(source.selector):
+        content = heading.get_text(strip=True)
+        if content:
+            documents.append(Document(
+                page_content=content,
+                metadata={'source': source.name, 'url': source.url}
+            ))
+    return documents
+
+@dataclass
+class NewsSource:
+    """A web page that news documents are fetched from"""
+    name: str
+    url: str
+    selector: str = "h3"
+    parser: Callable[[str, "NewsSource"], List[Document]] = parse_headlines
+    timeout: float = 10.0
+
+DEFAULT_SOURCES = [
+    NewsSource(name="BBC", url=BBC_NEWS_URL, selector="h3"),
+]
+
 def scrape_bbc_headlines():
+    """Blocking fetch of the BBC headlines, for scripts without an event loop"""
+    source = DEFAULT_SOURCES[0]
     try:
-        url = "https://www.bbc.com/news"
-        response = requests.get(url, timeout=10)
+        response = requests.get(source.url, timeout=source.timeout)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        documents = []
-        for heading in soup.select("h3"):
-            content = heading.get_text(strip=True)
-            documents.append({
-                'page_content': content,
-                'metadata': {'source': 'BBC'}
-            })
-        return documents
+        return source.parser(response.text, source)
     except requests.RequestException as e:
         logger.error(f"Failed to fetch BBC headlines: {e}")
         return []
 
-def process_all_docs(data_directory):
-    data_path = Path(data_directory)
-    if not data_path.exists():
+class _HostLimiter:
+    """Caps concurrent requests to one host and spaces out their start times"""
+    def __init__(self, max_concurrency: int, min_interval: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.min_interval = min_interval
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            delay = self.next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_start = max(loop.time(), self.next_start) + self.min_interval
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+class SourceFetcher:
+    """Fetches many news sources concurrently over one pooled async HTTP client
+
+    Each source's ETag / Last-Modified validators are remembered, so the next fetch
+    is a conditional request and an unchanged page (304) costs no download or parse.
+    Requests to the same host are limited in concurrency and spaced by
+    `min_host_interval` seconds. A failing source is logged and skipped.
+    """
+    def __init__(self, sources: Optional[List[NewsSource]] = None,
+                 max_connections: int = 20,
+                 per_host_concurrency: int = 2,
+                 min_host_interval: float = 1.0,
+                 execution=None,
+                 client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            sources: Sources to fetch (defaults to DEFAULT_SOURCES)
+            max_connections: Size of the shared connection pool
+            per_host_concurrency: Maximum in-flight requests per host
+            min_host_interval: Minimum seconds between request starts to the same host
+            execution: Optional ExecutionLayer used to parse pages off the event loop
+            client: Pre-configured client to use instead of creating one
+        """
+        self.sources = list(DEFAULT_SOURCES if sources is None else sources)
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.min_host_interval = min_host_interval
+        self.execution = execution
+        self._client = client
+        self._host_limiters: Dict[str, _HostLimiter] = {}
+        self.validators: Dict[str, Dict[str, str]] = {}
+        self.not_modified = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                follow_redirects=True,
+                headers={"User-Agent": "NewsRAG/0.1 (+https://github.com/vatsalpjain/Agentic-News-App)"},
+            )
+        return self._client
+
+    def _limiter(self, url: str) -> _HostLimiter:
+        host = httpx.URL(url).host
+        if host not in self._host_limiters:
+            self._host_limiters[host] = _HostLimiter(self.per_host_concurrency, self.min_host_interval)
+        return self._host_limiters[host]
+
+    async def fetch(self, source: NewsSource) -> List[Document]:
+        """Fetch and parse one source; returns [] if it is unchanged or failed"""
+        with stage_timer("scrape"):
+            return await self._fetch(source)
+
+    async def _fetch(self, source: NewsSource) -> List[Document]:
+        headers = {}
+        validators = self.validators.get(source.url, {})
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        try:
+            async with self._limiter(source.url):
+                response = await self.client.get(source.url, headers=headers, timeout=source.timeout)
+            if response.status_code == 304:
+                self.not_modified += 1
+                logger.info(f"{source.name} unchanged since last fetch")
+                return []
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            STAGE_ERRORS.inc(stage="scrape")
+            logger.error(f"Failed to fetch {source.name} ({source.url}): {e!r}")
+            return []
+
+        self.validators[source.url] = {
+            key: response.headers[header]
+            for key, header in (("etag", "etag"), ("last_modified", "last-modified"))
+            if header in response.headers
+        }
+        # Parsing is CPU work, keep it off the event loop
+        if self.execution is not None:
+            return await self.execution.run_cpu("chunk", source.parser, response.text, source)
+        return await asyncio.to_thread(source.parser, response.text, source)
+
+    async def fetch_all(self) -> List[Document]:
+        """Fetch every configured source concurrently"""
+        results = await asyncio.gather(*(self.fetch(source) for source in self.sources))
+        return [doc for docs in results for doc in docs]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+async def fetch_sources(sources: Optional[List[NewsSource]] = None) -> List[Document]:
+    """Fetch news sources (DEFAULT_SOURCES if None) concurrently with a one-off SourceFetcher"""
+    fetcher = SourceFetcher(sources)
+    try:
+        return await fetcher.fetch_all()
+    finally:
+        await fetcher.aclose()
+
+async def aprocess_all_docs(data_directory, sources: Optional[List[NewsSource]] = None) -> List[Document]:
+    """Load every local file and news source
+
+    Files are parsed by a ParallelDocumentLoader and the sources fetched
+    concurrently by a SourceFetcher, like a refresh does; a file or source
+    that fails is logged and skipped.
+
+    Args:
+        data_directory: Directory searched for TXT/PDF files
+        sources: News sources to fetch (defaults to DEFAULT_SOURCES)
+    """
+    if not Path(data_directory).exists():
         logger.warning(f"Directory not found: {data_directory}")
         return []
     all_documents = []
+    loader = ParallelDocumentLoader()
     try:
-        # Load local TXT documents
-        txt_loader = DirectoryLoader(data_directory, glob="**/*.txt", loader_cls=TextLoader, show_progress=False)
-        all_documents.extend(txt_loader.load())
-        # Load local PDF documents
-        pdf_loader = DirectoryLoader(data_directory, glob="**/*.pdf", loader_cls=PyMuPDFLoader, show_progress=False)
-        all_documents.extend(pdf_loader.load())
-        # Add scraped BBC headlines
-        news_docs = scrape_bbc_headlines()
-        all_documents.extend(news_docs)
-        print(f"✓ Loaded All {len(all_documents)} documents")
-    except Exception as e:
-        print(f"✗ Error: {e}")
+        async for loaded in loader.aload(list_local_files(data_directory)):
+            if loaded.error is not None:
+                logger.error("Loading %s failed: %s", loaded.path, loaded.error)
+                continue
+            all_documents.extend(loaded.documents)
+    finally:
+        loader.shutdown()
+    all_documents.extend(await fetch_sources(sources))
+    logger.info("Loaded %d documents", len(all_documents))
     return all_documents
 
+def process_all_docs(data_directory, sources: Optional[List[NewsSource]] = None) -> List[Document]:
+    """aprocess_all_docs for scripts without an event loop
+
+    Raises:
+        RuntimeError: When called from a running event loop (await aprocess_all_docs there)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(aprocess_all_docs(data_directory, sources))
+    raise RuntimeError("process_all_docs cannot run inside an event loop; await aprocess_all_docs instead")
+
+def list_local_files(data_directory) -> List[Path]:
+    """List the local files that process_all_docs would load, in a stable order"""
+    data_path = Path(data_directory)
+    if not data_path.exists():
+        logger.warning(f"Directory not found: {data_directory}")
+        return []
+    return sorted(
+        path for path in data_path.rglob("*")
+        if path.is_file() and path.suffix.lower() in LOCAL_FILE_LOADERS
+    )
+
+class ParallelDocumentLoader:
+    """Loads local TXT/PDF files across a process pool, yielding each file as it finishes
+
+    The pool is created on first use and kept for the loader's lifetime, so worker
+    start-up and the PyMuPDF import are paid once. Small batches are loaded in the
+    calling process, where a pool would cost more than it saves. When a manifest is
+    given, files whose mtime and size match the last run are skipped.
+    """
+    def __init__(self, max_workers: Optional[int] = None, manifest=None,
+                 min_parallel_files: int = 8, mp_context: Optional[str] = None,
+                 max_in_flight: Optional[int] = None):
+        """
+        Args:
+            max_workers: Worker processes (defaults to the CPU count)
+            manifest: IngestionManifest used to skip unchanged files
+            min_parallel_files: Below this many files, load in-process
+            mp_context: multiprocessing start method for the workers; defaults to
+                forkserver where available, so the parent's already imported modules
+                are loaded once by the server instead of once per worker
+            max_in_flight: Files submitted to the pool at once (defaults to 2 per worker)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.manifest = manifest
+        self.min_parallel_files = min_parallel_files
+        self.mp_context = mp_context or (
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        )
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=init_loader_worker,
+            )
+        return self._pool
+
+    def changed_files(self, paths) -> List[Tuple[Path, os.stat_result]]:
+        """Paths (with their stat) that are new or changed since the last run"""
+        changed = []
+        for path in paths:
+            stat = Path(path).stat()
+            if self.manifest is None or not self.manifest.is_unchanged(str(path), stat):
+                changed.append((Path(path), stat))
+        return changed
+
+    def _parallel(self, paths) -> bool:
+        return self.max_workers > 1 and len(paths) >= self.min_parallel_files
+
+    def iter_load(self, paths) -> Iterator[LoadedFile]:
+        """Load files, yielding each one as soon as it has been parsed
+
+        At most `max_in_flight` files are submitted at a time, so a consumer that
+        stops pulling also stops the workers instead of letting results pile up.
+        """
+        paths = [str(path) for path in paths]
+        if not self._parallel(paths):
+            for path in paths:
+                yield load_file_worker(path)
+            return
+        pool = self._get_pool()
+        remaining = iter(paths)
+        pending = set()
+        for path in islice(remaining, self.max_in_flight):
+            pending.add(pool.submit(load_file_worker, path))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path in islice(remaining, 1):
+                    pending.add(pool.submit(load_file_worker, path))
+                yield future.result()
+
+    async def aload(self, paths, execution=None) -> AsyncIterator[LoadedFile]:
+        """Async iter_load; in-process loads run on the execution layer if given"""
+        paths = [str(path) for path in paths]
+        if not self._parallel(paths):
+            for path in paths:
+                if execution is not None:
+                    yield await execution.run_cpu("chunk", load_file_worker, path)
+                else:
+                    yield await asyncio.to_thread(load_file_worker, path)
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        remaining = iter(paths)
+        pending = set()
+        for path in islice(remaining, self.max_in_flight):
+            pending.add(loop.run_in_executor(pool, load_file_worker, path))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                for path in islice(remaining, 1):
+                    pending.add(loop.run_in_executor(pool, load_file_worker, path))
+                yield future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
 def search_documents(all_documents, query, max_results=10):
-    results = []
-    query_lower = query.lower()
-    for doc in all_documents:
-        # Support both dict-type docs (scraped) and LangChain Documents (files)
-        content = doc['page_content'] if isinstance(doc, dict) else doc.page_content
-        if query_lower in content.lower():
-            results.append(doc)
-        if len(results) >= max_results:
-            break
-    return results
+    """Rank documents against a query with BM25
+
+    For ad-hoc lists; ingested chunks are searched through the persistent index
+    with VectorStore.lexical_search instead of re-indexing on every call.
+    """
+    index = BM25Index()
+    # Support both dict-type docs (scraped) and LangChain Documents (files)
+    index.add((str(i) for i in range(len(all_documents))),
+              (doc['page_content'] if isinstance(doc, dict) else doc.page_content for doc in all_documents))
+    return [all_documents[int(i)] for i, _ in index.search(query, top_k=max_results)]
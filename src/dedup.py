@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+#USE
+#dedup = NearDuplicateIndex("data/vector_store/near_duplicates.npz", threshold=0.8)
+#canonical = dedup.check_and_add(chunk_id, text)   # None if new, else the ID it duplicates
+#dedup.save()
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Lowercased word n-grams; texts shorter than `size` words become one shingle"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over shingles with universal hash permutations
+
+    Shingles are hashed with blake2b rather than hash(), so signatures are stable
+    across processes and can be persisted.
+    """
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hashes = np.array([int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+                           for g in grams], dtype=np.uint64)
+        # (a * x + b) mod p for every permutation/shingle pair; uint64 arithmetic wraps, which is fine for hashing
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % _PRIME
+        return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of ingested chunks, used to drop near-duplicates before embedding
+
+    Signatures are split into `bands` bands; chunks sharing any band are
+    candidates, and a candidate counts as a duplicate when the estimated Jaccard
+    similarity of the shingle sets is at least `threshold`. Lookups cost one
+    dictionary probe per band, independent of how many chunks are indexed.
+
+    Dropped chunks are remembered with the chunk they duplicate, so when that
+    canonical chunk is removed, remove() reports them and the caller can ingest
+    them again.
+    """
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.8, num_perm: int = 64,
+                 bands: int = 16, shingle_size: int = 3):
+        """
+        Args:
+            path: .npz file the index is persisted to (in-memory only if None)
+            threshold: Minimum estimated Jaccard similarity for a near-duplicate
+            num_perm: MinHash signature length
+            bands: LSH bands (num_perm must be divisible by it); more bands catch lower similarities
+            shingle_size: Words per shingle
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = Path(path) if path else None
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.duplicates: Dict[str, str] = {}
+        self._buckets: Dict[bytes, Set[str]] = {}
+        self._lock = threading.RLock()
+        self.dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def _insert(self, doc_id: str, signature: np.ndarray):
+        self.signatures[doc_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(doc_id)
+
+    def check_and_add(self, doc_id: str, text: str, ignore: Iterable[str] = ()) -> Optional[str]:
+        """
+        Return the ID of an indexed near-duplicate of `text`, or index it and return None
+
+        Args:
+            doc_id: Chunk ID of the text (a chunk already indexed under this ID is not a duplicate)
+            text: Chunk text
+            ignore: IDs that must not count as duplicates (e.g. chunks the same file is replacing)
+
+        Returns:
+            ID of the canonical chunk if `text` is a near-duplicate, else None
+        """
+        signature = self.hasher.signature(text)
+        with self._lock:
+            if doc_id in self.signatures:
+                return None
+            ignore = set(ignore)
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            best, best_similarity = None, self.threshold
+            for candidate in candidates - ignore:
+                similarity = float(np.mean(self.signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            if best is not None:
+                self.duplicates[doc_id] = best
+            else:
+                self._insert(doc_id, signature)
+            self.dirty = True
+            return best
+
+    def remove(self, ids: Iterable[str]) -> List[str]:
+        """Forget chunks; returns the dropped duplicates whose canonical chunk was removed"""
+        ids = set(ids)
+        with self._lock:
+            for doc_id in ids:
+                self.duplicates.pop(doc_id, None)
+                signature = self.signatures.pop(doc_id, None)
+                if signature is None:
+                    continue
+                self.dirty = True
+                for key in self._band_keys(signature):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(doc_id)
+                        if not bucket:
+                            del self._buckets[key]
+            orphans = [dup for dup, canonical in self.duplicates.items() if canonical in ids]
+            for dup in orphans:
+                del self.duplicates[dup]
+            self.dirty = self.dirty or bool(orphans)
+            return orphans
+
+    def clear(self):
+        """Forget every chunk (for a rebuild of the index from scratch)"""
+        with self._lock:
+            self.dirty = self.dirty or bool(self.signatures or self.duplicates)
+            self.signatures.clear()
+            self.duplicates.clear()
+            self._buckets.clear()
+
+    def load(self):
+        """Load the index from disk, starting empty if it is missing or unreadable"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != self.VERSION or meta.get("num_perm") != self.hasher.num_perm:
+                    return
+                for doc_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                    self._insert(doc_id, signature)
+                self.duplicates = meta["duplicates"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable near-duplicate index %s: %s", self.path, e)
+
+    def save(self):
+        """Atomically write the index if it changed since the last save"""
+        if not self.path or not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            ids = list(self.signatures)
+            signatures = (np.stack([self.signatures[i] for i in ids]) if ids
+                          else np.zeros((0, self.hasher.num_perm), dtype=np.uint64))
+            meta = json.dumps({"version": self.VERSION, "num_perm": self.hasher.num_perm,
+                               "duplicates": self.duplicates})
+            self.dirty = False
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, ids=np.array(ids, dtype=str), signatures=signatures, meta=np.array(meta))
+        os.replace(tmp_path, self.path)
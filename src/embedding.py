@@ -1,32 +1,150 @@
+import logging
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from typing import Dict, Optional
+from .embedding_backends import EMBEDDING_BACKENDS, OnnxEmbeddingModel, load_embedding_model
+from .embedding_cache import LRUEmbeddingCache, DiskEmbeddingCache, text_hash
+from .lazy import Lazy
+from .metrics import stage_timer
 
 #USE
 #embedding_manager = EmbeddingManager()
+#int8_manager = EmbeddingManager(backend="int8", threads=4)
+#embedding_manager.warm_up()   # the model otherwise loads on the first encode
+
+logger = logging.getLogger(__name__)
 
 # EmbeddingManager
 class EmbeddingManager:
-    """Handles Document Embedding Generation using SentenceTransformer"""
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    """Handles Document Embedding Generation using SentenceTransformer
+
+    The model runs on one of the CPU inference backends of embedding_backends:
+    PyTorch (default), ONNX Runtime, or ONNX Runtime with int8 weights. It is
+    loaded on first use (thread-safe), so constructing a manager is instant.
+    """
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 cache_dir: Optional[str] = "data/embedding_cache",
+                 query_cache_size: int = 1024,
+                 backend: str = "torch",
+                 threads: Optional[int] = None,
+                 onnx_dir: str = "data/onnx_models",
+                 parity_threshold: Optional[float] = 0.99,
+                 lazy: bool = True):
+        """
+        Args:
+            model_name: SentenceTransformer model to load
+            cache_dir: Directory for the persistent document embedding cache (None disables it)
+            query_cache_size: Maximum number of query embeddings kept in memory
+            backend: Inference backend, one of "torch", "onnx", "int8"
+            threads: CPU threads used for inference (None keeps the backend default)
+            onnx_dir: Where ONNX exports of the model are kept
+            parity_threshold: Minimum cosine similarity of ONNX/int8 vectors to PyTorch ones
+            lazy: Defer loading the model until the first encode (or warm_up)
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend}")
         self.model_name = model_name
-        self.model = None
-        self._load_model()
+        self.backend = backend
+        self.threads = threads
+        self.onnx_dir = onnx_dir
+        self.parity_threshold = parity_threshold
+        self.cache_dir = cache_dir
+        self.dimension: Optional[int] = None
+        self.query_cache = LRUEmbeddingCache(max_size=query_cache_size)
+        self.document_cache: Optional[DiskEmbeddingCache] = None
+        self._model = Lazy(self._load_model, name="embedding_model")
+        self.encode_calls = 0
+        self.encoded_texts = 0
+        self.encode_seconds = 0.0
+        if not lazy:
+            self._model.get()
+
+    @property
+    def model(self):
+        """The loaded model (loads it on first access)"""
+        return self._model.get()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model.ready
 
     def _load_model(self):
-        """Load the SentenceTransformer model"""
+        """Load the model on the configured backend, then open the document cache"""
         try:
-            print(f"Loading Embedding Model:{self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            print(f"Model Loaded Succesfully , Embedding Dimensions :{self.model.get_sentence_embedding_dimension()}")
+            logger.info("Loading embedding model %s (%s)", self.model_name, self.backend)
+            model = load_embedding_model(self.model_name, self.backend, threads=self.threads,
+                                         export_directory=self.onnx_dir,
+                                         parity_threshold=self.parity_threshold)
+            # A backend that failed its parity check falls back to torch
+            if not isinstance(model, OnnxEmbeddingModel):
+                self.backend = "torch"
+            self.dimension = model.get_sentence_embedding_dimension()
+            # Vectors of different backends differ slightly, so each gets its own document cache
+            cache_name = self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
+            if self.cache_dir:
+                self.document_cache = DiskEmbeddingCache(self.cache_dir, cache_name, self.dimension)
+            logger.info("Embedding model loaded, %d dimensions", self.dimension)
+            return model
         except Exception as e:
-            print(f"Error:{e}")
+            logger.error("Loading embedding model %s failed: %s", self.model_name, e)
             raise
 
-    def generate_embeddings(self, texts: list) -> np.ndarray: 
-        """Generate an embedding vector for the given text"""
-        if self.model is None: 
-            raise ValueError("ModelNotLoaded")
-        print(f"Generating Embeddings for {len(texts)} text(s)...")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        print(f"Generated Embedding Model with shape {embeddings.shape}")
+    def warm_up(self):
+        """Load the model and run one dummy encode, so the first real query is not the slow one"""
+        self.model.encode(["warm up"], show_progress_bar=False)
+
+    def generate_embeddings(self, texts: list, is_query: bool = False) -> np.ndarray: 
+        """Generate embedding vectors for the given texts
+
+        Cached vectors are reused; only cache misses are batched into the model.
+        Queries use the in-memory LRU, documents the persistent on-disk cache.
+        """
+        self._model.get()
+        cache = self.query_cache if is_query else self.document_cache
+        if cache is None:
+            return self._encode(texts)
+
+        keys = [text_hash(text) for text in texts]
+        found = cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            encoded = self._encode(list(missing.values()))
+            cache.put_many(list(missing), encoded)
+            found.update(zip(missing, encoded))
+
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, key in enumerate(keys):
+            embeddings[i] = found[key]
         return embeddings
+
+    def _encode(self, texts: list) -> np.ndarray:
+        """Run the model on texts that were not found in a cache"""
+        start = time.perf_counter()
+        with stage_timer("embed", batch_size=len(texts)):
+            embeddings = self.model.encode(texts, show_progress_bar=False)
+        self.encode_seconds += time.perf_counter() - start
+        self.encode_calls += 1
+        self.encoded_texts += len(texts)
+        logger.debug("Embedded %d text(s) into %s", len(texts), embeddings.shape)
+        return embeddings
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters for both cache tiers and the estimated encode time saved"""
+        hits = self.query_cache.hits + (self.document_cache.hits if self.document_cache else 0)
+        seconds_per_text = self.encode_seconds / self.encoded_texts if self.encoded_texts else 0.0
+        return {
+            "query_hits": self.query_cache.hits,
+            "query_misses": self.query_cache.misses,
+            "query_entries": len(self.query_cache),
+            "document_hits": self.document_cache.hits if self.document_cache else 0,
+            "document_misses": self.document_cache.misses if self.document_cache else 0,
+            "document_entries": len(self.document_cache) if self.document_cache else 0,
+            "encode_calls": self.encode_calls,
+            "encoded_texts": self.encoded_texts,
+            "encode_seconds": self.encode_seconds,
+            "estimated_seconds_saved": hits * seconds_per_text,
+        }
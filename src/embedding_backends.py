@@ -0,0 +1,241 @@
+import inspect
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+#USE
+#model = load_embedding_model("all-MiniLM-L6-v2", backend="int8", threads=4)
+#model.encode(["Markets rallied after the rate decision"])   # same interface as SentenceTransformer
+#model.parity   # {"min_cosine": ..., "mean_cosine": ...} against the PyTorch model
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "int8")
+
+# Reference sentences the exported models are compared on
+PARITY_TEXTS = [
+    "Central bank holds interest rates steady as inflation cools",
+    "Storm warnings issued along the east coast ahead of the weekend",
+    "Tech shares fall after disappointing quarterly earnings from chip makers",
+    "Election results due tonight with turnout higher than expected",
+    "Oil prices climb as supply cuts extend into next year",
+    "Local council approves new housing development despite objections",
+    "Striker signs three-year contract after impressive season",
+    "Researchers report progress on a vaccine for seasonal flu",
+]
+
+
+def cosine_parity(candidate: np.ndarray, reference: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embedding matrices of the same texts"""
+    candidate = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    cosines = np.sum(candidate * reference, axis=1)
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+
+def _pooling_mode(pooling) -> str:
+    """Pooling mode of a sentence-transformers Pooling module, across library versions"""
+    config = pooling.get_config_dict()
+    if isinstance(config.get("pooling_mode"), str):
+        return config["pooling_mode"]
+    for mode, key in (("cls", "pooling_mode_cls_token"), ("max", "pooling_mode_max_tokens")):
+        if config.get(key):
+            return mode
+    return "mean"
+
+
+def _export_module(transformer, input_names: List[str]):
+    """Wrap the HF transformer of a SentenceTransformer so it exports with positional tensor inputs"""
+    import torch
+
+    class Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)))[0]
+
+    return Encoder()
+
+
+def export_onnx(model_name: str, directory: str, opset: int = 14, parity_texts: List[str] = PARITY_TEXTS) -> Path:
+    """
+    Export a SentenceTransformer to ONNX, plus an int8 dynamically quantized copy
+
+    The directory gets model.onnx, model.int8.onnx, the tokenizer, and
+    export.json with the pooling settings and the cosine parity of both ONNX
+    models against the PyTorch model on `parity_texts`. Needs torch and onnx;
+    loading the export afterwards only needs onnxruntime and transformers.
+
+    Args:
+        model_name: SentenceTransformer name or path
+        directory: Target directory (replaced atomically)
+        opset: ONNX opset version
+        parity_texts: Texts the parity check is computed on
+
+    Returns:
+        Path of the export directory
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    target = Path(directory)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    logger.info("Exporting %s to ONNX", model_name)
+    reference = SentenceTransformer(model_name, device="cpu")
+    modules = list(reference)
+    pooling = next((m for m in modules if type(m).__name__ == "Pooling"), None)
+    meta = {
+        "model_name": model_name,
+        "pooling": _pooling_mode(pooling) if pooling is not None else "mean",
+        "normalize": any(type(m).__name__ == "Normalize" for m in modules),
+        "max_seq_length": reference.max_seq_length,
+        "dimension": reference.get_sentence_embedding_dimension(),
+    }
+    tokenizer = reference.tokenizer
+    sample = tokenizer(["an example sentence", "another"], padding=True, return_tensors="pt")
+    input_names = list(sample.keys())
+    encoder = _export_module(modules[0].auto_model, input_names).eval()
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(encoder, tuple(sample[name] for name in input_names), str(tmp / "model.onnx"),
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset, **options)
+    quantize_dynamic(str(tmp / "model.onnx"), str(tmp / "model.int8.onnx"), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(str(tmp))
+    (tmp / "export.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    # Parity of both ONNX models against the PyTorch reference
+    expected = reference.encode(parity_texts, show_progress_bar=False)
+    meta["parity"] = {
+        backend: cosine_parity(OnnxEmbeddingModel(str(tmp), quantized=backend == "int8").encode(parity_texts),
+                               expected)
+        for backend in ("onnx", "int8")
+    }
+    (tmp / "export.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    if target.exists():
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+    logger.info("Exported %s to %s: parity %s", model_name, target, meta["parity"])
+    return target
+
+
+class OnnxEmbeddingModel:
+    """SentenceTransformer-compatible encoder running an exported model on ONNX Runtime
+
+    Tokenization uses the saved HF tokenizer; pooling and normalization follow
+    the original model's modules, so vectors live in the same space as the
+    PyTorch model's.
+    """
+    def __init__(self, directory: str, quantized: bool = False, threads: Optional[int] = None):
+        """
+        Args:
+            directory: Directory written by export_onnx
+            quantized: Run the int8 model instead of the float32 one
+            threads: Intra-op threads of the ONNX Runtime session (None lets it decide)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.directory = Path(directory)
+        meta = json.loads((self.directory / "export.json").read_text(encoding="utf-8"))
+        self.pooling = meta["pooling"]
+        self.normalize = meta["normalize"]
+        self.max_seq_length = meta["max_seq_length"]
+        self.dimension = meta["dimension"]
+        self.parity = meta.get("parity", {}).get("int8" if quantized else "onnx")
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.directory))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        path = self.directory / ("model.int8.onnx" if quantized else "model.onnx")
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Embed texts; batches are formed from length-sorted texts to limit padding"""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            encoded = self.tokenizer([texts[i] for i in rows], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            embeddings[rows] = self._pool(hidden, encoded["attention_mask"])
+        return embeddings[0] if single else embeddings
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling == "max":
+            pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+
+def load_embedding_model(model_name: str, backend: str = "torch", threads: Optional[int] = None,
+                         export_directory: str = "data/onnx_models", parity_threshold: Optional[float] = 0.99):
+    """
+    Load an embedding model on the chosen CPU inference backend
+
+    Backends:
+        torch: the SentenceTransformer itself (float32 PyTorch)
+        onnx:  the model exported to ONNX, run by ONNX Runtime
+        int8:  the ONNX export with int8 dynamically quantized weights
+
+    The ONNX models are exported once into `export_directory` and reused. If
+    their cosine parity with the PyTorch model is below `parity_threshold`, the
+    PyTorch model is used instead.
+
+    Args:
+        model_name: SentenceTransformer name or path
+        backend: One of EMBEDDING_BACKENDS
+        threads: CPU threads for inference (torch sets its global thread count)
+        export_directory: Where ONNX exports are kept
+        parity_threshold: Minimum cosine similarity to the PyTorch model (None skips the check)
+
+    Returns:
+        A model with SentenceTransformer's encode() and get_sentence_embedding_dimension()
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    if backend == "torch":
+        # Imported here: sentence-transformers pulls in torch and transformers, seconds of startup
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+
+    directory = Path(export_directory) / model_name.strip("/").replace("/", "__")
+    if not (directory / "export.json").exists():
+        export_onnx(model_name, str(directory))
+    model = OnnxEmbeddingModel(str(directory), quantized=backend == "int8", threads=threads)
+    if parity_threshold is not None and (model.parity is None or model.parity["min_cosine"] < parity_threshold):
+        logger.warning("%s embeddings deviate from the PyTorch model (%s), using torch instead", backend, model.parity)
+        return load_embedding_model(model_name, "torch", threads)
+    return model
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+#USE
+#query_cache = LRUEmbeddingCache(max_size=1024)
+#document_cache = DiskEmbeddingCache("data/embedding_cache", "all-MiniLM-L6-v2", dim=384)
+
+
+def text_hash(text: str) -> str:
+    """Stable cache key for a piece of text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@contextmanager
+def exclusive_lock(path: Path):
+    """Block until this process holds an exclusive advisory lock on `path`"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class LRUEmbeddingCache:
+    """Bounded in-memory LRU of embeddings, used for query strings"""
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached embeddings for the keys that are present"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = vector
+                self.hits += 1
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskEmbeddingCache:
+    """Persistent embedding cache for document chunks
+
+    Vectors are appended to a raw float32 matrix that is read back through a
+    memory map, and the text hashes are appended to a keys file whose line number
+    is the row in the matrix. Both files are append-only, so a crash can at worst
+    lose the last batch: on load only rows present in both files are used.
+
+    Several processes may share the directory (API workers): appends happen
+    under an exclusive file lock, after picking up the rows the others added,
+    so every process numbers its rows from the files rather than from its own
+    view. A read_only cache never writes.
+    """
+    def __init__(self, directory: str, model_name: str, dim: int, read_only: bool = False):
+        self.dim = dim
+        self.read_only = read_only
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = model_name.replace("/", "__")
+        self.matrix_path = self.directory / f"{name}.f32"
+        self.keys_path = self.directory / f"{name}.keys"
+        self.lock_path = self.directory / f"{name}.lock"
+        self._index: Dict[str, int] = {}
+        # Rows and bytes of the keys file already read into _index
+        self._rows = 0
+        self._keys_offset = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if self.read_only:
+            self._sync()
+            return
+        with exclusive_lock(self.lock_path):
+            keys = []
+            if self.keys_path.exists():
+                keys = self.keys_path.read_text(encoding="utf-8").split()
+            rows = 0
+            if self.matrix_path.exists():
+                rows = os.path.getsize(self.matrix_path) // (4 * self.dim)
+            rows = min(rows, len(keys))
+            # Drop a partially written tail so both files stay row-aligned for appends
+            if self.matrix_path.exists() and os.path.getsize(self.matrix_path) != rows * 4 * self.dim:
+                with open(self.matrix_path, "r+b") as f:
+                    f.truncate(rows * 4 * self.dim)
+            if len(keys) != rows:
+                self.keys_path.write_text("".join(f"{key}\n" for key in keys[:rows]), encoding="utf-8")
+            self._sync()
+
+    def _sync(self) -> int:
+        """Index the rows appended since the last call (by any process); returns the row count
+
+        Only rows present in both files count: appenders hold the lock and
+        write the matrix before the keys, so a complete keys line has its row.
+        """
+        rows = os.path.getsize(self.matrix_path) // (4 * self.dim) if self.matrix_path.exists() else 0
+        if self.keys_path.exists() and self._rows < rows:
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                data = f.read()
+            # Ignore a line still being written
+            for line in data[:data.rfind(b"\n") + 1].splitlines(keepends=True):
+                if self._rows >= rows:
+                    break
+                self._index.setdefault(line.decode("utf-8").strip(), self._rows)
+                self._rows += 1
+                self._keys_offset += len(line)
+        rows = min(rows, self._rows)
+        if self._matrix is None or len(self._matrix) != rows:
+            self._open_matrix(rows)
+        return rows
+
+    def _open_matrix(self, rows: int):
+        self._matrix = None
+        if rows:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached embeddings for the keys that are present"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._index.get(key)
+                if row is None:
+                    self.misses += 1
+                    continue
+                found[key] = np.array(self._matrix[row])
+                self.hits += 1
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        if self.read_only:
+            return
+        with self._lock, exclusive_lock(self.lock_path):
+            # Rows are numbered from the files, which other processes may have appended to
+            start = self._sync()
+            new_keys, new_rows, pending = [], [], set()
+            for key, vector in zip(keys, vectors):
+                if key in self._index or key in pending:
+                    continue
+                pending.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+            # A writer that crashed mid-append left a tail without a key (or half a key line)
+            if self.matrix_path.exists() and os.path.getsize(self.matrix_path) != start * 4 * self.dim:
+                with open(self.matrix_path, "r+b") as f:
+                    f.truncate(start * 4 * self.dim)
+            if self.keys_path.exists() and os.path.getsize(self.keys_path) != self._keys_offset:
+                with open(self.keys_path, "r+b") as f:
+                    f.truncate(self._keys_offset)
+            with open(self.matrix_path, "ab") as f:
+                f.write(np.asarray(new_rows, dtype=np.float32).tobytes())
+            lines = "".join(f"{key}\n" for key in new_keys).encode("utf-8")
+            with open(self.keys_path, "ab") as f:
+                f.write(lines)
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+            self._rows += len(new_keys)
+            self._keys_offset += len(lines)
+            self._open_matrix(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._index)
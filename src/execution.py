@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+#USE
+#execution = ExecutionLayer()
+#embeddings = await execution.run_cpu("query_embed", embedding_manager.generate_embeddings, [query])
+
+
+class ExecutionLayer:
+    """Runs blocking pipeline work off the event loop with per-resource concurrency limits
+
+    CPU-bound work (model encode, chunking, parsing) goes to a dedicated thread pool;
+    PyTorch and tokenizers release the GIL, so threads give real parallelism without
+    pickling models into processes. Blocking I/O that has no async client (the
+    synchronous Chroma client, file access) goes to a separate I/O pool so it never
+    queues behind a long encode. Each resource has its own semaphore, so for example
+    a refresh can only ever hold one embedding slot and queries keep the rest.
+    """
+    DEFAULT_LIMITS = {
+        "query_embed": 2,   # query encoding on the request path
+        "ingest_embed": 1,  # refresh/batch encoding, kept to one slot
+        "chunk": 2,         # loading, parsing and splitting documents
+        "vector": 8,        # Chroma reads and writes
+        "llm": 4,           # concurrent Groq requests
+        "http": 8,          # concurrent outbound HTTP requests
+        "fanout": 1,        # matching refresh deltas against subscriptions
+    }
+
+    def __init__(self, cpu_workers: Optional[int] = None, io_workers: int = 8,
+                 limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            cpu_workers: Threads for CPU-bound work (defaults to min(4, cpu_count))
+            io_workers: Threads for blocking I/O calls
+            limits: Overrides for the per-resource concurrency limits
+        """
+        self.cpu_workers = cpu_workers or min(4, os.cpu_count() or 1)
+        self.cpu_executor = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix="newsrag-cpu")
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="newsrag-io")
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        # Semaphores belong to an event loop, so they are kept per running loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        # Calls submitted to each pool that no worker thread has picked up yet
+        self._queued = {"cpu": 0, "io": 0}
+        self._queued_lock = threading.Lock()
+
+    def limit(self, resource: str) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent use of a resource"""
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(resource)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limits.get(resource, 1))
+            semaphores[resource] = semaphore
+        return semaphore
+
+    def queue_depth(self, pool: str) -> int:
+        """Calls waiting for a free thread in the "cpu" or "io" pool"""
+        with self._queued_lock:
+            return self._queued[pool]
+
+    def _dequeue(self, pool: str):
+        with self._queued_lock:
+            self._queued[pool] -= 1
+
+    async def _submit(self, pool: str, executor: ThreadPoolExecutor, func: Callable) -> Any:
+        def started():
+            self._dequeue(pool)
+            return func()
+
+        with self._queued_lock:
+            self._queued[pool] += 1
+        future = executor.submit(started)
+        # A call cancelled before it started never runs, so it leaves the queue here instead
+        future.add_done_callback(lambda f: f.cancelled() and self._dequeue(pool))
+        return await asyncio.wrap_future(future)
+
+    async def run_cpu(self, resource: str, func: Callable, *args, **kwargs) -> Any:
+        """Run CPU-bound work on the dedicated CPU executor"""
+        async with self.limit(resource):
+            return await self._submit("cpu", self.cpu_executor, functools.partial(func, *args, **kwargs))
+
+    async def run_io(self, resource: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking I/O call on the I/O executor"""
+        async with self.limit(resource):
+            return await self._submit("io", self.io_executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        self.cpu_executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
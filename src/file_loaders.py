@@ -0,0 +1,67 @@
+"""Lightweight loaders for local TXT and PDF files
+
+This module only depends on langchain_core and PyMuPDF, so loader worker
+processes can import it in well under a second (langchain_community alone
+takes several). Documents match what TextLoader / PyMuPDFLoader produce.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from langchain_core.documents import Document
+
+_PDF_METADATA_KEYS = ("format", "title", "author", "subject", "keywords", "creator",
+                      "producer", "creationDate", "modDate", "trapped")
+
+
+def load_text_file(path) -> List[Document]:
+    """Load a text file as one Document (same output as TextLoader)"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [Document(page_content=f.read(), metadata={"source": str(path)})]
+
+
+def load_pdf_file(path) -> List[Document]:
+    """Load a PDF as one Document per page (same output as PyMuPDFLoader)"""
+    import pymupdf
+
+    with pymupdf.open(path) as pdf:
+        info = {key: pdf.metadata.get(key, "") or "" for key in _PDF_METADATA_KEYS}
+        return [
+            Document(
+                page_content=page.get_text(),
+                metadata={"source": str(path), "file_path": str(path), "page": number,
+                          "total_pages": pdf.page_count, **info},
+            )
+            for number, page in enumerate(pdf)
+        ]
+
+
+LOCAL_FILE_LOADERS = {
+    ".txt": load_text_file,
+    ".pdf": load_pdf_file,
+}
+
+
+def load_file(path) -> List[Document]:
+    """Load a single local TXT or PDF file"""
+    return LOCAL_FILE_LOADERS[Path(path).suffix.lower()](path)
+
+
+@dataclass
+class LoadedFile:
+    """Result of loading one local file in a worker"""
+    path: str
+    documents: List[Document]
+    error: Optional[str] = None
+
+
+def init_loader_worker():
+    """Import PyMuPDF once per worker process instead of once per file"""
+    import pymupdf  # noqa: F401
+
+
+def load_file_worker(path: str) -> LoadedFile:
+    """Load one file, reporting failures instead of raising across the process boundary"""
+    try:
+        return LoadedFile(path=path, documents=load_file(path))
+    except Exception as e:
+        return LoadedFile(path=path, documents=[], error=f"{type(e).__name__}: {e}")
@@ -0,0 +1,156 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+#USE
+#filters = MetadataFilter.from_params(sources=["BBC"], last_hours=24)
+#vector_store.query(embeddings, n_results=5, filters=filters)
+#await pipeline.query_news(query, **query_options(sources=["BBC"], recency_half_life_hours=12))
+
+TimeValue = Union[None, int, float, str, datetime]
+
+# Request fields (HTTP parameters or WebSocket message keys) that query_options reads
+QUERY_OPTION_FIELDS = ("sources", "since", "until", "last_hours", "recency_half_life_hours")
+
+
+def to_timestamp(value: TimeValue) -> Optional[float]:
+    """Epoch seconds from an epoch number, an ISO 8601 string or a datetime
+
+    Naive datetimes and strings without an offset are taken as local time, the
+    way datetime.now() stamps them.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise ValueError(f"Unsupported time value: {value!r}")
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """Source and published-time restrictions evaluated inside the vector/lexical index
+
+    `last_hours` is a sliding window resolved when the query runs, so the same
+    filter (and its cache key) keeps meaning "the last N hours".
+    """
+    sources: Optional[Tuple[str, ...]] = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+    last_hours: Optional[float] = None
+
+    @classmethod
+    def from_params(cls, sources: Optional[Iterable[str]] = None, since: TimeValue = None,
+                    until: TimeValue = None, last_hours: Optional[float] = None) -> Optional["MetadataFilter"]:
+        """
+        Build a filter from request parameters
+
+        Args:
+            sources: Source names to keep (metadata "source", e.g. "BBC" or a file path)
+            since: Earliest published time (epoch seconds or ISO 8601)
+            until: Latest published time (epoch seconds or ISO 8601)
+            last_hours: Only keep documents published in the last N hours
+
+        Returns:
+            MetadataFilter, or None if no restriction was given
+
+        Raises:
+            ValueError: If a time value cannot be parsed or the window is empty
+        """
+        if isinstance(sources, str):
+            sources = [sources]
+        filters = cls(
+            sources=tuple(sources) if sources else None,
+            since=to_timestamp(since),
+            until=to_timestamp(until),
+            last_hours=float(last_hours) if last_hours is not None else None,
+        )
+        if filters.last_hours is not None and filters.last_hours <= 0:
+            raise ValueError("last_hours must be positive")
+        if filters.since is not None and filters.until is not None and filters.since > filters.until:
+            raise ValueError("since must not be later than until")
+        return None if filters.is_empty else filters
+
+    @property
+    def is_empty(self) -> bool:
+        return self.sources is None and self.since is None and self.until is None and self.last_hours is None
+
+    def window(self, now: Optional[float] = None) -> Tuple[Optional[float], Optional[float]]:
+        """Resolved (since, until) in epoch seconds, either end open if None"""
+        since = self.since
+        if self.last_hours is not None:
+            start = (now if now is not None else time.time()) - self.last_hours * 3600
+            since = start if since is None else max(since, start)
+        return since, self.until
+
+    def matches(self, metadata: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Whether a chunk's metadata passes the filter"""
+        if self.sources is not None and metadata.get("source") not in self.sources:
+            return False
+        since, until = self.window(now)
+        if since is None and until is None:
+            return True
+        published = metadata.get("published_at")
+        if published is None:
+            return False
+        return (since is None or published >= since) and (until is None or published <= until)
+
+    def to_chroma_where(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Equivalent Chroma `where` clause"""
+        clauses = []
+        if self.sources is not None:
+            clauses.append({"source": {"$in": list(self.sources)}})
+        since, until = self.window(now)
+        if since is not None:
+            clauses.append({"published_at": {"$gte": since}})
+        if until is not None:
+            clauses.append({"published_at": {"$lte": until}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def cache_key(self) -> Tuple:
+        """Hashable identity of the request, with last_hours kept relative"""
+        return self.sources, self.since, self.until, self.last_hours
+
+
+def half_life_hours(value: Optional[float]) -> Optional[float]:
+    """A recency half-life as a positive float (None stays None: no recency weighting)
+
+    Raises:
+        ValueError: If the half-life is zero or negative
+    """
+    if value is None:
+        return None
+    value = float(value)
+    if value <= 0:
+        raise ValueError("recency_half_life_hours must be positive")
+    return value
+
+
+def query_options(sources: Optional[Iterable[str]] = None, since: TimeValue = None, until: TimeValue = None,
+                  last_hours: Optional[float] = None,
+                  recency_half_life_hours: Optional[float] = None) -> Dict[str, Any]:
+    """Filter and recency keyword arguments of NewsPipeline.query_news from request parameters
+
+    Used by the HTTP API and both WebSocket servers, so they accept and reject the same requests.
+
+    Raises:
+        ValueError: If a time value cannot be parsed, the window is empty or the half-life is not positive
+    """
+    return {
+        "filters": MetadataFilter.from_params(sources=sources, since=since, until=until, last_hours=last_hours),
+        "recency_half_life_hours": half_life_hours(recency_half_life_hours),
+    }
+
+
+def message_query_options(data: Dict[str, Any]) -> Dict[str, Any]:
+    """query_options from the QUERY_OPTION_FIELDS of a WebSocket message"""
+    return query_options(**{name: data.get(name) for name in QUERY_OPTION_FIELDS})
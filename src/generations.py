@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .filters import MetadataFilter
+from .lexical_index import BM25Index
+from .metrics import stage_timer
+from .vector_backends import VectorBackend
+
+#USE
+#generation = vector_store.snapshot()   # pinned: a refresh swapping in a new generation does not affect it
+#generation.query(embeddings, n_results=5); generation.lexical_search("rates"); generation.get(ids)
+#layout = GenerationLayout("data/vector_store/generations/pdf_documents")
+#layout.current(), layout.committed()   # published generation number, all kept generation numbers
+
+logger = logging.getLogger(__name__)
+
+
+def link_tree(source: Path, target: Path):
+    """Copy a file or directory tree as hard links (plain copies where linking is not possible)
+
+    Index files are never modified in place (writers replace them), so a linked
+    copy stays unaffected by later writes to either side.
+    """
+    def link(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    if source.is_dir():
+        shutil.copytree(source, target, copy_function=link)
+    elif source.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        link(source, target)
+
+
+class IndexGeneration:
+    """One version of the index: a vector backend and the BM25 index built with it
+
+    A query that starts on a generation keeps using it even if a newer one is
+    swapped in meanwhile, so it never mixes results of two index versions.
+    """
+    def __init__(self, number: int, directory: Optional[Path], backend: VectorBackend, lexical_index: BM25Index):
+        """
+        Args:
+            number: Generation number (0 for a store written before generations existed)
+            directory: Directory of the generation (None for the legacy layout)
+            backend: The generation's vector backend
+            lexical_index: The generation's BM25 index
+        """
+        self.number = number
+        self.directory = directory
+        self.backend = backend
+        self.lexical_index = lexical_index
+
+    def query(self, query_embeddings, n_results: int = 5,
+              filters: Optional[MetadataFilter] = None) -> Dict[str, List[List[Any]]]:
+        """Nearest neighbours of each query embedding, with cosine distances"""
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with stage_timer("vector_query", batch_size=len(query_embeddings)):
+            return self.backend.query(query_embeddings, n_results, filters=filters)
+
+    def lexical_search(self, query: str, top_k: int = 5,
+                       filters: Optional[MetadataFilter] = None) -> List[Tuple[str, float]]:
+        """BM25 (chunk_id, score) pairs for a query, best first"""
+        with stage_timer("lexical_query"):
+            return self.lexical_index.search(query, top_k=top_k, filters=filters)
+
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Stored records by ID, or all records"""
+        return self.backend.get(ids)
+
+    def count(self) -> int:
+        """Number of stored documents"""
+        return self.backend.count()
+
+    def ids(self) -> List[str]:
+        """IDs of all stored documents"""
+        return self.backend.ids()
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings by ID"""
+        return self.backend.get_embeddings(ids)
+
+
+class GenerationLayout:
+    """On-disk layout of a collection's generations
+
+        <root>/CURRENT                     {"generation": n}, replaced atomically on every swap
+        <root>/gen-000007/backend/         vector backend files
+        <root>/gen-000007/bm25.json        BM25 index
+        <root>/gen-000007/files/           ingestion state saved with the generation
+        <root>/gen-000007/generation.json  written last by commit; its absence marks an unfinished build
+    """
+    POINTER = "CURRENT"
+    META = "generation.json"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, number: int) -> Path:
+        return self.root / f"gen-{number:06d}"
+
+    def current(self) -> Optional[int]:
+        """Published generation number, or None before the first commit"""
+        try:
+            return int(json.loads((self.root / self.POINTER).read_text(encoding="utf-8"))["generation"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def numbers(self) -> List[int]:
+        """Numbers of all generation directories, finished or not"""
+        if not self.root.exists():
+            return []
+        return sorted(int(child.name[4:]) for child in self.root.iterdir()
+                      if child.is_dir() and child.name.startswith("gen-") and child.name[4:].isdigit())
+
+    def committed(self) -> List[int]:
+        return [number for number in self.numbers() if (self.path(number) / self.META).exists()]
+
+    def publish(self, number: int):
+        """Atomically point CURRENT at a committed generation"""
+        tmp_path = self.root / f"{self.POINTER}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps({"generation": number, "published_at": time.time()}), encoding="utf-8")
+        os.replace(tmp_path, self.root / self.POINTER)
+
+    def mark_committed(self, number: int, count: int):
+        (self.path(number) / self.META).write_text(
+            json.dumps({"generation": number, "count": count, "committed_at": time.time()}), encoding="utf-8")
+
+    def prune(self, keep: int, protect: Sequence[int] = ()):
+        """Delete all but the newest `keep` committed generations up to the current one
+
+        Unfinished builds are deleted too, except the generations in `protect`.
+        """
+        current = self.current()
+        committed = [n for n in self.committed() if current is not None and n <= current]
+        kept = set(committed[-keep:]) | set(protect)
+        for number in self.numbers():
+            if number not in kept:
+                shutil.rmtree(self.path(number), ignore_errors=True)
+
+    @staticmethod
+    def save_files(directory: Path, paths: Sequence[Path]):
+        """Link the current content of `paths` into `directory` (missing files are left out)"""
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        for path in paths:
+            link_tree(path, directory / path.name)
+
+    @staticmethod
+    def restore_files(directory: Path, paths: Sequence[Path]):
+        """Put back the content saved by save_files, removing files that did not exist then"""
+        for path in paths:
+            saved = directory / path.name
+            if saved.exists():
+                tmp_path = path.with_name(path.name + f".{os.getpid()}.restore")
+                shutil.copy2(saved, tmp_path)
+                os.replace(tmp_path, path)
+            elif path.exists():
+                path.unlink()
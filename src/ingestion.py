@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from .chunking import split_documents
+from .dedup import NearDuplicateIndex
+from .embedding import EmbeddingManager
+from .execution import ExecutionLayer
+from .vectorstore import VectorStore, chunk_id
+
+#USE
+#stream = IngestionStream(embedding_manager, vector_store, execution, batch_size=64)
+#stats = await stream.run(units, select_new=..., on_complete=...)
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class IngestUnit:
+    """One file or web source flowing through the ingestion stream
+
+    A unit completes once every batch holding one of its new chunks has been
+    upserted; if any of those batches fails, the unit is reported as failed so the
+    caller does not record it as ingested and it is retried on the next refresh.
+    """
+    key: str
+    kind: str
+    documents: List[Document]
+    info: Dict[str, Any] = field(default_factory=dict)
+    chunks: List[Document] = field(default_factory=list)
+    pending_batches: int = 0
+    sealed: bool = False
+    failed: bool = False
+
+
+@dataclass
+class IngestBatch:
+    chunks: List[Document] = field(default_factory=list)
+    units: Dict[int, IngestUnit] = field(default_factory=dict)
+    embeddings: Any = None
+    done: bool = False
+    ok: bool = False
+
+
+@dataclass
+class IngestStats:
+    units: int = 0
+    failed_units: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    duplicates: int = 0
+
+
+class IngestionStream:
+    """Streaming load → chunk → embed → upsert pipeline with bounded queues
+
+    Each stage is a task connected to the next by a bounded asyncio.Queue, so a
+    slow stage applies backpressure all the way to the loader and only a few
+    batches are ever held in memory, regardless of corpus size. Embedding and
+    upserts run in fixed-size batches; a failing batch only fails the units whose
+    chunks it carried, the rest of the refresh carries on.
+
+    With a NearDuplicateIndex, new chunks that nearly duplicate an indexed chunk
+    are dropped before embedding. A unit whose chunk was dropped in favour of one
+    still in flight waits for that chunk's batch, and fails with it.
+    """
+    def __init__(self, embedding_manager: EmbeddingManager, vector_store: VectorStore,
+                 execution: ExecutionLayer, batch_size: int = 64, queue_size: int = 4,
+                 deduplicator: Optional[NearDuplicateIndex] = None):
+        """
+        Args:
+            embedding_manager: Manager used to embed chunk batches
+            vector_store: Store the embedded batches are upserted into
+            execution: Execution layer the blocking stages run on
+            batch_size: Chunks per embedding/upsert batch
+            queue_size: Capacity of each queue between stages
+            deduplicator: Near-duplicate index checked before embedding (None disables dedup)
+        """
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.execution = execution
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.deduplicator = deduplicator
+        self.queues: Dict[str, asyncio.Queue] = {}
+
+    async def run(self, units: AsyncIterator[IngestUnit],
+                  select_new: Callable[[IngestUnit], List[Document]],
+                  on_complete: Callable[[IngestUnit], None],
+                  on_upserted: Optional[Callable[[List[Document], Any], None]] = None) -> IngestStats:
+        """Stream units through the stages
+
+        Args:
+            units: Async iterator of loaded units (documents not yet split)
+            select_new: Given a split unit (unit.chunks set), returns the chunks that must be
+                embedded; anything needed later must be kept in unit.info, as the unit's
+                documents and chunks are released once they are batched. IDs in
+                unit.info["replaces"] are never treated as near-duplicate originals
+            on_complete: Called once per unit whose new chunks were all upserted
+            on_upserted: Called with the chunks and embeddings of every upserted batch
+
+        Returns:
+            IngestStats for this run
+        """
+        stats = IngestStats()
+        split_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.queues = {"ingest_split": split_queue, "ingest_embed": embed_queue, "ingest_upsert": upsert_queue}
+
+        def finish_if_done(unit: IngestUnit):
+            if unit.sealed and unit.pending_batches == 0:
+                if unit.failed:
+                    stats.failed_units += 1
+                else:
+                    on_complete(unit)
+
+        # Chunks batched during this run, so duplicates can depend on their original's batch
+        batch_of: Dict[str, IngestBatch] = {}
+
+        def depend_on(unit: IngestUnit, canonical: str):
+            batch = batch_of.get(canonical)
+            if batch is None:
+                return  # stored by an earlier refresh
+            if batch.done:
+                unit.failed = unit.failed or not batch.ok
+            elif id(unit) not in batch.units:
+                batch.units[id(unit)] = unit
+                unit.pending_batches += 1
+
+        def batch_done(batch: IngestBatch, ok: bool):
+            batch.done, batch.ok = True, ok
+            if not ok:
+                stats.failed_batches += 1
+                if self.deduplicator is not None:
+                    # Nothing was stored, so these must not suppress later copies
+                    self.deduplicator.remove([chunk_id(chunk) for chunk in batch.chunks])
+            for unit in batch.units.values():
+                unit.pending_batches -= 1
+                unit.failed = unit.failed or not ok
+                finish_if_done(unit)
+
+        async def produce():
+            async for unit in units:
+                stats.units += 1
+                await split_queue.put(unit)
+            await split_queue.put(_DONE)
+
+        async def split():
+            batch = IngestBatch()
+            while True:
+                unit = await split_queue.get()
+                if unit is _DONE:
+                    break
+                try:
+                    unit.chunks = await self.execution.run_cpu("chunk", split_documents, unit.documents)
+                    new_chunks = select_new(unit)
+                except Exception as e:
+                    logger.error(f"Failed to chunk {unit.key}: {e}")
+                    unit.failed = True
+                    new_chunks = []
+                stats.chunks += len(unit.chunks)
+                # Only the batches keep chunk text alive from here on
+                unit.documents = []
+                unit.chunks = []
+                replaces = unit.info.get("replaces", ())
+                for chunk in new_chunks:
+                    if self.deduplicator is not None:
+                        cid = chunk_id(chunk)
+                        canonical = self.deduplicator.check_and_add(cid, chunk.page_content, ignore=replaces)
+                        if canonical is not None:
+                            stats.duplicates += 1
+                            depend_on(unit, canonical)
+                            continue
+                        batch_of[cid] = batch
+                    batch.chunks.append(chunk)
+                    if id(unit) not in batch.units:
+                        batch.units[id(unit)] = unit
+                        unit.pending_batches += 1
+                    if len(batch.chunks) >= self.batch_size:
+                        await embed_queue.put(batch)
+                        batch = IngestBatch()
+                unit.sealed = True
+                finish_if_done(unit)
+            if batch.chunks:
+                await embed_queue.put(batch)
+            await embed_queue.put(_DONE)
+
+        async def embed():
+            while True:
+                batch = await embed_queue.get()
+                if batch is _DONE:
+                    break
+                try:
+                    batch.embeddings = await self.execution.run_cpu(
+                        "ingest_embed", self.embedding_manager.generate_embeddings,
+                        [chunk.page_content for chunk in batch.chunks]
+                    )
+                except Exception as e:
+                    logger.error(f"Embedding batch of {len(batch.chunks)} chunks failed: {e}")
+                    batch_done(batch, ok=False)
+                    continue
+                await upsert_queue.put(batch)
+            await upsert_queue.put(_DONE)
+
+        async def upsert():
+            while True:
+                batch = await upsert_queue.get()
+                if batch is _DONE:
+                    break
+                try:
+                    await self.execution.run_io("vector", self.vector_store.add_documents, batch.chunks, batch.embeddings)
+                except Exception as e:
+                    logger.error(f"Upserting batch of {len(batch.chunks)} chunks failed: {e}")
+                    batch_done(batch, ok=False)
+                    continue
+                stats.batches += 1
+                stats.embedded += len(batch.chunks)
+                if on_upserted is not None:
+                    on_upserted(batch.chunks, batch.embeddings)
+                batch_done(batch, ok=True)
+
+        tasks = [asyncio.create_task(stage()) for stage in (produce, split, embed, upsert)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.queues = {}
+        return stats
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Items waiting between the stages of the run in progress (empty when idle)"""
+        return {name: queue.qsize() for name, queue in self.queues.items()}
@@ -0,0 +1,57 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+#USE
+#model = Lazy(lambda: SentenceTransformer("all-MiniLM-L6-v2"), name="embedding model")
+#model.ready        # False until the first get()
+#model.get()        # built once, even when several threads ask at the same time
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """A value built on first use, at most once, safely across threads
+
+    Concurrent callers of get() wait for the one that is building the value. A
+    failed build is not cached: the error is kept in `error` and the next get()
+    tries again.
+    """
+    def __init__(self, factory: Callable[[], T], name: str = ""):
+        """
+        Args:
+            factory: Builds the value
+            name: Label used in readiness reports
+        """
+        self.factory = factory
+        self.name = name
+        self._value: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self.error: Optional[BaseException] = None
+        self.init_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except BaseException as e:
+                    self.error = e
+                    raise
+                self.init_seconds = time.perf_counter() - start
+                self.error = None
+                self._ready = True
+        return self._value
+
+    def status(self) -> dict:
+        """Whether the value is built, how long that took, and the last build error"""
+        return {"ready": self._ready, "init_seconds": self.init_seconds,
+                "error": str(self.error) if self.error is not None else None}
@@ -0,0 +1,182 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .filters import MetadataFilter
+
+#USE
+#index = BM25Index("data/vector_store/pdf_documents_bm25.json")
+#index.add(ids, texts); index.save()
+#hits = index.search("NVDA earnings 2024-05-22", top_k=10)   # [(chunk_id, score), ...]
+
+logger = logging.getLogger(__name__)
+
+# Keeps tickers, versions and dates together: "brk.b", "2024-05-22", "covid-19"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/'][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, updated incrementally
+
+    Postings map each term to the chunks containing it with their term
+    frequency, so a query only touches the postings of its own terms instead of
+    scanning every chunk. Chunks are added and removed by ID as they are upserted
+    and deleted from the vector store, and the index is saved next to it. The
+    source and published time of every chunk are kept too, so metadata filters
+    are checked while scoring rather than on the results.
+    """
+    VERSION = 2
+    FILTER_FIELDS = ("source", "published_at")
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path: JSON file the index is persisted to (in-memory only if None)
+            k1: Term frequency saturation
+            b: Document length normalisation
+        """
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_fields: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0
+        self.dirty = False
+        # Ingestion updates the index from worker threads while queries search it
+        self._lock = threading.RLock()
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, ids: Iterable[str], texts: Iterable[str],
+            metadatas: Optional[Iterable[Dict[str, Any]]] = None):
+        """Index chunks, replacing any previous version under the same ID"""
+        ids, texts = list(ids), list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{}] * len(ids)
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                if doc_id in self.doc_lengths:
+                    self._remove(doc_id)
+                tokens = tokenize(text)
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+                self.doc_terms[doc_id] = list(counts)
+                self.doc_fields[doc_id] = {key: metadata[key] for key in self.FILTER_FIELDS
+                                           if (metadata or {}).get(key) is not None}
+                self.doc_lengths[doc_id] = len(tokens)
+                self.total_length += len(tokens)
+                self.dirty = True
+
+    def remove(self, ids: Iterable[str]):
+        """Drop chunks from the index (unknown IDs are ignored)"""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self.doc_lengths:
+                    self._remove(doc_id)
+                    self.dirty = True
+
+    def _remove(self, doc_id: str):
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self.doc_fields.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id, []):
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+
+    def search(self, query: str, top_k: int = 10,
+               filters: Optional[MetadataFilter] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks for a query with BM25
+
+        Args:
+            query: Free-text query
+            top_k: Number of results to return
+            filters: Only score chunks whose source/published time pass the filter
+
+        Returns:
+            (chunk_id, score) pairs, best first
+        """
+        scores: Dict[str, float] = {}
+        now = time.time()
+        rejected = set()
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs or 1.0
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if filters is not None and doc_id not in scores:
+                        if doc_id in rejected:
+                            continue
+                        if not filters.matches(self.doc_fields.get(doc_id, {}), now):
+                            rejected.add(doc_id)
+                            continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def load(self):
+        """Load the index from disk, starting empty if it is missing or unreadable"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable BM25 index %s: %s", self.path, e)
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.postings = data["postings"]
+        self.doc_lengths = data["doc_lengths"]
+        self.doc_fields = data["doc_fields"]
+        self.total_length = sum(self.doc_lengths.values())
+        self.doc_terms = {doc_id: [] for doc_id in self.doc_lengths}
+        for term, docs in self.postings.items():
+            for doc_id in docs:
+                self.doc_terms[doc_id].append(term)
+
+    def save(self):
+        """Atomically write the index if it changed since the last save"""
+        if not self.path or not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with self._lock:
+            data = json.dumps({
+                "version": self.VERSION,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "doc_fields": self.doc_fields,
+            })
+            self.dirty = False
+        tmp_path.write_text(data, encoding="utf-8")
+        os.replace(tmp_path, self.path)
@@ -1,37 +1,52 @@
-from langchain_groq import ChatGroq
 import os
+import logging
+import time
 from dotenv import load_dotenv
+from .context_builder import estimate_tokens
+from .lazy import Lazy
+from .metrics import PROMPT_TOKENS, STAGE_ERRORS, STAGE_SECONDS
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable not set")
+ERROR_RESPONSE_PREFIX = "Error generating response"
 
-try:
-    llm = ChatGroq(
-        groq_api_key=groq_api_key,
-        model_name="gemma2-9b-it",
-        temperature=0.1,
-        max_tokens=1024
-    )
-except Exception as e:
-    raise RuntimeError(f"Failed to initialize LLM: {e}")
+load_dotenv()
 
-def rag_simple(query, retriever, llm, top_k=3):
-    """Generate answer using RAG"""
+def _create_llm():
+    from langchain_groq import ChatGroq
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable not set")
     try:
-        # Get relevant articles
-        results = retriever.retrieve(query, top_k=top_k)
-        
-        if not results:
-            return "No relevant articles found in the database."
-            
-        # Prepare context from retrieved documents
-        context = "\n\n".join([doc['content'] for doc in results])
-        
-        # Generate response using LLM
-        prompt = f"""Based on the following context, answer the query concisely and accurately.
+        return ChatGroq(
+            groq_api_key=groq_api_key,
+            model_name="gemma2-9b-it",
+            temperature=0.1,
+            max_tokens=1024
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize LLM: {e}")
+
+# Built on first use, so importing the package needs neither the key nor the client
+_llm = Lazy(_create_llm, name="llm")
+
+def get_llm():
+    """The shared Groq client, created on first call"""
+    return _llm.get()
+
+def llm_status():
+    """Readiness of the shared client (see Lazy.status)"""
+    return _llm.status()
+
+def __getattr__(name):
+    # `from .llm_interface import llm` keeps working, but only builds the client when asked for
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def build_prompt(query, context):
+    """Build the RAG prompt for a query and its retrieved context"""
+    return f"""Based on the following context, answer the query concisely and accurately.
 
 Context:
 {context}
@@ -40,10 +55,85 @@ Query: {query}
 
 Answer:"""
 
+def prompt_tokens(result):
+    """Estimated token count of the prompt built for a RetrievalResult"""
+    return estimate_tokens(build_prompt(result.query, result.context))
+
+def _log_llm_call(result, prompt, started):
+    """Record LLM latency and prompt size, and log them together so they can be tracked side by side"""
+    elapsed = time.perf_counter() - started
+    tokens = estimate_tokens(prompt)
+    STAGE_SECONDS.observe(elapsed, stage="llm")
+    PROMPT_TOKENS.observe(tokens)
+    if logger.isEnabledFor(logging.INFO):
+        stats = result.packed.stats()
+        logger.info("LLM answered in %.0f ms for a %d-token prompt (%d context tokens from %d retrieved, "
+                    "%d chunks in %d spans)", elapsed * 1000, tokens, stats['context_tokens'],
+                    stats['input_tokens'], stats['chunks'], stats['spans'],
+                    extra={"stage": "llm", "seconds": elapsed, "prompt_tokens": tokens})
+
+def generate_answer(result, llm):
+    """Generate an answer from an already computed RetrievalResult"""
+    try:
+        if not result.documents:
+            return "No relevant articles found in the database."
+
+        # Generate response using LLM
+        prompt = build_prompt(result.query, result.context)
+        started = time.perf_counter()
         response = llm.invoke(prompt)
+        _log_llm_call(result, prompt, started)
         return response.content
-        
+
+    except Exception as e:
+        STAGE_ERRORS.inc(stage="llm")
+        logger.error(f"RAG error: {e}")
+        return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+
+async def agenerate_answer(result, llm):
+    """Async variant of generate_answer using the LLM's native ainvoke"""
+    try:
+        if not result.documents:
+            return "No relevant articles found in the database."
+
+        prompt = build_prompt(result.query, result.context)
+        started = time.perf_counter()
+        response = await llm.ainvoke(prompt)
+        _log_llm_call(result, prompt, started)
+        return response.content
+
     except Exception as e:
+        STAGE_ERRORS.inc(stage="llm")
         logger.error(f"RAG error: {e}")
-        return f"Error generating response: {str(e)}"
+        return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
 
+async def astream_answer(result, llm):
+    """Stream the answer for a RetrievalResult as text deltas as the LLM produces them"""
+    if not result.documents:
+        yield "No relevant articles found in the database."
+        return
+    try:
+        prompt = build_prompt(result.query, result.context)
+        started = time.perf_counter()
+        first_token = True
+        async for chunk in llm.astream(prompt):
+            if chunk.content:
+                if first_token:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                    first_token = False
+                yield chunk.content
+        _log_llm_call(result, prompt, started)
+    except Exception as e:
+        STAGE_ERRORS.inc(stage="llm")
+        logger.error(f"RAG error: {e}")
+        yield f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+
+def rag_simple(query, retriever, llm, top_k=3):
+    """Generate answer using RAG"""
+    try:
+        # Get relevant articles
+        result = retriever.retrieve_result(query, top_k=top_k)
+    except Exception as e:
+        logger.error(f"RAG error: {e}")
+        return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+    return generate_answer(result, llm)
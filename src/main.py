@@ -16,6 +16,14 @@ async def periodic_refresh(pipeline):
         except Exception as e:
             logger.error(f"Error in periodic refresh: {e}")
 
+async def background_startup(pipeline):
+    await pipeline.warm_up()
+    try:
+        await pipeline.refresh_news()
+    except Exception as e:
+        logger.error(f"Initial refresh failed: {e}")
+    await periodic_refresh(pipeline)
+
 async def main():
     try:
         setup_logging()
@@ -29,13 +37,10 @@ async def main():
         # Create server with pipeline
         server = NewsServer(pipeline=pipeline)
         
-        # Initial news refresh
-        await pipeline.refresh_news()
-        
-        # Start everything
+        # Start serving right away; warm-up and the initial refresh run alongside
         await asyncio.gather(
             server.start(),
-            periodic_refresh(pipeline)
+            background_startup(pipeline)
         )
     except Exception as e:
         logger.error(f"Application failed: {e}")
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+#USE
+#manifest = IngestionManifest("data/vector_store/ingestion_manifest.json")
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionManifest:
+    """Persisted record of what has already been ingested into the vector store
+
+    Local files are tracked by path with their mtime, size and the ids of the
+    chunks they produced, so an unchanged file can be skipped and the chunks of a
+    changed or removed file can be deleted. Scraped sources (e.g. BBC) have no
+    file to stat, so only the set of chunk ids already stored is kept for them.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str = "data/vector_store/ingestion_manifest.json"):
+        self.path = Path(path)
+        self.files: Dict[str, Dict] = {}
+        self.sources: Dict[str, List[str]] = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, starting empty if it is missing or unreadable"""
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable ingestion manifest %s: %s", self.path, e)
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.files = data.get("files", {})
+        self.sources = data.get("sources", {})
+
+    def save(self):
+        """Atomically write the manifest next to the vector store"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "version": self.VERSION,
+            "files": self.files,
+            "sources": self.sources,
+        }), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Forget everything ingested (for a rebuild of the index from scratch)"""
+        self.files = {}
+        self.sources = {}
+
+    # Local files
+    def is_unchanged(self, path: str, stat: os.stat_result) -> bool:
+        """True if the file was ingested before with the same mtime and size"""
+        entry = self.files.get(path)
+        return bool(entry) and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size
+
+    def file_chunks(self, path: str) -> List[str]:
+        """Chunk ids previously stored for a file"""
+        return self.files.get(path, {}).get("chunks", [])
+
+    def update_file(self, path: str, stat: os.stat_result, chunk_ids: Iterable[str]):
+        self.files[path] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "chunks": list(chunk_ids),
+        }
+
+    def remove_file(self, path: str) -> List[str]:
+        """Forget a file and return the chunk ids it owned"""
+        return self.files.pop(path, {}).get("chunks", [])
+
+    def known_paths(self) -> Set[str]:
+        return set(self.files)
+
+    # Scraped sources
+    def source_chunks(self, source: str) -> Set[str]:
+        return set(self.sources.get(source, []))
+
+    def add_source_chunks(self, source: str, chunk_ids: Iterable[str]):
+        known = self.sources.setdefault(source, [])
+        seen = set(known)
+        for cid in chunk_ids:
+            if cid not in seen:
+                seen.add(cid)
+                known.append(cid)
+
+    def forget_chunks(self, chunk_ids: Iterable[str]):
+        """Drop chunk ids the store no longer holds (e.g. expired by retention)
+
+        A forgotten scraped chunk is embedded again if its source still serves it.
+        """
+        forgotten = set(chunk_ids)
+        if not forgotten:
+            return
+        for entry in self.files.values():
+            entry["chunks"] = [cid for cid in entry["chunks"] if cid not in forgotten]
+        for source, ids in self.sources.items():
+            self.sources[source] = [cid for cid in ids if cid not in forgotten]
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]):
+        """Make chunks count as new again and reload the files that produced them
+
+        Used for near-duplicates that were dropped in favour of a chunk that has
+        since been deleted, so the next refresh stores them after all.
+        """
+        invalidated = set(chunk_ids)
+        if not invalidated:
+            return
+        for entry in self.files.values():
+            if invalidated.intersection(entry["chunks"]):
+                entry["mtime"] = None
+        self.forget_chunks(invalidated)
@@ -1,62 +1,112 @@
 import asyncio
-import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import websockets
 import logging
 from ..pipeline import NewsPipeline
+from ..filters import message_query_options
+from ..subscriptions import ClientQueue, SubscriptionHub
+from ..serialization import JSON, available_encodings, decode, encode_frame, parse_fields, project, resolve_encoding
 
 logger = logging.getLogger(__name__)
 
 class NewsServer:
-    def __init__(self, pipeline: NewsPipeline, host: str = "localhost", port: int = 8765):
+    def __init__(self, pipeline: NewsPipeline, host: str = "localhost", port: int = 8765,
+                 max_pending_messages: int = 64, compression: Optional[str] = "deflate"):
+        """
+        Args:
+            pipeline: Pipeline answering the queries
+            host: Interface to listen on
+            port: Port to listen on
+            max_pending_messages: Per-client bound of the subscription send queue
+            compression: "deflate" offers per-message compression to clients that support it, None disables it
+        """
         self.host = host
         self.port = port
         self.pipeline = pipeline
-        self.clients = set()
-        self.news_cache: Dict[str, Any] = {}
+        self.compression = compression
+        # Connected websockets and their subscription hub client IDs
+        self.clients: Dict[Any, int] = {}
+        # Pushes refresh deltas to subscribed clients through bounded per-client send queues
+        self.hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution,
+                                   max_pending=max_pending_messages)
+        pipeline.add_delta_listener(self.hub.publish)
         logger.info(f"Initialized NewsServer on {host}:{port}")
 
     async def register(self, websocket):
-        self.clients.add(websocket)
+        self.clients[websocket] = self.hub.connect(websocket.send)
         try:
             await self.send_cache(websocket)
             async for message in websocket:
                 await self.process_message(websocket, message)
         finally:
-            self.clients.remove(websocket)
+            self.hub.disconnect(self.clients.pop(websocket))
+
+    @property
+    def news_cache(self) -> Dict[str, Any]:
+        """Recent answers from the pipeline's shared answer cache for the current corpus"""
+        return self.pipeline.answer_cache.snapshot(self.pipeline.corpus_version)
+
+    def connection(self, websocket) -> ClientQueue:
+        """The client's send queue, which also holds its encoding and article fields"""
+        return self.hub.clients[self.clients[websocket]]
+
+    async def send(self, websocket, message: Dict[str, Any], fields=None):
+        connection = self.connection(websocket)
+        await websocket.send(encode_frame(message, connection.encoding, fields or connection.fields))
 
     async def send_cache(self, websocket):
-        if self.news_cache:
-            await websocket.send(json.dumps({
+        """Send the cached answers, serialized once for all connections until the cache changes"""
+        connection = self.connection(websocket)
+        encoding, fields = connection.encoding, connection.fields
+
+        def build(news_cache):
+            if not news_cache:
+                return None
+            return encode_frame({
                 "type": "cache_update",
-                "data": self.news_cache
-            }))
+                "data": {query: project(result, fields) for query, result in news_cache.items()}
+            }, encoding)
+
+        frame = self.pipeline.answer_cache.snapshot_payload(self.pipeline.corpus_version, (encoding, fields), build)
+        if frame is not None:
+            await websocket.send(frame)
 
     async def broadcast(self, message: Dict[str, Any]):
-        if self.clients:
-            await asyncio.gather(
-                *[client.send(json.dumps(message)) for client in self.clients]
-            )
+        """Serialize a message once and queue it for every client (a slow client does not hold up the rest)"""
+        self.hub.broadcast(message)
 
     async def process_message(self, websocket, message):
         try:
-            data = json.loads(message)
-            if data["type"] == "query":
+            # Text frames are JSON, binary frames use the connection's encoding
+            data = decode(message, self.connection(websocket).encoding if isinstance(message, bytes) else JSON)
+            if data["type"] == "configure":
+                await self.configure(websocket, data)
+            elif data["type"] in ("subscribe", "unsubscribe"):
+                # subscription_update frames follow whenever a refresh adds matching chunks
+                reply = await self.hub.handle(self.clients[websocket], data)
+                await self.send(websocket, reply)
+            elif data["type"] == "batch_query":
+                logger.info(f"Processing batch of {len(data['queries'])} queries")
+                await self.batch_query(websocket, data["queries"], data.get("top_k", 5),
+                                       fields=self.fields(websocket, data), **message_query_options(data))
+            elif data["type"] == "query":
                 query = data["query"]
+                top_k = data.get("top_k", 5)
                 logger.info(f"Processing query: {query}")
+                options = message_query_options(data)
+
+                if data.get("stream"):
+                    await self.stream_query(websocket, query, top_k, fields=self.fields(websocket, data), **options)
+                    return
                 
-                # Use the pipeline to process the query
-                results = await self.pipeline.query_news(query)
-                
-                # Cache the results
-                self.news_cache[query] = results
-                
-                # Send response
-                response = {
-                    "type": "query_result",
-                    "data": results
-                }
-                await websocket.send(json.dumps(response))
+                # Use the pipeline to process the query (answers are cached by the pipeline,
+                # together with their serialized frames)
+                connection = self.connection(websocket)
+                frame = await self.pipeline.query_news_payload(
+                    query, top_k, **options, encoding=connection.encoding,
+                    fields=self.fields(websocket, data), message_type="query_result"
+                )
+                await websocket.send(frame)
                 
         except Exception as e:
             logger.error(f"Error processing message: {e}")
@@ -64,9 +114,38 @@ class NewsServer:
                 "type": "error",
                 "data": str(e)
             }
-            await websocket.send(json.dumps(error_response))
+            await self.send(websocket, error_response)
+
+    async def configure(self, websocket, data: Dict[str, Any]):
+        """Switch the connection's encoding ("json" or "msgpack") and default article fields
+
+        An encoding that is not installed falls back to JSON; the `configured`
+        reply, sent in the new encoding, says which one is in effect.
+        """
+        encoding = resolve_encoding(data.get("encoding"))
+        fields = parse_fields(data.get("fields"))
+        self.hub.configure(self.clients[websocket], encoding, fields)
+        await self.send(websocket, {"type": "configured", "data": {
+            "encoding": encoding, "fields": list(fields) if fields else None, "available": available_encodings()
+        }})
+
+    def fields(self, websocket, data: Dict[str, Any]):
+        """Article fields for a message: its own `fields`, else the connection's"""
+        if "fields" in data:
+            return parse_fields(data["fields"])
+        return self.connection(websocket).fields
+
+    async def batch_query(self, websocket, queries, top_k: int = 5, fields=None, **options):
+        """Send a batch_result frame per query as soon as it is answered, then batch_done"""
+        async for event in self.pipeline.query_news_batch(queries, top_k, **options):
+            await self.send(websocket, event, fields)
+
+    async def stream_query(self, websocket, query: str, top_k: int = 5, fields=None, **options):
+        """Send articles first, then summary_delta frames, then the full query_result"""
+        async for event in self.pipeline.query_news_stream(query, top_k, **options):
+            await self.send(websocket, event, fields)
 
     async def start(self):
         logger.info(f"Starting NewsServer on {self.host}:{self.port}")
-        async with websockets.serve(self.register, self.host, self.port):
+        async with websockets.serve(self.register, self.host, self.port, compression=self.compression):
             await asyncio.Future()  # run forever
\ No newline at end of file
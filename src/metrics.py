@@ -0,0 +1,281 @@
+import bisect
+import logging
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+#USE
+#with stage_timer("embed", batch_size=len(texts)):
+#    vectors = model.encode(texts)
+#REGISTRY.render()   # Prometheus text exposition format, served at GET /metrics
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+# Latency buckets in seconds, from a cached lookup to a slow LLM answer
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 1536, 2048, 4096, 8192)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Labelled family of values; subclasses define what one labelled child holds"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(f"{self.name}_total", self._labels(key), value) for key, value in self._children.items()]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = float(value)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._children.items()]
+
+
+class _HistogramChild:
+    """Bucket counts of one labelled histogram series"""
+    __slots__ = ("buckets", "counts", "total", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observations"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def labels(self, **labels) -> _HistogramChild:
+        """The series for these label values; hot paths keep it to skip the label lookup"""
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            with child.lock:
+                counts, total = list(child.counts), child.total
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Metrics of the process, rendered in the Prometheus text format
+
+    Besides metrics updated on the hot path, collectors are called at scrape
+    time to report values that already live elsewhere (cache counters, queue
+    lengths), so tracking them adds no per-request work. A collector is held
+    through a weak reference when it is a bound method, so registering a
+    pipeline's collector does not keep the pipeline alive.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Optional[Callable]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Call `collector` before every render; it sets gauges/counters from live state"""
+        reference = weakref.WeakMethod(collector) if hasattr(collector, "__self__") else (lambda: collector)
+        with self._lock:
+            self._collectors.append(reference)
+
+    def unregister_collector(self, collector: Callable[[], None]):
+        """Stop calling a collector (e.g. when its pipeline is closed)"""
+        with self._lock:
+            self._collectors = [reference for reference in self._collectors if reference() != collector]
+
+    def collect(self):
+        """Run the registered collectors, dropping those whose owner is gone"""
+        with self._lock:
+            collectors = [(reference, reference()) for reference in self._collectors]
+            self._collectors = [reference for reference, collector in collectors if collector is not None]
+        for _, collector in collectors:
+            if collector is None:
+                continue
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        self.collect()
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "newsrag_stage_seconds", "Duration of pipeline stages (embed, vector_query, llm, chunk, upsert, scrape, ...)",
+    ["stage"])
+STAGE_ERRORS = REGISTRY.counter("newsrag_stage_errors", "Pipeline stages that raised", ["stage"])
+BATCH_SIZE = REGISTRY.histogram("newsrag_batch_size", "Items per batch handed to a stage", ["stage"],
+                                buckets=SIZE_BUCKETS)
+CACHE_HITS = REGISTRY.gauge("newsrag_cache_hits", "Cache hits since start", ["cache"])
+CACHE_MISSES = REGISTRY.gauge("newsrag_cache_misses", "Cache misses since start", ["cache"])
+CACHE_HIT_RATIO = REGISTRY.gauge("newsrag_cache_hit_ratio", "Hits / lookups since start", ["cache"])
+QUEUE_DEPTH = REGISTRY.gauge("newsrag_queue_depth", "Items waiting in a queue", ["queue"])
+REFRESH_SECONDS = REGISTRY.histogram("newsrag_refresh_seconds", "Duration of refresh_news runs", ["status"])
+PROMPT_TOKENS = REGISTRY.histogram("newsrag_prompt_tokens", "Estimated prompt tokens per LLM call",
+                                   buckets=TOKEN_BUCKETS)
+INDEX_VERSION = REGISTRY.gauge("newsrag_index_version", "Index version this worker serves")
+REFRESH_LEADER = REGISTRY.gauge("newsrag_refresh_leader", "1 if this worker runs the refreshes, else 0")
+PUSHED_MESSAGES = REGISTRY.counter("newsrag_pushed_messages", "Messages offered to subscriber send queues",
+                                   ["outcome"])
+
+
+class stage_timer:
+    """Time a pipeline stage into newsrag_stage_seconds (and its batch size, if given)
+
+    Used as `with stage_timer("embed", batch_size=n):`. A stage that raises is
+    also counted in newsrag_stage_errors. A debug log line with the duration is
+    emitted only when debug logging is on, so the disabled path is two clock
+    reads and one or two histogram updates.
+    """
+    __slots__ = ("stage", "batch_size", "start")
+    _series: Dict[str, Tuple[_HistogramChild, _HistogramChild]] = {}
+
+    def __init__(self, stage: str, batch_size: Optional[int] = None):
+        self.stage = stage
+        self.batch_size = batch_size
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.start
+        series = self._series.get(self.stage)
+        if series is None:
+            series = self._series[self.stage] = (STAGE_SECONDS.labels(stage=self.stage),
+                                                 BATCH_SIZE.labels(stage=self.stage))
+        series[0].observe(elapsed)
+        if self.batch_size is not None:
+            series[1].observe(self.batch_size)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("stage %s took %.2f ms", self.stage, elapsed * 1000,
+                         extra={"stage": self.stage, "seconds": elapsed, "batch_size": self.batch_size})
+        return False
+
+
+def record_cache(cache: str, hits: int, misses: int):
+    """Report a cache's cumulative hit/miss counters (called from collectors)"""
+    CACHE_HITS.set(hits, cache=cache)
+    CACHE_MISSES.set(misses, cache=cache)
+    lookups = hits + misses
+    CACHE_HIT_RATIO.set(hits / lookups if lookups else 0.0, cache=cache)
@@ -0,0 +1,331 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .filters import MetadataFilter
+from .vector_backends import NumpyBackend, VectorBackend, _locked
+
+#USE
+#backend = PartitionedBackend("data/vector_store/partitions/pdf_documents", partition_hours=24, retention_days=30)
+#backend.query(embeddings, n_results=5, filters=MetadataFilter.from_params(last_hours=24))  # searches 1-2 partitions
+#backend.maintain()   # retention + compaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Partition:
+    """One time range of the collection, stored as its own NumPy index"""
+    name: str
+    start: float
+    end: float
+    backend: NumpyBackend
+    dirty: bool = False
+    compacted: bool = False
+
+    def overlaps(self, since: Optional[float], until: Optional[float]) -> bool:
+        return (since is None or self.end > since) and (until is None or self.start <= until)
+
+
+def _label(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y%m%d%H")
+
+
+class PartitionedBackend(VectorBackend):
+    """Collection split into time partitions by published_at
+
+    Each partition covers [start, end) (one `partition_hours` bucket, or several
+    after a merge) and is a NumpyBackend in its own directory, listed in
+    partitions.json. Time-filtered queries only search the partitions their
+    window overlaps. maintain() applies the retention policy (old partitions are
+    deleted or moved to `archive_directory`) and compacts closed partitions:
+    near-duplicate chunks of the same source are removed and runs of small
+    neighbouring partitions are merged, so both search cost and disk use track the retained window.
+    """
+    MANIFEST = "partitions.json"
+
+    def __init__(self, directory: str, partition_hours: float = 24, retention_days: Optional[float] = None,
+                 archive_directory: Optional[str] = None, min_partition_size: int = 2000,
+                 dedup_threshold: Optional[float] = 0.97, clock: Callable[[], float] = time.time,
+                 read_only: bool = False, **partition_options):
+        """
+        Args:
+            directory: Directory holding the partitions
+            partition_hours: Width of a new partition
+            retention_days: Partitions ending more than this many days ago are expired (None keeps all)
+            archive_directory: Expired partitions are moved here instead of deleted
+            min_partition_size: Closed partitions smaller than this are merged with their neighbours
+            dedup_threshold: Cosine similarity at which compaction drops a later chunk of the same
+                source (None disables)
+            clock: Time source, epoch seconds
+            read_only: Open the partitions without removing leftovers of another process's writes
+            **partition_options: Passed to each partition's NumpyBackend (e.g. mode, n_probe)
+        """
+        self.directory = Path(directory)
+        self.partition_seconds = partition_hours * 3600
+        self.retention_days = retention_days
+        self.archive_directory = Path(archive_directory) if archive_directory else None
+        self.min_partition_size = min_partition_size
+        self.dedup_threshold = dedup_threshold
+        self.clock = clock
+        self.read_only = read_only
+        self.partition_options = dict(partition_options, read_only=read_only)
+        self._lock = threading.RLock()
+        self._partitions: Dict[str, Partition] = {}
+        self._owner: Dict[str, str] = {}
+        self.last_partitions_searched = 0
+        self._load()
+
+    # Persistence
+    def _load(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = self.directory / self.MANIFEST
+        entries = []
+        if manifest.exists():
+            entries = json.loads(manifest.read_text(encoding="utf-8"))["partitions"]
+        for entry in entries:
+            partition = Partition(entry["name"], entry["start"], entry["end"],
+                                  self._open(entry["name"]), compacted=entry.get("compacted", False))
+            self._partitions[partition.name] = partition
+            for doc_id in partition.backend.get()["ids"]:
+                self._owner[doc_id] = partition.name
+        # Directories not in the manifest are leftovers of an interrupted merge or expiry
+        # (or, for a reader, the writer's work in progress)
+        if self.read_only:
+            return
+        for child in self.directory.iterdir():
+            if child.is_dir() and child.name.split(".")[0] not in self._partitions:
+                shutil.rmtree(child, ignore_errors=True)
+
+    def _open(self, name: str) -> NumpyBackend:
+        return NumpyBackend(str(self.directory / name), **self.partition_options)
+
+    def _save_manifest(self):
+        tmp_path = self.directory / (self.MANIFEST + ".tmp")
+        tmp_path.write_text(json.dumps({"partitions": [
+            {"name": p.name, "start": p.start, "end": p.end, "compacted": p.compacted}
+            for p in sorted(self._partitions.values(), key=lambda p: p.start)
+        ]}), encoding="utf-8")
+        os.replace(tmp_path, self.directory / self.MANIFEST)
+
+    @_locked
+    def flush(self):
+        for name, partition in list(self._partitions.items()):
+            if not partition.dirty:
+                continue
+            if partition.backend.count() == 0:
+                del self._partitions[name]
+                shutil.rmtree(self.directory / name, ignore_errors=True)
+                continue
+            partition.backend.flush()
+            partition.dirty = False
+        self._save_manifest()
+
+    # Writes
+    def _partition_for(self, published_at: Optional[float]) -> Partition:
+        timestamp = published_at if isinstance(published_at, (int, float)) else self.clock()
+        for partition in self._partitions.values():
+            if partition.start <= timestamp < partition.end:
+                return partition
+        start = (timestamp // self.partition_seconds) * self.partition_seconds
+        name = _label(start)
+        partition = Partition(name, start, start + self.partition_seconds, self._open(name))
+        self._partitions[name] = partition
+        return partition
+
+    @_locked
+    def upsert(self, ids, embeddings, metadatas, documents):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        groups: Dict[str, List[int]] = {}
+        for i, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+            partition = self._partition_for((metadata or {}).get("published_at"))
+            previous = self._owner.get(doc_id)
+            if previous is not None and previous != partition.name:
+                # The chunk's published time moved it to another partition
+                self._partitions[previous].backend.delete([doc_id])
+                self._partitions[previous].dirty = True
+            self._owner[doc_id] = partition.name
+            groups.setdefault(partition.name, []).append(i)
+        for name, rows in groups.items():
+            partition = self._partitions[name]
+            partition.backend.upsert([ids[i] for i in rows], embeddings[rows],
+                                     [metadatas[i] for i in rows], [documents[i] for i in rows])
+            partition.dirty = True
+            partition.compacted = False
+
+    @_locked
+    def delete(self, ids):
+        groups: Dict[str, List[str]] = {}
+        for doc_id in ids:
+            name = self._owner.pop(doc_id, None)
+            if name is not None:
+                groups.setdefault(name, []).append(doc_id)
+        for name, doc_ids in groups.items():
+            self._partitions[name].backend.delete(doc_ids)
+            self._partitions[name].dirty = True
+
+    # Reads
+    @_locked
+    def query(self, query_embeddings, n_results, filters: Optional[MetadataFilter] = None):
+        since, until = filters.window() if filters is not None else (None, None)
+        selected = [p for p in self._partitions.values() if p.overlaps(since, until)]
+        self.last_partitions_searched = len(selected)
+        n_queries = len(np.atleast_2d(query_embeddings))
+        hits: List[List[tuple]] = [[] for _ in range(n_queries)]
+        for partition in selected:
+            results = partition.backend.query(query_embeddings, n_results, filters=filters)
+            for i in range(n_queries):
+                hits[i].extend(zip(results["distances"][i], results["ids"][i],
+                                   results["documents"][i], results["metadatas"][i]))
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_hits in hits:
+            best = sorted(query_hits, key=lambda hit: hit[0])[:n_results]
+            merged["distances"].append([hit[0] for hit in best])
+            merged["ids"].append([hit[1] for hit in best])
+            merged["documents"].append([hit[2] for hit in best])
+            merged["metadatas"].append([hit[3] for hit in best])
+        return merged
+
+    @_locked
+    def get(self, ids=None):
+        records = {"ids": [], "documents": [], "metadatas": []}
+        if ids is None:
+            groups = {name: None for name in self._partitions}
+        else:
+            groups = {}
+            for doc_id in ids:
+                if doc_id in self._owner:
+                    groups.setdefault(self._owner[doc_id], []).append(doc_id)
+        for name, doc_ids in groups.items():
+            part = self._partitions[name].backend.get(doc_ids)
+            for key in records:
+                records[key].extend(part[key])
+        return records
+
+    @_locked
+    def count(self):
+        return len(self._owner)
+
+    @_locked
+    def ids(self):
+        return list(self._owner)
+
+    @_locked
+    def get_embeddings(self, ids):
+        groups = {}
+        for doc_id in ids:
+            if doc_id in self._owner:
+                groups.setdefault(self._owner[doc_id], []).append(doc_id)
+        embeddings = {}
+        for name, doc_ids in groups.items():
+            embeddings.update(self._partitions[name].backend.get_embeddings(doc_ids))
+        return embeddings
+
+    def partitions(self) -> List[Dict[str, Any]]:
+        """Name, time range and size of every partition, oldest first"""
+        with self._lock:
+            return [{"name": p.name, "start": p.start, "end": p.end, "count": p.backend.count()}
+                    for p in sorted(self._partitions.values(), key=lambda p: p.start)]
+
+    # Housekeeping
+    @_locked
+    def maintain(self) -> Dict[str, List[str]]:
+        expired = self.apply_retention()
+        deduplicated = self.compact()
+        self.flush()
+        return {"expired": expired, "deduplicated": deduplicated}
+
+    @_locked
+    def apply_retention(self) -> List[str]:
+        """Expire partitions that ended before the retention window; returns their chunk IDs"""
+        if self.retention_days is None:
+            return []
+        cutoff = self.clock() - self.retention_days * 86400
+        expired = []
+        for name, partition in list(self._partitions.items()):
+            if partition.end > cutoff:
+                continue
+            ids = [doc_id for doc_id, owner in self._owner.items() if owner == name]
+            if self.archive_directory is not None:
+                partition.backend.flush()
+                self.archive_directory.mkdir(parents=True, exist_ok=True)
+                target = self.archive_directory / name
+                shutil.rmtree(target, ignore_errors=True)
+                shutil.move(str(self.directory / name), str(target))
+            else:
+                shutil.rmtree(self.directory / name, ignore_errors=True)
+            del self._partitions[name]
+            for doc_id in ids:
+                del self._owner[doc_id]
+            expired.extend(ids)
+            logger.info("%s partition %s (%d chunks)", "Archived" if self.archive_directory else "Dropped", name, len(ids))
+        if expired:
+            self._save_manifest()
+        return expired
+
+    @_locked
+    def compact(self) -> List[str]:
+        """Remove same-source near-duplicates from closed partitions and merge small neighbours
+
+        Returns:
+            IDs of the chunks removed as near-duplicates
+        """
+        now = self.clock()
+        closed = sorted((p for p in self._partitions.values() if p.end <= now), key=lambda p: p.start)
+        removed = []
+        if self.dedup_threshold is not None:
+            for partition in closed:
+                if partition.compacted:
+                    continue
+                # Copies carried by another source stay, so source filters keep finding the story
+                duplicates = partition.backend.near_duplicates(self.dedup_threshold, same_source=True)
+                if duplicates:
+                    partition.backend.delete(duplicates)
+                    for doc_id in duplicates:
+                        del self._owner[doc_id]
+                    partition.dirty = True
+                    removed.extend(duplicates)
+                partition.compacted = True
+
+        # Merge runs of adjacent small partitions up to min_partition_size
+        run: List[Partition] = []
+        run_size = 0
+        for partition in closed + [None]:
+            size = partition.backend.count() if partition is not None else 0
+            if partition is not None and size < self.min_partition_size and run_size + size <= self.min_partition_size:
+                run.append(partition)
+                run_size += size
+                continue
+            if len(run) > 1:
+                self._merge(run)
+            run, run_size = ([partition], size) if partition is not None and size < self.min_partition_size else ([], 0)
+        return removed
+
+    def _merge(self, run: List[Partition]):
+        start, end = run[0].start, run[-1].end
+        name = f"{_label(start)}-{_label(end)}"
+        merged = Partition(name, start, end, self._open(name), dirty=True, compacted=all(p.compacted for p in run))
+        for partition in run:
+            ids, vectors, metadatas, documents = partition.backend.export()
+            if ids:
+                merged.backend.upsert(ids, vectors, metadatas, documents)
+            for doc_id in ids:
+                self._owner[doc_id] = name
+        # Write the merged partition and the manifest before removing the old directories
+        merged.backend.flush()
+        merged.dirty = False
+        for partition in run:
+            del self._partitions[partition.name]
+        self._partitions[name] = merged
+        self._save_manifest()
+        for partition in run:
+            shutil.rmtree(self.directory / partition.name, ignore_errors=True)
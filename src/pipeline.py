@@ -1,15 +1,32 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
+import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import os
+import time
 
-from .data_ingestion import process_all_docs, scrape_bbc_headlines
+import numpy as np
+from langchain_core.documents import Document
+
+from .data_ingestion import NewsSource, SourceFetcher, ParallelDocumentLoader, list_local_files
 from .chunking import split_documents
 from .embedding import EmbeddingManager
-from .vectorstore import VectorStore
-from .retriever import RAGRetriever
-from .llm_interface import llm, rag_simple
+from .vectorstore import VectorStore, chunk_id
+from .manifest import IngestionManifest
+from .ingestion import IngestionStream, IngestUnit
+from .retriever import RAGRetriever, RetrievalResult, SearchCandidates
+from .context_builder import ContextBuilder
+from .reranker import CrossEncoderReranker
+from .filters import MetadataFilter
+from .execution import ExecutionLayer
+from .batching import EmbeddingBatcher
+from .answer_cache import CachedAnswer, SemanticAnswerCache
+from .dedup import NearDuplicateIndex
+from .subscriptions import CorpusDelta
+from .serialization import JSON, Fields, encode, encode_frame, project
+from .metrics import QUEUE_DEPTH, REFRESH_SECONDS, REGISTRY, record_cache
+from .llm_interface import get_llm, llm_status, agenerate_answer, astream_answer, prompt_tokens, ERROR_RESPONSE_PREFIX
 
 @dataclass
 class NewsArticle:
@@ -20,78 +37,676 @@ class NewsArticle:
     timestamp: datetime
     embedding: List[float] = None
 
+    def to_document(self) -> Document:
+        return Document(
+            page_content=f"{self.title}\n\n{self.content}",
+            metadata={"source": self.source, "url": self.url, "title": self.title,
+                      "timestamp": self.timestamp.isoformat()}
+        )
+
 class NewsPipeline:
+    # Most queries query_news_batch accepts at once
+    max_batch_queries = 100
+    # Most new chunks a refresh or reload keeps for its subscriber delta; beyond that it sends a resync
+    max_delta_chunks = 10000
+
     def __init__(self, 
                  vector_store: VectorStore,
                  embedding_manager: EmbeddingManager,
-                 max_workers: int = 3):
+                 max_workers: int = 3,
+                 data_directory: str = "data/all_files",
+                 manifest: Optional[IngestionManifest] = None,
+                 execution: Optional[ExecutionLayer] = None,
+                 llm_client: Optional[Any] = None,
+                 sources: Optional[List[NewsSource]] = None,
+                 embed_batch_size: int = 64,
+                 query_batch_size: int = 32,
+                 query_batch_wait_ms: float = 5.0,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 loader_workers: Optional[int] = None,
+                 retrieval_mode: str = "hybrid",
+                 dedup_threshold: Optional[float] = None,
+                 mmr_lambda: Optional[float] = None,
+                 context_tokens: Optional[int] = 1500,
+                 reranker: Optional[CrossEncoderReranker] = None,
+                 rerank_candidates: Optional[int] = None):
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
-        self.retriever = RAGRetriever(vector_store, embedding_manager)
+        # Hybrid retrieval fuses vector search with BM25 so exact names, tickers and dates still match
+        # Retrieved chunks are merged, de-overlapped and packed into a context_tokens budget for the LLM
+        self.retriever = RAGRetriever(vector_store, embedding_manager, mode=retrieval_mode, mmr_lambda=mmr_lambda,
+                                      context_builder=ContextBuilder(max_tokens=context_tokens),
+                                      reranker=reranker, rerank_candidates=rerank_candidates)
         self.max_workers = max_workers
+        self.data_directory = data_directory
+        self.manifest = manifest or IngestionManifest(
+            os.path.join(vector_store.persist_directory, "ingestion_manifest.json")
+        )
+        # Blocking work runs on the execution layer so the event loop keeps serving
+        self.execution = execution or ExecutionLayer(cpu_workers=max_workers)
+        # Groq client: the one passed in, else the shared one, created on first use
+        self.llm_client = llm_client
+        # Live web sources, fetched concurrently over one pooled client (None = defaults, [] = none)
+        self.source_fetcher = SourceFetcher(sources, execution=self.execution)
+        # Local files are parsed in a process pool; unchanged ones are skipped via the manifest
+        self.document_loader = ParallelDocumentLoader(max_workers=loader_workers, manifest=self.manifest)
+        self.embed_batch_size = embed_batch_size
+        # Near-duplicate chunks (syndicated stories, repeated files) are dropped before embedding. Opt-in:
+        # only the kept copy's source is indexed, so a source filter no longer finds the dropped ones
+        self.deduplicator = None
+        if dedup_threshold is not None:
+            self.deduplicator = NearDuplicateIndex(
+                os.path.join(vector_store.persist_directory, "near_duplicates.npz"), threshold=dedup_threshold
+            )
+        # Refreshes build a new index generation; the ingestion state is versioned with it
+        vector_store.attach_file(str(self.manifest.path))
+        if self.deduplicator is not None:
+            vector_store.attach_file(str(self.deduplicator.path))
+        self._index_writes = asyncio.Lock()
+        # Called with a CorpusDelta whenever a refresh or reload brings in new chunks (e.g. SubscriptionHub.publish)
+        self._delta_listeners: List[Callable[[CorpusDelta], Awaitable[None]]] = []
+        # Refreshes stream through bounded load → chunk → dedup → embed → upsert stages
+        self.ingestion = IngestionStream(embedding_manager, vector_store, self.execution,
+                                         batch_size=embed_batch_size, deduplicator=self.deduplicator)
+        # Concurrent queries are coalesced into one encode call
+        self.query_batcher = EmbeddingBatcher(
+            embedding_manager, self.execution,
+            max_batch_size=query_batch_size, max_wait_ms=query_batch_wait_ms
+        )
+        # Answers are cached per corpus version; refresh_news bumps the version
+        self.answer_cache = answer_cache or SemanticAnswerCache()
+        self.corpus_version = 0
+        # Refresh bookkeeping for the readiness report
+        self.refresh_state = "pending"
+        self.refresh_count = 0
+        self.last_refresh: Optional[str] = None
         self.logger = logging.getLogger(__name__)
+        # Cache and queue gauges are read from live state when /metrics is scraped
+        REGISTRY.register_collector(self._collect_metrics)
+
+    def add_delta_listener(self, listener: Callable[[CorpusDelta], Awaitable[None]]):
+        """Have `listener` awaited with the new chunks of every refresh, batch or index reload"""
+        self._delta_listeners.append(listener)
+
+    async def _publish_delta(self, embeddings_by_id: Optional[Dict[str, Any]], deleted: int = 0):
+        """Hand the stored records of newly added chunks to the delta listeners (errors are logged)
+
+        Args:
+            embeddings_by_id: Embeddings of the added chunks, None if there were too many to
+                keep (the listeners get a resync delta)
+            deleted: Number of chunks removed
+        """
+        index = self.vector_store.snapshot()
+        records = {"ids": [], "documents": [], "metadatas": []}
+        if embeddings_by_id:
+            records = await self.execution.run_io("vector", index.get, list(embeddings_by_id))
+        embeddings = np.asarray([embeddings_by_id[doc_id] for doc_id in records["ids"]], dtype=np.float32)
+        delta = CorpusDelta(index.number, records["ids"], records["documents"], records["metadatas"],
+                            embeddings, deleted=deleted, resync=embeddings_by_id is None)
+        for listener in self._delta_listeners:
+            try:
+                await listener(delta)
+            except Exception as e:
+                self.logger.error(f"Publishing a corpus delta failed: {e}")
+
+    @property
+    def llm(self):
+        return self.llm_client or get_llm()
+
+    @llm.setter
+    def llm(self, client):
+        self.llm_client = client
+
+    async def warm_up(self):
+        """Initialise the embedding model, vector store and LLM client concurrently
+
+        Each component is loaded lazily anyway; warming up moves that cost
+        before the first query. The embedding model also runs a dummy encode.
+        Failures are logged and leave the component to load on first use.
+        """
+        steps = {
+            "embedding_model": self.execution.run_cpu("query_embed", self.embedding_manager.warm_up),
+            "vector_store": self.execution.run_io("vector", self.vector_store.warm_up),
+        }
+        if self.llm_client is None:
+            steps["llm"] = self.execution.run_io("llm", get_llm)
+        reranker = self.retriever.reranker
+        if reranker is not None:
+            steps["reranker"] = self.execution.run_cpu("query_embed", reranker.warm_up)
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        for name, result in zip(steps, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Warm-up of {name} failed: {result}")
+
+    def readiness(self) -> Dict[str, Any]:
+        """Which components are initialised, and the state of the news refreshes
+
+        The pipeline is ready once the embedding model, the vector store and the
+        LLM client are loaded; refreshes run in the background and are reported
+        separately, since the store can already serve what it holds.
+        """
+        components = {
+            "embedding_model": getattr(self.embedding_manager, "is_loaded", True),
+            "vector_store": getattr(self.vector_store, "is_loaded", True),
+            "llm": self.llm_client is not None or llm_status()["ready"],
+        }
+        reranker = self.retriever.reranker
+        if reranker is not None:
+            components["reranker"] = reranker.model is not None
+        return {
+            "ready": all(components.values()),
+            "components": components,
+            "refresh": {"state": self.refresh_state, "completed": self.refresh_count,
+                        "last_refresh": self.last_refresh,
+                        "index_generation": self.vector_store.generation if components["vector_store"] else None},
+        }
+
+    def _collect_metrics(self):
+        """Report cache hit rates and queue depths to the metrics registry"""
+        embedding_stats = self.embedding_manager.cache_stats()
+        record_cache("query_embedding", embedding_stats["query_hits"], embedding_stats["query_misses"])
+        record_cache("document_embedding", embedding_stats["document_hits"], embedding_stats["document_misses"])
+        record_cache("answer", self.answer_cache.hits, self.answer_cache.misses)
+        QUEUE_DEPTH.set(self.query_batcher.pending(), queue="query_embed")
+        QUEUE_DEPTH.set(self.execution.queue_depth("cpu"), queue="cpu_executor")
+        QUEUE_DEPTH.set(self.execution.queue_depth("io"), queue="io_executor")
+        ingest_depths = self.ingestion.queue_depths()
+        for name in ("ingest_split", "ingest_embed", "ingest_upsert"):
+            QUEUE_DEPTH.set(ingest_depths.get(name, 0), queue=name)
 
     async def process_news_batch(self, articles: List[NewsArticle]):
-        """Process a batch of news articles in parallel"""
-        chunks = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Chunk articles
-            chunked_articles = list(executor.map(
-                lambda x: split_documents([x]), articles
-            ))
-            chunks.extend([chunk for sublist in chunked_articles for chunk in sublist])
-            
-            # Generate embeddings
-            embeddings = self.embedding_manager.generate_embeddings(
-                [chunk.page_content for chunk in chunks]
-            )
-            
-            # Store in vector DB
-            self.vector_store.add_documents(chunks, embeddings)
-        
+        """Process a batch of news articles without blocking the event loop
+
+        The chunks are written to a new index generation that becomes visible to
+        queries all at once.
+        """
+        chunks = await self.execution.run_cpu(
+            "chunk", split_documents, [article.to_document() for article in articles]
+        )
+        added = {}
+        async with self._index_writes:
+            await self.execution.run_io("vector", self.vector_store.begin_generation)
+            try:
+                if self.deduplicator is not None:
+                    chunks = [chunk for chunk in chunks
+                              if self.deduplicator.check_and_add(chunk_id(chunk), chunk.page_content) is None]
+                    await self.execution.run_io("vector", self.deduplicator.save)
+                await self._embed_and_store(chunks, added if self._delta_listeners else None)
+                await self.execution.run_io("vector", self.vector_store.commit_generation)
+            except Exception:
+                await self._discard_generation()
+                raise
+        if chunks:
+            self.corpus_version += 1
+            self.answer_cache.invalidate()
+            if self._delta_listeners:
+                await self._publish_delta(added)
         return len(chunks)
 
-    async def query_news(self, query: str, top_k: int = 5) -> Dict[str, Any]:
-        """Query the news database"""
-        # Get relevant articles
-        results = self.retriever.retrieve(query, top_k=top_k)
+    async def _discard_generation(self):
+        """Drop a failed write's generation and go back to the ingestion state saved with the current one"""
+        if self.vector_store.building:
+            await self.execution.run_io("vector", self.vector_store.discard_generation)
+        self._reload_ingestion_state()
+
+    def _reload_ingestion_state(self):
+        """Re-read the ingestion manifest and near-duplicate index from disk"""
+        self.manifest = IngestionManifest(str(self.manifest.path))
+        self.document_loader.manifest = self.manifest
+        if self.deduplicator is not None:
+            self.deduplicator = NearDuplicateIndex(str(self.deduplicator.path), threshold=self.deduplicator.threshold)
+            self.ingestion.deduplicator = self.deduplicator
+
+    async def _embed_and_store(self, chunks: List[Document], added: Optional[Dict[str, Any]] = None):
+        """Embed and upsert chunks in fixed-size batches off the event loop
+
+        Args:
+            chunks: Chunks to store
+            added: Filled with the embedding of every stored chunk by ID, if given
+        """
+        for start in range(0, len(chunks), self.embed_batch_size):
+            batch = chunks[start:start + self.embed_batch_size]
+            embeddings = await self.execution.run_cpu(
+                "ingest_embed", self.embedding_manager.generate_embeddings,
+                [chunk.page_content for chunk in batch]
+            )
+            await self.execution.run_io("vector", self.vector_store.add_documents, batch, embeddings)
+            if added is not None:
+                added.update(zip(map(chunk_id, batch), embeddings))
+
+    async def _search(self, query: str, query_embedding, top_k: int, filters: Optional[MetadataFilter] = None,
+                      recency_half_life_hours: Optional[float] = None) -> RetrievalResult:
+        """Look the query up on the I/O executor, then re-rank its candidates"""
+        candidates = await self.execution.run_io("vector", self.retriever.lookup, query, query_embedding, top_k=top_k,
+                                                 filters=filters, recency_half_life_hours=recency_half_life_hours)
+        return await self._rank(candidates)
+
+    async def _rank(self, candidates: SearchCandidates) -> RetrievalResult:
+        """Re-rank search candidates; the cross-encoder and MMR are model work, bounded like query encoding"""
+        if self.retriever.ranks_with_models:
+            return await self.execution.run_cpu("query_embed", self.retriever.rank, candidates)
+        return self.retriever.rank(candidates)
+
+    @staticmethod
+    def _cache_scope(filters: Optional[MetadataFilter], recency_half_life_hours: Optional[float]):
+        """Answer cache scope: filtered or recency-weighted answers are cached apart"""
+        if filters is None and recency_half_life_hours is None:
+            return None
+        return filters.cache_key() if filters is not None else None, recency_half_life_hours
+
+    async def query_news(self, query: str, top_k: int = 5, filters: Optional[MetadataFilter] = None,
+                         recency_half_life_hours: Optional[float] = None) -> Dict[str, Any]:
+        """Query the news database
+
+        Args:
+            query: The question
+            top_k: Number of articles to retrieve
+            filters: Source/time restrictions, evaluated inside the indexes
+            recency_half_life_hours: Re-score articles by age with this half-life
+        """
+        response, _ = await self._answer(query, top_k, filters, recency_half_life_hours)
+        return response
+
+    async def query_news_payload(self, query: str, top_k: int = 5, filters: Optional[MetadataFilter] = None,
+                                 recency_half_life_hours: Optional[float] = None, encoding: str = JSON,
+                                 fields: Fields = None, message_type: Optional[str] = None) -> Union[str, bytes]:
+        """query_news's result, serialized
+
+        The serialized result is kept with the cached answer, so a repeated
+        query in the same encoding costs no serialization at all.
+
+        Args:
+            encoding: "json" or "msgpack" (see serialization.negotiate)
+            fields: Article fields to keep (see serialization.project), None for all
+            message_type: Wrap the result in a {"type": message_type, "data": ...} WebSocket
+                frame (str for JSON, bytes for msgpack); None returns the bare result as bytes
+        Other arguments are the same as query_news's.
+        """
+        response, entry = await self._answer(query, top_k, filters, recency_half_life_hours)
+
+        def build():
+            if message_type is not None:
+                return encode_frame({"type": message_type, "data": response}, encoding, fields)
+            return encode(project(response, fields), encoding)
+
+        if entry is None:
+            return build()
+        # The query is part of the key: a near-duplicate hit echoes the caller's own query
+        return self.answer_cache.payload(entry, (query, encoding, fields, message_type), build)
+
+    async def _answer(self, query: str, top_k: int, filters: Optional[MetadataFilter],
+                      recency_half_life_hours: Optional[float]) -> Tuple[Dict[str, Any], Optional[CachedAnswer]]:
+        """query_news's result and its answer cache entry (None if it was not cached)"""
+        corpus_version = self.corpus_version
+        scope = self._cache_scope(filters, recency_half_life_hours)
+        # Encode via the micro-batcher; the embedding serves both the cache lookup and the search
+        query_embedding = await self.query_batcher.embed(query)
+        cached = self.answer_cache.lookup(query, query_embedding, top_k, corpus_version, scope)
+        if cached is not None:
+            return {**cached.value, "query": query}, cached
+
+        # Retrieve once; the same result feeds the articles and the LLM context
+        result = await self._search(query, query_embedding, top_k, filters, recency_half_life_hours)
         
         # Generate summary with LLM
-        summary = rag_simple(query, self.retriever, llm, top_k=top_k)
+        async with self.execution.limit("llm"):
+            summary = await agenerate_answer(result, self.llm)
         
+        response = self._response(query, summary, result)
+        if summary.startswith(ERROR_RESPONSE_PREFIX):
+            return response, None
+        return response, self.answer_cache.put(query, query_embedding, top_k, corpus_version, response, scope)
+
+    @staticmethod
+    def _response(query: str, summary: str, result: RetrievalResult) -> Dict[str, Any]:
         return {
             "query": query,
             "summary": summary,
-            "articles": results,
+            "articles": result.documents,
+            "prompt_tokens": prompt_tokens(result) if result.documents else 0,
             "timestamp": datetime.now().isoformat()
         }
 
-    async def refresh_news(self):  # Make refresh_news async
-        """Refresh news from all sources"""
+    async def query_news_batch(self, queries: List[str], top_k: int = 5, filters: Optional[MetadataFilter] = None,
+                               recency_half_life_hours: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Answer several queries together, yielding each result as soon as it is ready
+
+        All queries are embedded in one encode call and searched with one
+        similarity search over the index; their LLM calls then run concurrently,
+        bounded by the execution layer's "llm" limit. Cached answers come first.
+        Takes the same options as query_news, applied to every query.
+
+        Yields:
+            {"type": "batch_result", "data": {"index": i, ...}}  per query, in completion order,
+                with the same fields as query_news's result; `index` is the query's position
+            {"type": "batch_done", "data": {"count": n, "cached": c}}  after the last result
+        """
+        queries = list(queries)
+        if not queries:
+            raise ValueError("No queries given")
+        if len(queries) > self.max_batch_queries:
+            raise ValueError(f"At most {self.max_batch_queries} queries per batch")
+        corpus_version = self.corpus_version
+        scope = self._cache_scope(filters, recency_half_life_hours)
+        embeddings = await self.execution.run_cpu(
+            "query_embed", self.embedding_manager.generate_embeddings, queries, is_query=True
+        )
+        pending = []
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            cached = self.answer_cache.get(query, embedding, top_k, corpus_version, scope)
+            if cached is not None:
+                yield {"type": "batch_result", "data": {**cached, "query": query, "index": i}}
+            else:
+                pending.append(i)
+
+        if pending:
+            candidates = await self.execution.run_io(
+                "vector", self.retriever.lookup_batch, [queries[i] for i in pending],
+                np.asarray(embeddings)[pending], top_k=top_k, filters=filters,
+                recency_half_life_hours=recency_half_life_hours
+            )
+            results = await asyncio.gather(*map(self._rank, candidates))
+
+            async def answer(i: int, result: RetrievalResult):
+                async with self.execution.limit("llm"):
+                    summary = await agenerate_answer(result, self.llm)
+                response = self._response(queries[i], summary, result)
+                if not summary.startswith(ERROR_RESPONSE_PREFIX):
+                    self.answer_cache.put(queries[i], embeddings[i], top_k, corpus_version, response, scope)
+                return i, response
+
+            tasks = [asyncio.ensure_future(answer(i, result)) for i, result in zip(pending, results)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    i, response = await next_done
+                    yield {"type": "batch_result", "data": {**response, "index": i}}
+            finally:
+                # The consumer went away (e.g. the client disconnected): stop the remaining LLM calls
+                for task in tasks:
+                    task.cancel()
+        yield {"type": "batch_done", "data": {"count": len(queries), "cached": len(queries) - len(pending)}}
+
+    async def query_news_stream(self, query: str, top_k: int = 5, filters: Optional[MetadataFilter] = None,
+                                recency_half_life_hours: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Query the news database, streaming the answer as it is generated
+
+        Takes the same arguments as query_news.
+
+        Yields events in order:
+            {"type": "articles", ...}       as soon as retrieval finishes
+            {"type": "summary_delta", ...}  for every chunk of tokens from the LLM
+            {"type": "query_result", ...}   the complete result, same shape as query_news
+        """
+        corpus_version = self.corpus_version
+        scope = self._cache_scope(filters, recency_half_life_hours)
+        query_embedding = await self.query_batcher.embed(query)
+        cached = self.answer_cache.get(query, query_embedding, top_k, corpus_version, scope)
+        if cached is not None:
+            # A cached answer is sent as a single delta
+            yield {"type": "articles", "data": {"query": query, "articles": cached["articles"]}}
+            yield {"type": "summary_delta", "data": {"delta": cached["summary"]}}
+            yield {"type": "query_result", "data": {**cached, "query": query}}
+            return
+
+        result = await self._search(query, query_embedding, top_k, filters, recency_half_life_hours)
+        yield {"type": "articles", "data": {"query": query, "articles": result.documents}}
+
+        # The answer is generated by its own task into a queue, so the "llm" slot is
+        # released when the LLM is done, not when a slow client has read every delta
+        deltas: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.ensure_future(self._stream_answer(result, deltas))
         try:
-            # Process local documents
-            local_docs = process_all_docs("data/all_files")
-            
-            # Get live news
-            bbc_news = scrape_bbc_headlines()
-            
-            if not local_docs and not bbc_news:
-                self.logger.warning("No documents found to process")
-                return
-            
-            # Combine and process
-            all_docs = local_docs + bbc_news
-            chunks = split_documents(all_docs)
-            
-            if not chunks:
-                self.logger.warning("No chunks generated from documents")
-                return
-                
-            embeddings = self.embedding_manager.generate_embeddings(
-                [chunk.page_content for chunk in chunks]
+            while (delta := await deltas.get()) is not None:
+                yield {"type": "summary_delta", "data": {"delta": delta}}
+            summary, failed = await producer
+        finally:
+            # The consumer went away (e.g. the client disconnected): stop the LLM call
+            producer.cancel()
+
+        response = self._response(query, summary, result)
+        if not failed:
+            self.answer_cache.put(query, query_embedding, top_k, corpus_version, response, scope)
+        yield {"type": "query_result", "data": response}
+
+    async def _stream_answer(self, result: RetrievalResult, deltas: asyncio.Queue) -> Tuple[str, bool]:
+        """Put the answer's deltas into `deltas` under the "llm" limit, then None
+
+        Returns:
+            The whole answer, and whether it is an error response
+        """
+        parts = []
+        failed = False
+        try:
+            async with self.execution.limit("llm"):
+                async for delta in astream_answer(result, self.llm):
+                    parts.append(delta)
+                    failed = failed or delta.startswith(ERROR_RESPONSE_PREFIX)
+                    deltas.put_nowait(delta)
+        finally:
+            deltas.put_nowait(None)
+        return "".join(parts), failed
+
+    async def refresh_news(self, rebuild: bool = False) -> Dict[str, int]:
+        """Incrementally refresh news from all sources
+
+        Files and web sources stream through IngestionStream (load → chunk → embed →
+        upsert in bounded batches). Only new or changed chunks are embedded; chunks
+        that a changed or removed file no longer produces are deleted. A file or
+        source whose batch failed is not recorded in the manifest and is retried on
+        the next refresh.
+
+        The refresh writes into a new index generation while queries keep reading
+        the current one, and swaps it in only once it is complete; if the refresh
+        fails, the generation is discarded and the index is left as it was.
+
+        Args:
+            rebuild: Build the index from scratch instead of updating a copy of the current one
+
+        Returns:
+            Chunk and file counts, and `committed`: whether a new generation was committed
+            (False when the refresh found nothing to add, delete or expire)
+        """
+        async with self._index_writes:
+            return await self._refresh(rebuild)
+
+    async def _refresh(self, rebuild: bool) -> Dict[str, int]:
+        self.refresh_state = "running"
+        started = time.perf_counter()
+        try:
+            await self.execution.run_io("vector", self.vector_store.begin_generation, rebuild)
+            if rebuild:
+                self.manifest.clear()
+                if self.deduplicator is not None:
+                    self.deduplicator.clear()
+            stale_ids = set()
+            file_updates = {}
+            source_ids = {}
+
+            # Local files: removed ones are deleted, unchanged ones skipped
+            local_files = {str(path): path for path in list_local_files(self.data_directory)}
+            removed_paths = self.manifest.known_paths() - set(local_files)
+            for path in removed_paths:
+                stale_ids.update(self.manifest.file_chunks(path))
+            changed = self.document_loader.changed_files(local_files.values())
+            skipped_files = len(local_files) - len(changed)
+            stats = {str(file_path): stat for file_path, stat in changed}
+
+            async def units():
+                async for loaded in self.document_loader.aload(stats, execution=self.execution):
+                    if loaded.error:
+                        self.logger.error(f"Failed to load {loaded.path}: {loaded.error}")
+                        continue
+                    stat = stats[loaded.path]
+                    # A local file counts as published when it was last modified
+                    for doc in loaded.documents:
+                        doc.metadata.setdefault("published_at", stat.st_mtime)
+                    yield IngestUnit(key=loaded.path, kind="file", documents=loaded.documents,
+                                     info={"stat": stat})
+                # Live news: web documents are kept once stored, only unseen ones are embedded
+                if self.source_fetcher.sources:
+                    async with self.execution.limit("http"):
+                        web_docs = await self.source_fetcher.fetch_all()
+                    by_source = {}
+                    for doc in web_docs:
+                        by_source.setdefault(doc.metadata["source"], []).append(doc)
+                    for source, docs in by_source.items():
+                        yield IngestUnit(key=source, kind="source", documents=docs)
+
+            def select_new(unit: IngestUnit) -> List[Document]:
+                ids = [chunk_id(chunk) for chunk in unit.chunks]
+                unit.info["chunk_ids"] = ids
+                if unit.kind == "file":
+                    known = set(self.manifest.file_chunks(unit.key))
+                    # A changed file's old chunks are about to go; its new ones never duplicate them
+                    unit.info["replaces"] = known
+                else:
+                    known = self.manifest.source_chunks(unit.key)
+                return [chunk for chunk, cid in zip(unit.chunks, ids) if cid not in known]
+
+            def on_complete(unit: IngestUnit):
+                ids = unit.info["chunk_ids"]
+                if unit.kind == "file":
+                    stale_ids.update(set(self.manifest.file_chunks(unit.key)) - set(ids))
+                    file_updates[unit.key] = (unit.info["stat"], ids)
+                else:
+                    source_ids[unit.key] = ids
+
+            # New chunks are pushed to subscribers after the swap (not for a rebuild, where all are new).
+            # At most max_delta_chunks are kept so a large refresh stays bounded; past that, a resync.
+            added = {} if self._delta_listeners and not rebuild else None
+            overflow = False
+
+            def on_upserted(chunks: List[Document], embeddings):
+                nonlocal overflow
+                if overflow:
+                    return
+                added.update(zip(map(chunk_id, chunks), embeddings))
+                if len(added) > self.max_delta_chunks:
+                    overflow = True
+                    added.clear()
+
+            result = await self.ingestion.run(units(), select_new, on_complete,
+                                              on_upserted if added is not None else None)
+            await self.execution.run_io("vector", self.vector_store.delete_documents, stale_ids)
+            # Retention and compaction (a no-op unless the store is partitioned)
+            maintenance = await self.execution.run_io("vector", self.vector_store.maintain)
+
+            # Record progress only once the vector store reflects it
+            for path in removed_paths:
+                self.manifest.remove_file(path)
+            for path, (stat, ids) in file_updates.items():
+                self.manifest.update_file(path, stat, ids)
+            for source, ids in source_ids.items():
+                self.manifest.add_source_chunks(source, ids)
+            # Expired chunks are forgotten; near-duplicates stay known so they are not re-embedded
+            self.manifest.forget_chunks(maintenance["expired"])
+            if self.deduplicator is not None:
+                # Chunks dropped as copies of a deleted chunk are ingested again on the next refresh
+                self.manifest.invalidate_chunks(self.deduplicator.remove(stale_ids))
+                self.deduplicator.remove(maintenance["expired"] + maintenance["deduplicated"])
+                await self.execution.run_io("vector", self.deduplicator.save)
+            await self.execution.run_io("vector", self.manifest.save)
+            removed = len(maintenance["expired"]) + len(maintenance["deduplicated"])
+            changed = bool(result.embedded or stale_ids or removed or rebuild)
+            if changed:
+                # Queries switch to the new generation here, all at once
+                generation = await self.execution.run_io("vector", self.vector_store.commit_generation)
+            else:
+                # Nothing was written: keep serving the current generation instead of committing a copy
+                await self.execution.run_io("vector", self.vector_store.discard_generation, unchanged=True)
+                generation = self.vector_store.generation
+
+            # The corpus changed: answers computed against the old one are stale
+            if changed:
+                self.corpus_version += 1
+                self.answer_cache.invalidate()
+                if overflow:
+                    await self._publish_delta(None, deleted=len(stale_ids) + removed)
+                elif added is not None:
+                    gone = stale_ids.union(maintenance["expired"], maintenance["deduplicated"])
+                    await self._publish_delta({doc_id: embedding for doc_id, embedding in added.items()
+                                               if doc_id not in gone}, deleted=len(stale_ids) + removed)
+
+            self.logger.info(
+                f"Refresh done: {result.embedded} chunks upserted in {result.batches} batches, "
+                f"{len(stale_ids)} deleted, {skipped_files} unchanged files skipped, "
+                f"{result.failed_units} files/sources failed, {result.duplicates} near-duplicates skipped, "
+                f"{len(maintenance['expired'])} expired, "
+                f"{len(maintenance['deduplicated'])} near-duplicates compacted, "
+                f"index generation {generation}"
             )
-            self.vector_store.add_documents(chunks, embeddings)
+            self.refresh_state = "idle"
+            REFRESH_SECONDS.observe(time.perf_counter() - started, status="ok")
+            self.refresh_count += 1
+            self.last_refresh = datetime.now().isoformat()
+            return {"added": result.embedded, "deleted": len(stale_ids), "skipped_files": skipped_files,
+                    "failed": result.failed_units, "expired": len(maintenance["expired"]),
+                    "deduplicated": len(maintenance["deduplicated"]), "duplicates": result.duplicates,
+                    "committed": changed}
             
         except Exception as e:
+            self.refresh_state = "failed"
+            REFRESH_SECONDS.observe(time.perf_counter() - started, status="failed")
             self.logger.error(f"Error in refresh_news: {e}")
-            raise
\ No newline at end of file
+            await self._discard_generation()
+            raise
+
+    async def reload_index(self, read_only: Optional[bool] = None):
+        """Re-open the vector store from disk after another process refreshed it
+
+        Answers cached against the previous index are dropped with it. A store
+        switched to writable (this worker takes over refreshing) also re-reads
+        the ingestion manifest and near-duplicate index the previous writer saved.
+
+        Args:
+            read_only: Switch the store to read-only or writable mode (None keeps it)
+        """
+        previous = self.vector_store.snapshot() if self._delta_listeners and self.vector_store.is_loaded else None
+        await self.execution.run_io("vector", self.vector_store.reload, read_only)
+        if read_only is False:
+            self._reload_ingestion_state()
+        self.corpus_version += 1
+        self.answer_cache.invalidate()
+        if previous is not None:
+            await self._publish_reload_delta(previous)
+
+    async def _publish_reload_delta(self, previous):
+        """Publish the chunks another process added, by comparing the reloaded generation with the previous one
+
+        Only the ID sets are compared; the new chunks' vectors are read from the
+        generation's backend (nothing is embedded, nothing is written).
+        """
+        current = self.vector_store.snapshot()
+        old_ids = set(await self.execution.run_io("vector", previous.ids))
+        current_ids = await self.execution.run_io("vector", current.ids)
+        new_ids = [doc_id for doc_id in current_ids if doc_id not in old_ids]
+        deleted = len(old_ids) + len(new_ids) - len(current_ids)
+        if not new_ids and not deleted:
+            return
+        if len(new_ids) > self.max_delta_chunks:
+            await self._publish_delta(None, deleted=deleted)
+            return
+        embeddings = await self.execution.run_io("vector", current.get_embeddings, new_ids)
+        await self._publish_delta(embeddings, deleted=deleted)
+
+    async def rollback_index(self) -> int:
+        """Make the previous index generation current again, with the ingestion state saved with it
+
+        The next refresh then re-ingests whatever changed since that generation.
+
+        Returns:
+            The number of the now current generation
+        """
+        async with self._index_writes:
+            generation = await self.execution.run_io("vector", self.vector_store.rollback)
+            self._reload_ingestion_state()
+        self.corpus_version += 1
+        self.answer_cache.invalidate()
+        return generation
+
+    async def close(self):
+        """Release the HTTP client, loader processes and executor threads"""
+        REGISTRY.unregister_collector(self._collect_metrics)
+        await self.source_fetcher.aclose()
+        self.document_loader.shutdown()
+        self.execution.shutdown()
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import stage_timer
+
+#USE
+#reranker = CrossEncoderReranker(batch_size=16, latency_budget_ms=150)
+#retriever = RAGRetriever(vector_store, embedding_manager, reranker=reranker, rerank_candidates=30)
+#reranker.rerank("fed rate decision", retrieved_docs, top_k=5)
+
+logger = logging.getLogger(__name__)
+
+
+class _ScoreRequest:
+    """(query, passage) pairs of one caller waiting to be scored"""
+    def __init__(self, pairs: List[Tuple[str, str]], deadline: Optional[float]):
+        self.pairs = pairs
+        self.deadline = deadline
+        self.scores = np.empty(len(pairs), dtype=np.float32)
+        self.remaining = len(pairs)
+        self.timed_out = False
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks with a cross-encoder reading query and chunk together
+
+    The model is loaded on first use (or by warm_up()). Scoring runs on one
+    scorer thread with its own micro-batching: pairs from concurrent callers
+    that arrive within `max_wait_ms` of each other are scored together in model
+    batches of `batch_size`. Every call has a latency budget; a caller whose
+    budget runs out before all of its pairs are scored gets None from score(),
+    even while the scorer is busy with other callers' pairs, and rerank()
+    returns the documents in their original bi-encoder order.
+    """
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16,
+                 latency_budget_ms: Optional[float] = 150.0, max_wait_ms: float = 2.0, max_length: int = 256,
+                 model: Optional[Any] = None):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder to load
+            batch_size: Pairs per model call
+            latency_budget_ms: Time a rerank call may take before falling back (None waits for scoring)
+            max_wait_ms: How long the first caller waits for concurrent callers to join its batch
+            max_length: Token limit of each (query, chunk) pair
+            model: Already loaded scorer with a CrossEncoder-style predict(pairs, batch_size=...)
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.max_wait = max_wait_ms / 1000
+        self.max_length = max_length
+        self.model = model
+        self._load_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending: List[_ScoreRequest] = []
+        self._scorer: Optional[threading.Thread] = None
+        self.calls = 0
+        self.fallbacks = 0
+        self.model_batches = 0
+        self.scored_pairs = 0
+
+    def _load_model(self):
+        """Load the CrossEncoder once, on first use"""
+        with self._load_lock:
+            if self.model is None:
+                from sentence_transformers import CrossEncoder
+                logger.info("Loading re-ranker model: %s", self.model_name)
+                self.model = CrossEncoder(self.model_name, max_length=self.max_length)
+        return self.model
+
+    def warm_up(self):
+        """Load the model and run one pair so the first query does not pay for it"""
+        self._predict([("warm up", "warm up")])
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        model = self.model or self._load_model()
+        self.model_batches += 1
+        self.scored_pairs += len(pairs)
+        with stage_timer("rerank", batch_size=len(pairs)):
+            return np.asarray(model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                              dtype=np.float32).reshape(-1)
+
+    def score(self, query: str, passages: Sequence[str],
+              latency_budget_ms: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Cross-encoder scores of `passages` for `query`, batched with concurrent callers
+
+        Args:
+            query: The search query
+            passages: Texts to score
+            latency_budget_ms: Overrides the reranker's budget for this call
+
+        Returns:
+            One score per passage (higher is more relevant), or None if the budget ran out
+        """
+        budget = latency_budget_ms if latency_budget_ms is not None else self.latency_budget_ms
+        deadline = time.perf_counter() + budget / 1000 if budget is not None else None
+        request = _ScoreRequest([(query, passage) for passage in passages], deadline)
+        if not request.pairs:
+            return request.scores
+        with self._cond:
+            if self._scorer is None:
+                self._scorer = threading.Thread(target=self._score_loop, name="reranker", daemon=True)
+                self._scorer.start()
+            self._pending.append(request)
+            self._cond.notify_all()
+        # The caller only waits for its own deadline, whatever the scorer thread is busy with
+        if not request.done.wait(None if deadline is None else max(deadline - time.perf_counter(), 0)):
+            self._finish(request, timed_out=True)
+        if request.error is not None:
+            raise request.error
+        return None if request.timed_out else request.scores
+
+    def _finish(self, request: _ScoreRequest, timed_out: bool = False, error: Optional[BaseException] = None):
+        """Release a waiting caller once; whichever of the scorer and the caller's timeout comes first wins"""
+        with self._cond:
+            if request.done.is_set():
+                return
+            request.timed_out = timed_out
+            request.error = error
+            request.done.set()
+
+    def _score_loop(self):
+        """Scorer thread: collect concurrent requests for up to max_wait, then score them in model batches"""
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wait_until = time.perf_counter() + self.max_wait
+                while sum(r.remaining for r in self._pending) < self.batch_size:
+                    remaining = wait_until - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_ScoreRequest]):
+        """Score the pairs of `batch`, skipping callers that have already given up"""
+        queue = [(request, i) for request in batch for i in range(len(request.pairs))]
+        position = 0
+        try:
+            while position < len(queue):
+                chunk = []
+                while position < len(queue) and len(chunk) < self.batch_size:
+                    request, i = queue[position]
+                    position += 1
+                    if not request.done.is_set():
+                        chunk.append((request, i))
+                if not chunk:
+                    break
+                scores = self._predict([request.pairs[i] for request, i in chunk])
+                now = time.perf_counter()
+                for (request, i), value in zip(chunk, scores):
+                    request.scores[i] = value
+                    request.remaining -= 1
+                    if request.remaining == 0:
+                        # Scores that land after the deadline are dropped, not returned late
+                        self._finish(request, timed_out=request.deadline is not None and now > request.deadline)
+        except Exception as e:
+            for request in batch:
+                self._finish(request, error=e)
+
+    def rerank(self, query: str, documents: List[Dict[str, Any]], top_k: Optional[int] = None,
+               latency_budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Order retrieved documents by cross-encoder score
+
+        Args:
+            query: The search query
+            documents: Candidates in bi-encoder order (dicts with content)
+            top_k: Number of documents to return (all if None)
+            latency_budget_ms: Overrides the reranker's budget for this call
+
+        Returns:
+            The best documents with rerank_score and rank set, or the first top_k
+            unchanged if scoring failed or ran over the budget
+        """
+        self.calls += 1
+        top_k = len(documents) if top_k is None else top_k
+        try:
+            scores = self.score(query, [doc['content'] for doc in documents], latency_budget_ms)
+        except Exception as e:
+            logger.warning("Re-ranking failed, keeping retrieval order: %s", e)
+            scores = None
+        if scores is None:
+            self.fallbacks += 1
+            return documents[:top_k]
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [{**documents[i], 'rerank_score': float(scores[i]), 'rank': rank}
+                for rank, i in enumerate(order, start=1)]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "model_batches": self.model_batches,
+            "scored_pairs": self.scored_pairs,
+            "mean_batch_size": self.scored_pairs / self.model_batches if self.model_batches else 0.0,
+        }
@@ -1,24 +1,148 @@
-from typing import List,Dict,Any,Tuple
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List,Dict,Any,Optional,Tuple
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+import numpy as np
+from src.context_builder import ContextBuilder, PackedContext
+from src.filters import MetadataFilter, half_life_hours
+from src.generations import IndexGeneration
+from src.reranker import CrossEncoderReranker
 from src.vectorstore import VectorStore
 from src.embedding import EmbeddingManager
 #USE 
 #rag_retriever=RAGRetriever(vectorstore,embedding_manager)
+#hybrid_retriever=RAGRetriever(vectorstore,embedding_manager,mode="hybrid")
+#hybrid_retriever.retrieve("rates", filters=MetadataFilter.from_params(sources=["BBC"], last_hours=24), recency_half_life_hours=12)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetrievalResult:
+    """Documents retrieved for one query, shared by the article list and the LLM prompt"""
+    query: str
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    context_builder: Optional[ContextBuilder] = field(default=None, repr=False, compare=False)
+
+    @cached_property
+    def packed(self) -> PackedContext:
+        """The documents packed into the token budget (all of them, de-overlapped, without a builder)"""
+        builder = self.context_builder or ContextBuilder(max_tokens=None)
+        return builder.build(self.query, self.documents)
+
+    @property
+    def context(self) -> str:
+        """Context block for the LLM prompt built from the retrieved documents"""
+        return self.packed.text
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+@dataclass
+class SearchCandidates:
+    """Index hits for one query before re-ranking: what RAGRetriever.lookup() hands to rank()"""
+    query: str
+    query_embedding: Any
+    top_k: int
+    half_life: Optional[float]
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    score_key: str = 'similarity_score'
+    index: Optional[IndexGeneration] = field(default=None, repr=False, compare=False)
+
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: each list contributes 1 / (k + rank) to every ID it ranks"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def recency_weight(published_at: Optional[float], half_life_hours: float, now: float) -> float:
+    """Exponential decay by age: 1 for a chunk published now, 0.5 after one half-life"""
+    if published_at is None:
+        return 0.5
+    age_hours = max(0.0, now - published_at) / 3600
+    return 0.5 ** (age_hours / half_life_hours)
+
+
+def scaled_rerank_scores(docs: List[Dict[str, Any]]) -> np.ndarray:
+    """Cross-encoder scores of the candidates min-max scaled to [0, 1]
+
+    Depending on the model they are raw logits (possibly negative) or
+    probabilities; recency decay multiplies scores and MMR weighs them against
+    cosine similarities, so both use this common, non-negative scale.
+    """
+    scores = np.array([doc['rerank_score'] for doc in docs], dtype=np.float32)
+    spread = float(scores.max() - scores.min()) if len(scores) else 0.0
+    if spread == 0.0:
+        return np.ones(len(scores), dtype=np.float32)
+    return (scores - scores.min()) / spread
 
 
 # Retriver pipeline from Vector Store
 class RAGRetriever:
-    """Handles query based retrival from Vector Store"""
-    def __init__(self, vector_store : VectorStore, embedding_manager : EmbeddingManager):
+    """Handles query based retrival from Vector Store
+
+    Modes:
+        vector:  cosine similarity of the query embedding (default)
+        lexical: BM25 over the store's inverted index, for exact names, tickers and dates
+        hybrid:  both, fused with reciprocal rank fusion
+
+    Source and time filters are passed down to the vector and BM25 indexes. With
+    a recency half-life, a deeper candidate list is re-scored by
+    score * 0.5 ** (age / half-life) so fresher stories rank higher. With
+    mmr_lambda, the final top_k is picked from that deeper list by maximal
+    marginal relevance, trading relevance against similarity to the articles
+    already picked so one story does not fill every slot.
+
+    With a cross-encoder reranker, rerank_candidates hits are fetched and
+    re-scored by the cross-encoder before recency and diversity are applied; if
+    it runs over its latency budget the bi-encoder order is kept.
+    """
+    def __init__(self, vector_store : VectorStore, embedding_manager : EmbeddingManager,
+                 mode: str = "vector", rrf_k: int = 60, candidate_depth: int = 4,
+                 recency_half_life_hours: Optional[float] = None, mmr_lambda: Optional[float] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 reranker: Optional[CrossEncoderReranker] = None, rerank_candidates: Optional[int] = None):
         """Initialize the retriver
 
         Args:
             vector_store: vector store for containing document embeddings
             embedding_manager: Manager for generating query embeddings
+            mode: Default retrieval mode, one of RETRIEVAL_MODES
+            rrf_k: Rank offset of reciprocal rank fusion (higher flattens the fused ranking)
+            candidate_depth: In hybrid mode each ranker contributes top_k * candidate_depth candidates
+                (also the depth re-scored for recency)
+            recency_half_life_hours: Default recency decay half-life (None disables it)
+            mmr_lambda: Relevance weight of MMR diversity re-ranking, 1 = pure relevance
+                (None disables it)
+            context_builder: Packs results into the LLM context (default: 1500-token budget)
+            reranker: Cross-encoder re-scoring the candidates (None disables re-ranking)
+            rerank_candidates: Candidates fetched for the reranker (default top_k * candidate_depth)
         """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
-    def retrieve(self, query: str, top_k: int = 5, score_threshold: float = 0.0) -> List[Dict[str, Any]]:
+        self.mode = mode
+        self.rrf_k = rrf_k
+        self.candidate_depth = candidate_depth
+        self.recency_half_life_hours = half_life_hours(recency_half_life_hours)
+        self.mmr_lambda = mmr_lambda
+        self.context_builder = context_builder or ContextBuilder()
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+
+    def retrieve(self, query: str, top_k: int = 5, score_threshold: float = 0.0,
+                 mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+                 recency_half_life_hours: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query
 
@@ -26,54 +150,324 @@ class RAGRetriever:
             query: The search query
             top_k: Number of top results to return
             score_threshold: Minimum similarity score threshold
+            mode: Retrieval mode, defaults to the retriever's mode
+            filters: Source/time restrictions evaluated inside the indexes
+            recency_half_life_hours: Recency decay half-life, defaults to the retriever's
 
         Returns:
             List of dictionaries containing retrieved documents and metadata
         """
-        print(f"Retrieving documents for query: '{query}'")
-        print(f"Top K: {top_k}, Score threshold: {score_threshold}")
+        return self.retrieve_result(query, top_k=top_k, score_threshold=score_threshold, mode=mode,
+                                    filters=filters, recency_half_life_hours=recency_half_life_hours).documents
+
+    def retrieve_result(self, query: str, top_k: int = 5, score_threshold: float = 0.0,
+                        mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+                        recency_half_life_hours: Optional[float] = None) -> RetrievalResult:
+        """
+        Retrieve relevant documents for a query as a single reusable result
+
+        Args:
+            query: The search query
+            top_k: Number of top results to return
+            score_threshold: Minimum similarity score threshold
+            mode: Retrieval mode, defaults to the retriever's mode
+            filters: Source/time restrictions evaluated inside the indexes
+            recency_half_life_hours: Recency decay half-life, defaults to the retriever's
+
+        Returns:
+            RetrievalResult holding the retrieved documents, used for both the
+            returned articles and the LLM context
+        """
+        logger.debug("Retrieving documents for query %r (top_k=%d, score_threshold=%s)", query, top_k, score_threshold)
+
+        # Generate query embedding (BM25 alone does not need one)
+        query_embedding = None
+        if (mode or self.mode) != "lexical":
+            query_embedding = self.embedding_manager.generate_embeddings([query], is_query=True)[0]
+        return self.search(query, query_embedding, top_k=top_k, score_threshold=score_threshold, mode=mode,
+                           filters=filters, recency_half_life_hours=recency_half_life_hours)
+
+    def search(self, query: str, query_embedding, top_k: int = 5, score_threshold: float = 0.0,
+               mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+               recency_half_life_hours: Optional[float] = None) -> RetrievalResult:
+        """
+        Search the store with an already computed query embedding
+
+        Args:
+            query: The search query the embedding was generated from
+            query_embedding: Embedding vector of the query (unused in lexical mode)
+            top_k: Number of top results to return
+            score_threshold: Minimum similarity score threshold for vector hits
+            mode: Retrieval mode, defaults to the retriever's mode
+            filters: Source/time restrictions evaluated inside the indexes
+            recency_half_life_hours: Recency decay half-life, defaults to the retriever's
+
+        Returns:
+            RetrievalResult holding the retrieved documents
+        """
+        return self.rank(self.lookup(query, query_embedding, top_k=top_k, score_threshold=score_threshold,
+                                     mode=mode, filters=filters, recency_half_life_hours=recency_half_life_hours))
+
+    def search_batch(self, queries: List[str], query_embeddings, top_k: int = 5, score_threshold: float = 0.0,
+                     mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+                     recency_half_life_hours: Optional[float] = None) -> List[RetrievalResult]:
+        """
+        Search the store for several queries, with one similarity search for all of their embeddings
+
+        Takes the same options as search(), applied to every query. BM25 lookups,
+        re-ranking and recency/diversity re-scoring still run per query.
+
+        Args:
+            queries: The search queries
+            query_embeddings: One embedding per query, as rows of a matrix (unused in lexical mode)
+
+        Returns:
+            One RetrievalResult per query, in order
+        """
+        return [self.rank(candidates) for candidates in self.lookup_batch(
+            queries, query_embeddings, top_k=top_k, score_threshold=score_threshold, mode=mode, filters=filters,
+            recency_half_life_hours=recency_half_life_hours)]
+
+    def lookup(self, query: str, query_embedding, top_k: int = 5, score_threshold: float = 0.0,
+               mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+               recency_half_life_hours: Optional[float] = None) -> SearchCandidates:
+        """
+        The index lookups of search(), returning the candidates for rank()
+
+        Lookups read the indexes while rank() runs the cross-encoder and MMR, so a
+        caller can run the two stages on different executors. Takes the same
+        arguments as search().
+        """
+        # Every lookup of this search reads the same index generation, even if a refresh swaps in a new one
+        index = self.vector_store.snapshot()
+        return self._candidates(index, query, query_embedding, top_k, score_threshold, mode or self.mode, filters,
+                                self._half_life(recency_half_life_hours))
+
+    def lookup_batch(self, queries: List[str], query_embeddings, top_k: int = 5, score_threshold: float = 0.0,
+                     mode: Optional[str] = None, filters: Optional[MetadataFilter] = None,
+                     recency_half_life_hours: Optional[float] = None) -> List[SearchCandidates]:
+        """The index lookups of search_batch(): one similarity search for all queries, candidates per query"""
+        mode = mode or self.mode
+        half_life = self._half_life(recency_half_life_hours)
+        index = self.vector_store.snapshot()
+        vector_results = [None] * len(queries)
+        if mode != "lexical" and queries:
+            depth = self._ranker_depth(top_k, self._depth(top_k, half_life), mode)
+            try:
+                results = index.query(query_embeddings, n_results=depth, filters=filters)
+            except Exception as e:
+                logger.error("Batched vector search for %d queries failed: %s", len(queries), e)
+                return [SearchCandidates(query, None, top_k, half_life, index=index) for query in queries]
+            vector_results = [{key: [results[key][i]] for key in ("ids", "documents", "metadatas", "distances")}
+                              for i in range(len(queries))]
+        return [self._candidates(index, query, None if mode == "lexical" else query_embeddings[i], top_k,
+                                 score_threshold, mode, filters, half_life, vector_results[i])
+                for i, query in enumerate(queries)]
+
+    @property
+    def ranks_with_models(self) -> bool:
+        """Whether rank() runs model work (a cross-encoder or MMR) and belongs on a CPU executor"""
+        return self.reranker is not None or self.mmr_lambda is not None
+
+    def rank(self, candidates: SearchCandidates) -> RetrievalResult:
+        """
+        Re-rank lookup() candidates (cross-encoder, recency, MMR) and keep the final top_k
+
+        Args:
+            candidates: What lookup() returned for the query
+
+        Returns:
+            RetrievalResult holding the retrieved documents
+        """
+        query, top_k = candidates.query, candidates.top_k
+        try:
+            retrieved_docs, score_key = candidates.documents, candidates.score_key
+            if self.reranker is not None and retrieved_docs:
+                retrieved_docs = self.reranker.rerank(query, retrieved_docs)
+                if 'rerank_score' in retrieved_docs[0]:
+                    score_key = 'rerank_score'
+            if candidates.half_life:
+                retrieved_docs = self._apply_recency(retrieved_docs, score_key, candidates.half_life)
+            if self.mmr_lambda is not None:
+                retrieved_docs = self._apply_mmr(candidates.index, query, candidates.query_embedding,
+                                                 retrieved_docs, top_k, self.mmr_lambda)
+            retrieved_docs = retrieved_docs[:top_k]
+
+            logger.debug("Retrieved %d documents (after filtering)", len(retrieved_docs))
+
+            return RetrievalResult(query=query, documents=retrieved_docs, context_builder=self.context_builder)
+
+        except Exception as e:
+            logger.error("Retrieval failed for query %r: %s", query, e)
+            return RetrievalResult(query=query, context_builder=self.context_builder)
+
+    def _half_life(self, recency_half_life_hours: Optional[float]) -> Optional[float]:
+        """The requested half-life, the retriever's default if None (ValueError if not positive)"""
+        if recency_half_life_hours is None:
+            return self.recency_half_life_hours
+        return half_life_hours(recency_half_life_hours)
 
-        # Generate query embedding
-        query_embedding = self.embedding_manager.generate_embeddings([query])[0]
+    def _depth(self, top_k: int, half_life: Optional[float]) -> int:
+        """Candidates to fetch for a final top_k"""
+        # Recency and diversity re-ranking need candidates beyond the final top_k to promote
+        depth = top_k * self.candidate_depth if half_life or self.mmr_lambda is not None else top_k
+        if self.reranker is not None:
+            depth = max(top_k, self.rerank_candidates or top_k * self.candidate_depth)
+        return depth
 
-        # Search in vector store
+    def _ranker_depth(self, top_k: int, depth: int, mode: str) -> int:
+        """Candidates each ranker fetches for `depth` candidates; hybrid fusion draws top_k * candidate_depth"""
+        return max(depth, top_k * self.candidate_depth) if mode == "hybrid" else depth
+
+    def _candidates(self, index: IndexGeneration, query: str, query_embedding, top_k: int, score_threshold: float,
+                    mode: str, filters: Optional[MetadataFilter], half_life: Optional[float],
+                    vector_results: Optional[Dict[str, List[List[Any]]]] = None) -> SearchCandidates:
+        depth = self._depth(top_k, half_life)
+        candidates = SearchCandidates(query, query_embedding, top_k, half_life, index=index)
         try:
-            results = self.vector_store.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k
-            )
-
-            # Process results
-            retrieved_docs = []
-
-            if results['documents'] and results['documents'][0]:
-                documents = results['documents'][0]
-                metadatas = results['metadatas'][0]
-                distances = results['distances'][0]
-                ids = results['ids'][0]
-
-                for i, (doc_id, document, metadata, distance) in enumerate(zip(ids, documents, metadatas, distances)):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    similarity_score = 1 - distance
-
-                    if similarity_score >= score_threshold:
-                        retrieved_docs.append({
-                            'id': doc_id,
-                            'content': document,
-                            'metadata': metadata,
-                            'similarity_score': similarity_score,
-                            'distance': distance,
-                            'rank': i + 1
-                        })
-
-                print(f"Retrieved {len(retrieved_docs)} documents (after filtering)")
+            if mode == "vector":
+                candidates.documents = self._vector_hits(index, query_embedding, depth, score_threshold, filters,
+                                                         vector_results)
+                candidates.score_key = 'similarity_score'
+            elif mode == "lexical":
+                candidates.documents = self._lexical_hits(index, query, depth, filters)
+                candidates.score_key = 'bm25_score'
+            elif mode == "hybrid":
+                candidates.documents = self._hybrid_hits(index, query, query_embedding, depth,
+                                                         self._ranker_depth(top_k, depth, mode), score_threshold,
+                                                         filters, vector_results)
+                candidates.score_key = 'fusion_score'
             else:
-                print("No documents found")
+                raise ValueError(f"Unknown retrieval mode: {mode}")
+        except Exception as e:
+            logger.error("Retrieval failed for query %r: %s", query, e)
+            candidates.documents = []
+        return candidates
 
-            return retrieved_docs
+    def _vector_hits(self, index: IndexGeneration, query_embedding, top_k: int, score_threshold: float,
+                     filters: Optional[MetadataFilter] = None,
+                     results: Optional[Dict[str, List[List[Any]]]] = None) -> List[Dict[str, Any]]:
+        # search_batch passes in this query's row of its batched search
+        if results is None:
+            results = index.query([query_embedding], n_results=top_k, filters=filters)
+        retrieved_docs = []
+        if results['documents'] and results['documents'][0]:
+            documents = results['documents'][0]
+            metadatas = results['metadatas'][0]
+            distances = results['distances'][0]
+            ids = results['ids'][0]
 
-        except Exception as e:
-            print(f"Error during retrieval: {e}")
-            return []
+            for i, (doc_id, document, metadata, distance) in enumerate(zip(ids, documents, metadatas, distances)):
+                # Convert distance to similarity score (backends return cosine distance)
+                similarity_score = 1 - distance
+
+                if similarity_score >= score_threshold:
+                    retrieved_docs.append({
+                        'id': doc_id,
+                        'content': document,
+                        'metadata': metadata,
+                        'similarity_score': similarity_score,
+                        'distance': distance,
+                        'rank': i + 1
+                    })
+        return retrieved_docs
+
+    def _lexical_hits(self, index: IndexGeneration, query: str, top_k: int,
+                      filters: Optional[MetadataFilter] = None) -> List[Dict[str, Any]]:
+        hits = index.lexical_search(query, top_k=top_k, filters=filters)
+        records = self._records(index, [doc_id for doc_id, _ in hits])
+        retrieved_docs = []
+        for doc_id, bm25_score in hits:
+            if doc_id not in records:
+                continue
+            document, metadata = records[doc_id]
+            retrieved_docs.append({
+                'id': doc_id,
+                'content': document,
+                'metadata': metadata,
+                'similarity_score': None,
+                'bm25_score': bm25_score,
+                'rank': len(retrieved_docs) + 1
+            })
+        return retrieved_docs
+
+    def _hybrid_hits(self, index: IndexGeneration, query: str, query_embedding, top_k: int, depth: int,
+                     score_threshold: float, filters: Optional[MetadataFilter] = None,
+                     vector_results: Optional[Dict[str, List[List[Any]]]] = None) -> List[Dict[str, Any]]:
+        """The top_k of fusing `depth` vector and `depth` BM25 candidates"""
+        vector_docs = {doc['id']: doc for doc in self._vector_hits(index, query_embedding, depth, score_threshold,
+                                                                    filters, vector_results)}
+        lexical_scores = dict(index.lexical_search(query, top_k=depth, filters=filters))
+        fused = reciprocal_rank_fusion([list(vector_docs), list(lexical_scores)], k=self.rrf_k)[:top_k]
+
+        # Chunks only BM25 found still need their text and metadata
+        records = self._records(index, [doc_id for doc_id, _ in fused if doc_id not in vector_docs])
+        retrieved_docs = []
+        for doc_id, fused_score in fused:
+            doc = vector_docs.get(doc_id)
+            if doc is None:
+                if doc_id not in records:
+                    continue
+                document, metadata = records[doc_id]
+                doc = {'id': doc_id, 'content': document, 'metadata': metadata,
+                       'similarity_score': None, 'distance': None}
+            doc = {**doc, 'bm25_score': lexical_scores.get(doc_id), 'fusion_score': fused_score,
+                   'rank': len(retrieved_docs) + 1}
+            retrieved_docs.append(doc)
+        return retrieved_docs
+
+    @staticmethod
+    def _apply_recency(docs: List[Dict[str, Any]], score_key: str, half_life_hours: float) -> List[Dict[str, Any]]:
+        """Re-rank by score decayed with the age of each chunk"""
+        now = time.time()
+        if score_key == 'rerank_score':
+            scores = scaled_rerank_scores(docs).tolist()
+        else:
+            scores = [doc.get(score_key) or 0.0 for doc in docs]
+        rescored = []
+        for doc, score in zip(docs, scores):
+            weight = recency_weight(doc['metadata'].get('published_at'), half_life_hours, now)
+            rescored.append({**doc, 'recency_weight': weight, 'recency_score': score * weight})
+        rescored.sort(key=lambda doc: doc['recency_score'], reverse=True)
+        for rank, doc in enumerate(rescored, start=1):
+            doc['rank'] = rank
+        return rescored
+
+    def _apply_mmr(self, index: Optional[IndexGeneration], query: str, query_embedding,
+                   docs: List[Dict[str, Any]], top_k: int, mmr_lambda: float) -> List[Dict[str, Any]]:
+        """Greedy maximal marginal relevance selection of top_k documents"""
+        if len(docs) <= 1:
+            return docs
+        # The candidates' vectors are read from the index they came from; nothing is re-encoded
+        stored = index.get_embeddings([doc['id'] for doc in docs]) if index is not None else {}
+        missing = [doc['content'] for doc in docs if doc['id'] not in stored]
+        encoded = iter(self.embedding_manager.generate_embeddings(missing) if missing else [])
+        vectors = np.array([stored[doc['id']] if doc['id'] in stored else next(encoded) for doc in docs],
+                           dtype=np.float32)
+        if query_embedding is None:
+            query_embedding = self.embedding_manager.generate_embeddings([query], is_query=True)[0]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        relevance = vectors @ query_vector
+        if all('rerank_score' in doc for doc in docs):
+            relevance = scaled_rerank_scores(docs)
+        relevance *= np.array([doc.get('recency_weight', 1.0) for doc in docs], dtype=np.float32)
+        similarity = vectors @ vectors.T
 
+        selected: List[int] = []
+        remaining = list(range(len(docs)))
+        while remaining and len(selected) < top_k:
+            scores = relevance[remaining]
+            if selected:
+                scores = mmr_lambda * scores - (1 - mmr_lambda) * similarity[np.ix_(remaining, selected)].max(axis=1)
+            selected.append(remaining.pop(int(np.argmax(scores))))
+        return [{**docs[i], 'rank': rank} for rank, i in enumerate(selected, start=1)]
 
+    def _records(self, index: IndexGeneration, ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Text and metadata of stored chunks by ID"""
+        if not ids:
+            return {}
+        records = index.get(ids)
+        return {doc_id: (document, metadata)
+                for doc_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])}
@@ -0,0 +1,171 @@
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead
+    orjson = None
+
+try:
+    import ormsgpack as msgpack
+except ImportError:
+    try:
+        import msgpack
+    except ImportError:  # only JSON is offered
+        msgpack = None
+
+#USE
+#encoding = negotiate(request.headers.get("accept"))       # "msgpack" if asked for and installed, else "json"
+#fields = parse_fields("id,rank,metadata.source")          # article fields to keep (no chunk text)
+#body = encode(project(result, fields), encoding)           # bytes, with media_type(encoding)
+#frame = encode_frame({"type": "query_result", "data": result}, encoding, fields)   # str for JSON, bytes for msgpack
+
+logger = logging.getLogger(__name__)
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+MEDIA_TYPES = {JSON: "application/json", MSGPACK: "application/msgpack"}
+_MEDIA_TYPE_ALIASES = {
+    "application/json": JSON, "text/json": JSON,
+    "application/msgpack": MSGPACK, "application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK,
+}
+
+Fields = Optional[Tuple[str, ...]]
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce; msgpack needs ormsgpack or msgpack installed"""
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+
+def resolve_encoding(name: Optional[str]) -> str:
+    """Encoding to use for a requested name, falling back to JSON when it is unknown or not installed"""
+    name = _MEDIA_TYPE_ALIASES.get((name or JSON).strip().lower(), (name or JSON).strip().lower())
+    return name if name in available_encodings() else JSON
+
+
+def media_type(encoding: str) -> str:
+    return MEDIA_TYPES[encoding]
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response encoding from an HTTP Accept header
+
+    The available encoding with the highest q-value wins (the first listed on a
+    tie); anything else, including a missing header or */*, gets JSON.
+    """
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        encoding = _MEDIA_TYPE_ALIASES.get(media.lower())
+        if encoding is None or encoding not in available_encodings():
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encode(obj: Any, encoding: str = JSON) -> bytes:
+    """Serialize with the fastest installed implementation of the encoding"""
+    if encoding == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack encoding needs the ormsgpack or msgpack package")
+        if hasattr(msgpack, "OPT_SERIALIZE_NUMPY"):  # ormsgpack
+            return msgpack.packb(obj, option=msgpack.OPT_SERIALIZE_NUMPY | msgpack.OPT_NON_STR_KEYS)
+        return msgpack.packb(obj)
+    if orjson is not None:
+        # Like json.dumps: numpy scores and non-string keys are accepted
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode("utf-8")
+
+
+def decode(data: Union[str, bytes], encoding: str = JSON) -> Any:
+    if encoding == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack encoding needs the ormsgpack or msgpack package")
+        return msgpack.unpackb(data)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Fields:
+    """Normalise an article field selection ("id,score" or ["id", "metadata.source"]) to a sorted tuple
+
+    Returns None (all fields) when nothing is selected.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [fields]
+    names = {name.strip() for value in fields for name in value.split(",") if name.strip()}
+    return tuple(sorted(names)) or None
+
+
+def _spec(fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Dotted field names as a nested selection: {"id": None, "metadata": {"source": None}}"""
+    spec: Dict[str, Any] = {}
+    for name in fields:
+        node = spec
+        *parents, leaf = name.split(".")
+        for parent in parents:
+            child = node.get(parent, {})
+            if child is None:  # the whole parent is already selected
+                break
+            node = node.setdefault(parent, child)
+        else:
+            node[leaf] = None
+    return spec
+
+
+def _select(obj: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: obj[key] if sub is None else _select(obj[key], sub)
+            for key, sub in spec.items() if key in obj and (sub is None or isinstance(obj[key], dict))}
+
+
+def project(data: Any, fields: Fields) -> Any:
+    """Keep only the selected fields of every article in a result
+
+    `fields` are article keys, dotted for nested metadata ("metadata.source");
+    the rest of the result (summary, query, timestamps...) is left as is.
+    Results without an `articles` list are returned unchanged.
+    """
+    if not fields or not isinstance(data, dict) or not isinstance(data.get("articles"), list):
+        return data
+    spec = _spec(fields)
+    return {**data, "articles": [_select(article, spec) for article in data["articles"]]}
+
+
+def encode_frame(message: Dict[str, Any], encoding: str = JSON, fields: Fields = None) -> Union[str, bytes]:
+    """Serialize a {"type", "data"} WebSocket message, projecting its articles
+
+    JSON becomes a text frame (str), msgpack a binary frame (bytes).
+    """
+    if fields and "data" in message:
+        message = {**message, "data": project(message["data"], fields)}
+    payload = encode(message, encoding)
+    return payload.decode("utf-8") if encoding == JSON else payload
+
+
+class FrameEncoder:
+    """Serializes a message at most once per (encoding, fields) among many recipients"""
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._frames: Dict[Tuple[str, Fields], Union[str, bytes]] = {}
+
+    def __call__(self, encoding: str = JSON, fields: Fields = None) -> Union[str, bytes]:
+        key = (encoding, fields)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._frames[key] = encode_frame(self.message, encoding, fields)
+        return frame
+
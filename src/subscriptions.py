@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import numpy as np
+
+from .filters import MetadataFilter
+from .lexical_index import tokenize
+from .metrics import PUSHED_MESSAGES, QUEUE_DEPTH, REGISTRY, stage_timer
+from .serialization import JSON, Fields, FrameEncoder, encode_frame
+
+#USE
+#hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution)
+#pipeline.add_delta_listener(hub.publish)
+#client = hub.connect(websocket.send_text)
+#await hub.subscribe(client, query="central bank interest rates", top_k=3)   # or topic="election"
+#hub.disconnect(client)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CorpusDelta:
+    """Chunks a refresh added to the index, as published to subscribers
+
+    `embeddings` holds one row per chunk, in the order of `ids`. A `resync`
+    delta carries no chunks: more changed than is worth listing, so
+    subscribers are only told to query again.
+    """
+    generation: int
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    embeddings: np.ndarray
+    deleted: int = 0
+    resync: bool = False
+
+
+class ClientQueue:
+    """Bounded queue of serialized messages for one connection, drained by its own task
+
+    A slow client only backs up its own queue. Messages offered with a key
+    replace a pending message with the same key (the client only needs the
+    latest one); once `max_pending` messages are waiting, the oldest is dropped
+    and the client is told how many it missed before its next message.
+    """
+    def __init__(self, send: Callable[[Union[str, bytes]], Awaitable[Any]], max_pending: int = 64,
+                 encoding: str = JSON, fields: Fields = None):
+        """
+        Args:
+            send: Coroutine function sending one frame to the client (str: text, bytes: binary)
+            max_pending: Messages held for the client before the oldest are dropped
+            encoding: Encoding the client receives, see serialization
+            fields: Article fields the client receives, see serialization.project
+        """
+        self.send = send
+        self.max_pending = max_pending
+        self.encoding = encoding
+        self.fields = fields
+        self.subscriptions: Set[str] = set()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending: "OrderedDict[Any, Union[str, bytes]]" = OrderedDict()
+        self._unique = itertools.count()
+        self._missed = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._drain())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._pending.clear()
+
+    def offer(self, payload: Union[str, bytes], key: Optional[str] = None) -> str:
+        """Queue a serialized message without waiting; returns "queued", "coalesced" or "dropped_oldest" """
+        if key is not None and key in self._pending:
+            self._pending[key] = payload
+            self.coalesced += 1
+            return "coalesced"
+        outcome = "queued"
+        if len(self._pending) >= self.max_pending:
+            self._pending.popitem(last=False)
+            self._missed += 1
+            self.dropped += 1
+            outcome = "dropped_oldest"
+        self._pending[key if key is not None else next(self._unique)] = payload
+        self._wakeup.set()
+        return outcome
+
+    async def _drain(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._pending:
+                    if self._missed:
+                        missed, self._missed = self._missed, 0
+                        await self.send(encode_frame({"type": "dropped", "data": {"messages": missed}}, self.encoding))
+                    _, payload = self._pending.popitem(last=False)
+                    await self.send(payload)
+                    self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The connection went away; its handler disconnects the client
+            logger.debug("Sending to a subscriber failed: %s", e)
+
+
+@dataclass
+class Subscription:
+    """A topic or saved query, shared by every client that subscribed to the same thing"""
+    id: str
+    topic: Optional[str] = None
+    query: Optional[str] = None
+    embedding: Optional[np.ndarray] = None
+    top_k: int = 5
+    min_score: float = 0.5
+    filters: Optional[MetadataFilter] = None
+    clients: Set[int] = field(default_factory=set)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"subscription": self.id, "topic": self.topic, "query": self.query}
+
+
+class SubscriptionHub:
+    """Pushes what each refresh added to the clients subscribed to it
+
+    Clients subscribe to a topic (chunks whose source is the topic or whose text
+    contains all of its words) or to a saved query (chunks whose embedding
+    similarity to the query is at least `min_score`, best `top_k`). On every
+    published CorpusDelta only the new chunks are matched: one matrix product
+    scores them against all saved queries at once. Each resulting message is
+    serialized once and handed to the ClientQueue of every subscriber, so a
+    slow client never delays the others. Clients choose their encoding and
+    article fields; a message is serialized once per combination in use.
+    """
+    def __init__(self, embed: Optional[Callable[[str], Awaitable[np.ndarray]]] = None, execution=None,
+                 max_pending: int = 64):
+        """
+        Args:
+            embed: Coroutine function embedding a saved query (needed for query subscriptions)
+            execution: ExecutionLayer matching runs on (inline on the event loop if None)
+            max_pending: Per-client queue bound, see ClientQueue
+        """
+        self.embed = embed
+        self.execution = execution
+        self.max_pending = max_pending
+        self.clients: Dict[int, ClientQueue] = {}
+        self.subscriptions: Dict[str, Subscription] = {}
+        self._client_ids = itertools.count(1)
+        REGISTRY.register_collector(self._collect_metrics)
+
+    # Connections
+    def connect(self, send: Callable[[Union[str, bytes]], Awaitable[Any]], encoding: str = JSON,
+                fields: Fields = None) -> int:
+        """Register a connection; returns its client ID"""
+        client_id = next(self._client_ids)
+        queue = ClientQueue(send, max_pending=self.max_pending, encoding=encoding, fields=fields)
+        queue.start()
+        self.clients[client_id] = queue
+        return client_id
+
+    def configure(self, client_id: int, encoding: Optional[str] = None, fields: Fields = None):
+        """Change the encoding and article fields of the frames a client receives"""
+        queue = self.clients.get(client_id)
+        if queue is None:
+            raise ValueError(f"Unknown client {client_id}")
+        if encoding is not None:
+            queue.encoding = encoding
+        queue.fields = fields
+
+    def disconnect(self, client_id: int):
+        queue = self.clients.pop(client_id, None)
+        if queue is None:
+            return
+        queue.close()
+        for subscription_id in queue.subscriptions:
+            self._release(subscription_id, client_id)
+
+    # Subscriptions
+    async def subscribe(self, client_id: int, topic: Optional[str] = None, query: Optional[str] = None,
+                        top_k: int = 5, min_score: float = 0.5,
+                        filters: Optional[MetadataFilter] = None) -> Subscription:
+        """Subscribe a client to a topic or a saved query
+
+        Clients subscribing to the same topic or query with the same options
+        share one Subscription (and its ID).
+
+        Raises:
+            ValueError: If neither or both of topic and query are given
+        """
+        if (topic is None) == (query is None):
+            raise ValueError("Subscribe to either a topic or a query")
+        if query is not None and self.embed is None:
+            raise ValueError("Query subscriptions need an embedding function")
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        key = json.dumps([topic.strip().lower() if topic else None, query, top_k, min_score,
+                          repr(filters.cache_key()) if filters is not None else None])
+        subscription_id = "sub_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        embedding = None
+        if query is not None and subscription_id not in self.subscriptions:
+            embedding = np.asarray(await self.embed(query), dtype=np.float32)
+            embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        queue = self.clients.get(client_id)
+        if queue is None:
+            raise ValueError(f"Unknown client {client_id}")
+        subscription = self.subscriptions.get(subscription_id)
+        if subscription is None:
+            subscription = self.subscriptions[subscription_id] = Subscription(
+                subscription_id, topic=topic.strip() if topic else None, query=query, embedding=embedding,
+                top_k=top_k, min_score=min_score, filters=filters)
+        subscription.clients.add(client_id)
+        queue.subscriptions.add(subscription_id)
+        return subscription
+
+    def unsubscribe(self, client_id: int, subscription_id: str) -> bool:
+        queue = self.clients.get(client_id)
+        if queue is None or subscription_id not in queue.subscriptions:
+            return False
+        queue.subscriptions.discard(subscription_id)
+        self._release(subscription_id, client_id)
+        return True
+
+    async def handle(self, client_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle a WebSocket `subscribe` or `unsubscribe` message; returns the reply to send
+
+        subscribe takes `topic` or `query`, and optionally `top_k`, `min_score`
+        and the filter fields of a query (`sources`, `since`, `until`, `last_hours`).
+        """
+        if data["type"] == "unsubscribe":
+            removed = self.unsubscribe(client_id, data["subscription"])
+            return {"type": "unsubscribed", "data": {"subscription": data["subscription"], "removed": removed}}
+        filters = MetadataFilter.from_params(sources=data.get("sources"), since=data.get("since"),
+                                             until=data.get("until"), last_hours=data.get("last_hours"))
+        subscription = await self.subscribe(client_id, topic=data.get("topic"), query=data.get("query"),
+                                            top_k=int(data.get("top_k", 5)),
+                                            min_score=float(data.get("min_score", 0.5)), filters=filters)
+        return {"type": "subscribed", "data": subscription.describe()}
+
+    def _release(self, subscription_id: str, client_id: int):
+        subscription = self.subscriptions.get(subscription_id)
+        if subscription is None:
+            return
+        subscription.clients.discard(client_id)
+        if not subscription.clients:
+            del self.subscriptions[subscription_id]
+
+    # Fan-out
+    def broadcast(self, message: Dict[str, Any], key: Optional[str] = None):
+        """Serialize a message once (per encoding and fields in use) and queue it for every client"""
+        self._fan_out(FrameEncoder(message), self.clients.keys(), key)
+
+    def _fan_out(self, frames: FrameEncoder, client_ids, key: Optional[str] = None):
+        for client_id in list(client_ids):
+            queue = self.clients.get(client_id)
+            if queue is not None:
+                PUSHED_MESSAGES.inc(outcome=queue.offer(frames(queue.encoding, queue.fields), key))
+
+    async def publish(self, delta: CorpusDelta):
+        """Push a refresh's new chunks to the matching subscriptions, and a corpus_update to everyone"""
+        if not self.clients:
+            return
+        subscriptions = list(self.subscriptions.values())
+        if delta.ids and subscriptions:
+            if self.execution is not None:
+                matches = await self.execution.run_cpu("fanout", self.match, delta, subscriptions)
+            else:
+                matches = self.match(delta, subscriptions)
+            for subscription, articles in matches:
+                message = {"type": "subscription_update",
+                           "data": {**subscription.describe(), "generation": delta.generation, "articles": articles}}
+                self._fan_out(FrameEncoder(message), subscription.clients)
+        # Latest-wins: a client that is behind only needs the newest corpus state
+        self.broadcast({"type": "corpus_update", "data": {
+            "generation": delta.generation, "added": None if delta.resync else len(delta.ids),
+            "deleted": delta.deleted, "resync": delta.resync
+        }}, key="corpus_update")
+
+    def match(self, delta: CorpusDelta, subscriptions: List[Subscription]) -> List[tuple]:
+        """(subscription, articles) for every subscription some of the new chunks match"""
+        with stage_timer("fanout_match", batch_size=len(delta.ids)):
+            matches = []
+            queries = [s for s in subscriptions if s.embedding is not None]
+            scores = None
+            if queries:
+                vectors = np.asarray(delta.embeddings, dtype=np.float32)
+                vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                # One product scores every new chunk against every saved query
+                scores = vectors @ np.stack([s.embedding for s in queries]).T
+            for column, subscription in enumerate(queries):
+                column_scores = scores[:, column]
+                candidates = np.flatnonzero(column_scores >= subscription.min_score)
+                candidates = candidates[np.argsort(-column_scores[candidates])]
+                rows = [int(row) for row in candidates if self._allowed(subscription, delta.metadatas[row])]
+                if rows:
+                    matches.append((subscription, self._articles(delta, rows[:subscription.top_k],
+                                                                  column_scores)))
+
+            topics = [s for s in subscriptions if s.topic is not None]
+            if topics:
+                tokens = [set(tokenize(document)) for document in delta.documents]
+                for subscription in topics:
+                    topic = subscription.topic.lower()
+                    words = set(tokenize(topic))
+                    rows = [row for row, metadata in enumerate(delta.metadatas)
+                            if (str(metadata.get("source", "")).lower() == topic
+                                or (words and words <= tokens[row]))
+                            and self._allowed(subscription, metadata)]
+                    if rows:
+                        matches.append((subscription, self._articles(delta, rows[:subscription.top_k])))
+            return matches
+
+    @staticmethod
+    def _allowed(subscription: Subscription, metadata: Dict[str, Any]) -> bool:
+        return subscription.filters is None or subscription.filters.matches(metadata)
+
+    @staticmethod
+    def _articles(delta: CorpusDelta, rows: List[int], scores: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        return [{"id": delta.ids[row], "content": delta.documents[row], "metadata": delta.metadatas[row],
+                 "similarity_score": float(scores[row]) if scores is not None else None, "rank": rank}
+                for rank, row in enumerate(rows, start=1)]
+
+    def stats(self) -> Dict[str, int]:
+        queues = list(self.clients.values())
+        return {
+            "clients": len(queues),
+            "subscriptions": len(self.subscriptions),
+            "pending": sum(len(queue) for queue in queues),
+            "sent": sum(queue.sent for queue in queues),
+            "dropped": sum(queue.dropped for queue in queues),
+            "coalesced": sum(queue.coalesced for queue in queues),
+        }
+
+    def _collect_metrics(self):
+        QUEUE_DEPTH.set(sum(len(queue) for queue in self.clients.values()), queue="subscriber_send")
@@ -1,20 +1,49 @@
+import json
 import logging
+import os
 import sys
 from pathlib import Path
 
-def setup_logging(log_file: str = "newsrag.log"):
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields passed via `extra=` (stage, seconds, ...) included"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(log_file: str = "newsrag.log", level: str = None, json_format: bool = None):
+    """Configure the root logger
+
+    Args:
+        log_file: File name inside logs/
+        level: Log level name, defaults to $LOG_LEVEL or INFO (DEBUG adds per-stage timings)
+        json_format: Emit JSON lines, defaults to $LOG_FORMAT == "json"
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    formatter = (JsonFormatter() if json_format
+                 else logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
+
+    handlers = [logging.FileHandler(log_dir / log_file), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
     # Configure root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[
-            logging.FileHandler(log_dir / log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
\ No newline at end of file
+    logging.basicConfig(level=level, handlers=handlers)
@@ -0,0 +1,499 @@
+import json
+import math
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .filters import MetadataFilter
+
+#USE
+#backend = ChromaBackend("data/vector_store", "pdf_documents")
+#backend = NumpyBackend("data/vector_store/numpy/pdf_documents", mode="auto")
+#results = backend.query(query_embeddings, n_results=5, filters=MetadataFilter.from_params(sources=["BBC"]))
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """L2-normalise embeddings as float32 rows"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorBackend(ABC):
+    """Storage and similarity search for one collection of chunk embeddings
+
+    query() returns Chroma-shaped results (one inner list per query embedding)
+    with cosine distances, so callers convert to similarity as 1 - distance
+    whatever the backend. Metadata filters are applied by the backend before the
+    top-k is taken, so a selective filter still returns n_results matches.
+    """
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict[str, Any]], documents: List[str]):
+        """Insert or overwrite records by ID"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Delete records by ID (unknown IDs are ignored)"""
+
+    @abstractmethod
+    def query(self, query_embeddings: np.ndarray, n_results: int,
+              filters: Optional[MetadataFilter] = None) -> Dict[str, List[List[Any]]]:
+        """Nearest neighbours of each query embedding among the records passing filters:
+        ids, documents, metadatas, distances"""
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Records by ID (all records if ids is None): ids, documents, metadatas"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of records"""
+
+    def ids(self) -> List[str]:
+        """IDs of all records, without loading their text"""
+        return self.get()["ids"]
+
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings by ID (unknown IDs are left out)"""
+
+    def flush(self):
+        """Persist pending writes (no-op for backends that write through)"""
+
+    def maintain(self) -> Dict[str, List[str]]:
+        """Run housekeeping (retention, compaction) and return the IDs it removed
+
+        Returns:
+            {"expired": [...], "deduplicated": [...]}; backends without
+            housekeeping remove nothing
+        """
+        return {"expired": [], "deduplicated": []}
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB persistent collection"""
+
+    def __init__(self, persist_directory: str, collection_name: str):
+        os.makedirs(persist_directory, exist_ok=True)
+        import chromadb
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        # New collections use cosine space; existing ones keep what they were created with
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"description": "PDF Document Collection", "hnsw:space": "cosine"}
+        )
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            metadatas=metadatas,
+            documents=documents
+        )
+
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+
+    def query(self, query_embeddings, n_results, filters=None):
+        results = self.collection.query(
+            query_embeddings=np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)).tolist(),
+            n_results=n_results,
+            where=filters.to_chroma_where() if filters is not None else None
+        )
+        if self.space == "l2" and results.get("distances"):
+            # Squared L2 between unit vectors is 2 * cosine distance
+            results["distances"] = [[d / 2 for d in row] for row in results["distances"]]
+        return results
+
+    def get(self, ids=None):
+        return self.collection.get(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+    def ids(self):
+        return self.collection.get(include=[])["ids"]
+
+    def get_embeddings(self, ids):
+        if not ids:
+            return {}
+        records = self.collection.get(ids=list(ids), include=["embeddings"])
+        return {doc_id: np.asarray(vector, dtype=np.float32)
+                for doc_id, vector in zip(records["ids"], records["embeddings"])}
+
+
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class NumpyBackend(VectorBackend):
+    """In-process index over an L2-normalised float32 matrix
+
+    Exact search is one BLAS matrix product plus an argpartition top-k. For large
+    collections an IVF index (k-means centroids over the rows) restricts each query
+    to the rows of its `n_probe` closest clusters. Source and published time are
+    also kept as columns, so filters become a boolean row mask applied before
+    scoring.
+
+    On disk the collection is `vectors.npy` (opened with mmap, so processes reading
+    the same files share pages), `records.json` and optionally `ivf.npz`. Writes
+    are buffered in memory and written by flush(), which replaces the directory
+    as a whole so a reader never sees a half-written set of files (and does
+    nothing when there was no write since the last flush). A read-only
+    backend (a serving worker that is not the refresh leader) never repairs or
+    writes the directory.
+    """
+
+    def __init__(self, directory: str, mode: str = "auto", n_lists: Optional[int] = None,
+                 n_probe: int = 8, ivf_min_size: int = 20000, read_only: bool = False):
+        """
+        Args:
+            directory: Directory holding this collection's files
+            mode: "exact", "ivf", or "auto" (IVF once the collection reaches ivf_min_size)
+            n_lists: Number of IVF clusters (defaults to sqrt of the collection size)
+            n_probe: Clusters searched per query in IVF mode
+            ivf_min_size: Collection size from which "auto" switches to IVF
+            read_only: Open the files as another process's writer left them, without crash recovery
+        """
+        if mode not in ("exact", "ivf", "auto"):
+            raise ValueError(f"Unknown NumpyBackend mode: {mode}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.ivf_min_size = ivf_min_size
+        self.read_only = read_only
+        # Refreshes write from worker threads while queries read
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._index: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        # Filter columns: published_at (NaN if unknown) and the source as a code into _sources
+        self._published = np.zeros(0, dtype=np.float64)
+        self._source_codes = np.zeros(0, dtype=np.int32)
+        self._sources: Dict[str, int] = {}
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._ivf_built_size = 0
+        # Set by every write; flush() leaves the files alone while it is False
+        self.dirty = False
+        self._load()
+
+    # Persistence
+    def _load(self):
+        old = self.directory.with_name(self.directory.name + ".old")
+        if not self.read_only and not self.directory.exists() and old.exists():
+            # A flush was interrupted between its two renames
+            old.rename(self.directory)
+        records_path = self.directory / "records.json"
+        if not records_path.exists():
+            return
+        records = json.loads(records_path.read_text(encoding="utf-8"))
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._index = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._size = len(self._ids)
+        self._vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        self._alive = np.ones(self._size, dtype=bool)
+        self._published = np.full(self._size, np.nan)
+        self._source_codes = np.full(self._size, -1, dtype=np.int32)
+        for row, metadata in enumerate(self._metadatas):
+            self._set_columns(row, metadata)
+        ivf_path = self.directory / "ivf.npz"
+        if ivf_path.exists():
+            ivf = np.load(ivf_path)
+            self._centroids = ivf["centroids"]
+            self._assign = ivf["assign"]
+            self._ivf_built_size = int(ivf["built_size"])
+
+    @_locked
+    def flush(self):
+        """Compact deleted rows and atomically replace the on-disk files, if anything was written"""
+        if not self.dirty:
+            return
+        self._compact()
+        self._maybe_build_ivf()
+        tmp = self.directory.with_name(self.directory.name + ".tmp")
+        old = self.directory.with_name(self.directory.name + ".old")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "vectors.npy", np.ascontiguousarray(self._vectors[:self._size]))
+        if self._centroids is not None:
+            np.savez(tmp / "ivf.npz", centroids=self._centroids, assign=self._assign[:self._size],
+                     built_size=self._ivf_built_size)
+        (tmp / "records.json").write_text(json.dumps({
+            "ids": self._ids, "documents": self._documents, "metadatas": self._metadatas
+        }), encoding="utf-8")
+        shutil.rmtree(old, ignore_errors=True)
+        if self.directory.exists():
+            self.directory.rename(old)
+        tmp.rename(self.directory)
+        shutil.rmtree(old, ignore_errors=True)
+        # Serve from the page cache like the other processes reading these files; the next write copies
+        self._vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        self.dirty = False
+
+    def _compact(self):
+        if self._size == 0 or self._alive[:self._size].all():
+            return
+        keep = np.flatnonzero(self._alive[:self._size])
+        self._vectors = np.ascontiguousarray(self._vectors[keep])
+        self._assign = self._assign[keep] if self._centroids is not None else np.zeros(0, dtype=np.int32)
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        self._published = self._published[keep]
+        self._source_codes = self._source_codes[keep]
+        self._index = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._size = len(keep)
+        self._alive = np.ones(self._size, dtype=bool)
+
+    # Writes
+    def _reserve(self, dim: int, extra: int):
+        """Make room for `extra` more rows in writable (non-mmapped) arrays"""
+        needed = self._size + extra
+        if self._size and self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the index ({self._vectors.shape[1]})")
+        capacity = self._vectors.shape[0] if self._vectors.size else 0
+        writable = isinstance(self._vectors, np.ndarray) and not isinstance(self._vectors, np.memmap)
+        if writable and capacity >= needed and self._vectors.shape[1] == dim:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        assign = np.zeros(capacity, dtype=np.int32)
+        if self._centroids is not None:
+            assign[:self._size] = self._assign[:self._size]
+        published = np.full(capacity, np.nan)
+        published[:self._size] = self._published[:self._size]
+        source_codes = np.full(capacity, -1, dtype=np.int32)
+        source_codes[:self._size] = self._source_codes[:self._size]
+        self._vectors, self._alive, self._assign = vectors, alive, assign
+        self._published, self._source_codes = published, source_codes
+
+    def _set_columns(self, row: int, metadata: Optional[Dict[str, Any]]):
+        metadata = metadata or {}
+        published = metadata.get("published_at")
+        self._published[row] = published if isinstance(published, (int, float)) else np.nan
+        source = metadata.get("source")
+        if source is None:
+            self._source_codes[row] = -1
+        else:
+            self._source_codes[row] = self._sources.setdefault(str(source), len(self._sources))
+
+    @_locked
+    def upsert(self, ids, embeddings, metadatas, documents):
+        vectors = normalize_rows(embeddings)
+        new = sum(1 for doc_id in ids if doc_id not in self._index)
+        self._reserve(vectors.shape[1], new)
+        for doc_id, vector, metadata, document in zip(ids, vectors, metadatas, documents):
+            row = self._index.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._index[doc_id] = row
+                self._ids.append(doc_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata)
+            else:
+                self._documents[row] = document
+                self._metadatas[row] = metadata
+            self._vectors[row] = vector
+            self._alive[row] = True
+            self._set_columns(row, metadata)
+            if self._centroids is not None:
+                self._assign[row] = int(np.argmax(self._centroids @ vector))
+        self.dirty = self.dirty or len(ids) > 0
+
+    @_locked
+    def delete(self, ids):
+        ids = [doc_id for doc_id in ids if doc_id in self._index]
+        if not ids:
+            return
+        self._reserve(self._vectors.shape[1], 0)
+        for doc_id in ids:
+            self._alive[self._index.pop(doc_id)] = False
+        self.dirty = True
+
+    # Reads
+    def _maybe_build_ivf(self):
+        alive = int(self._alive[:self._size].sum())
+        wanted = self.mode == "ivf" or (self.mode == "auto" and alive >= self.ivf_min_size)
+        if not wanted or alive == 0:
+            if not wanted:
+                self._centroids = None
+            return
+        stale = self._centroids is None or not (0.5 * self._ivf_built_size <= alive <= 2 * self._ivf_built_size)
+        if stale:
+            self.build_ivf()
+
+    @_locked
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Cluster the rows with spherical k-means and assign every row to a list"""
+        rows = np.flatnonzero(self._alive[:self._size])
+        vectors = self._vectors[rows]
+        n_lists = max(1, min(len(rows), n_lists or self.n_lists or int(math.sqrt(len(rows)))))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(rows), size=min(len(rows), 256 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(n_lists):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+                else:
+                    centroids[cluster] = sample[rng.integers(len(sample))]
+            centroids = normalize_rows(centroids)
+        self._reserve(self._vectors.shape[1], 0)
+        self._centroids = centroids
+        for start in range(0, self._size, 65536):
+            block = self._vectors[start:start + 65536]
+            self._assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self._ivf_built_size = len(rows)
+        self.dirty = True
+
+    def _row_mask(self, filters: Optional[MetadataFilter]) -> np.ndarray:
+        """Rows that are alive and pass the filters"""
+        mask = self._alive[:self._size].copy()
+        if filters is None:
+            return mask
+        if filters.sources is not None:
+            codes = [self._sources[source] for source in filters.sources if source in self._sources]
+            mask &= np.isin(self._source_codes[:self._size], codes)
+        since, until = filters.window()
+        published = self._published[:self._size]
+        # NaN (unknown time) compares False, so undated rows drop out of time windows
+        if since is not None:
+            mask &= published >= since
+        if until is not None:
+            mask &= published <= until
+        return mask
+
+    def _candidate_rows(self, query: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        n_probe = min(self.n_probe, len(self._centroids))
+        probes = np.argpartition(-(self._centroids @ query), n_probe - 1)[:n_probe]
+        return np.flatnonzero(np.isin(self._assign[:self._size], probes) & mask)
+
+    @_locked
+    def query(self, query_embeddings, n_results, filters=None):
+        queries = normalize_rows(query_embeddings)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if self._size == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        mask = self._row_mask(filters)
+        exact_scores = None
+        if self._centroids is None:
+            # One matrix product scores every candidate row against every query;
+            # with a filter only the matching rows are multiplied at all
+            exact_rows = np.flatnonzero(mask) if filters is not None else None
+            if exact_rows is None:
+                exact_scores = self._vectors[:self._size] @ queries.T
+                exact_scores[~mask] = -np.inf
+                n_candidates = int(mask.sum())
+            else:
+                exact_scores = self._vectors[exact_rows] @ queries.T
+                n_candidates = len(exact_rows)
+
+        for i, query in enumerate(queries):
+            if exact_scores is not None:
+                rows = exact_rows
+                scores = exact_scores[:, i]
+                available = n_candidates
+            else:
+                rows = self._candidate_rows(query, mask)
+                scores = self._vectors[rows] @ query
+                available = len(rows)
+            k = min(n_results, available)
+            if k <= 0:
+                top = np.zeros(0, dtype=np.int64)
+            else:
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+            positions = top if rows is None else rows[top]
+            results["ids"].append([self._ids[p] for p in positions])
+            results["documents"].append([self._documents[p] for p in positions])
+            results["metadatas"].append([self._metadatas[p] for p in positions])
+            results["distances"].append([float(1 - scores[t]) for t in top])
+        return results
+
+    @_locked
+    def get(self, ids=None):
+        if ids is None:
+            rows = np.flatnonzero(self._alive[:self._size])
+        else:
+            rows = [self._index[doc_id] for doc_id in ids if doc_id in self._index]
+        return {
+            "ids": [self._ids[r] for r in rows],
+            "documents": [self._documents[r] for r in rows],
+            "metadatas": [self._metadatas[r] for r in rows],
+        }
+
+    @_locked
+    def count(self):
+        return len(self._index)
+
+    @_locked
+    def ids(self):
+        return list(self._index)
+
+    @_locked
+    def get_embeddings(self, ids):
+        return {doc_id: np.array(self._vectors[self._index[doc_id]], dtype=np.float32)
+                for doc_id in ids if doc_id in self._index}
+
+    @_locked
+    def export(self):
+        """All live records as (ids, vectors, metadatas, documents)"""
+        rows = np.flatnonzero(self._alive[:self._size])
+        return ([self._ids[r] for r in rows], np.array(self._vectors[rows], dtype=np.float32),
+                [self._metadatas[r] for r in rows], [self._documents[r] for r in rows])
+
+    @_locked
+    def near_duplicates(self, threshold: float = 0.97, block_size: int = 1024,
+                        same_source: bool = False) -> List[str]:
+        """IDs of rows whose cosine similarity to an earlier kept row is at least threshold
+
+        The earliest copy of each group is kept. Similarities are computed one
+        block of rows at a time, so memory stays at block_size x rows. With
+        same_source, only a copy from the same source counts, so every source
+        keeps its own copy of a story.
+        """
+        rows = np.flatnonzero(self._alive[:self._size])
+        vectors = self._vectors[rows]
+        sources = self._source_codes[rows]
+        kept = np.ones(len(rows), dtype=bool)
+        for start in range(0, len(rows), block_size):
+            block = vectors[start:start + block_size] @ vectors[:start + block_size].T
+            for offset in range(block.shape[0]):
+                i = start + offset
+                copies = (block[offset, :i] >= threshold) & kept[:i]
+                if same_source:
+                    copies &= sources[:i] == sources[i]
+                if np.any(copies):
+                    kept[i] = False
+        return [self._ids[r] for r in rows[~kept]]
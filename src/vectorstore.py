@@ -1,76 +1,473 @@
 import numpy as np
-import chromadb 
-import uuid
+import hashlib
+import logging
 import os
-from typing import List
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Iterable, Optional, Tuple
 from langchain_core.documents import Document
+from .filters import MetadataFilter, to_timestamp
+from .generations import GenerationLayout, IndexGeneration, link_tree
+from .lazy import Lazy
+from .lexical_index import BM25Index
+from .metrics import stage_timer
+from .partitions import PartitionedBackend
+from .vector_backends import ChromaBackend, NumpyBackend, VectorBackend
+
+#USE
+#vector_store = VectorStore("pdf_documents", "data/vector_store")                   # in-process NumPy index
+#vector_store = VectorStore("pdf_documents", "data/vector_store", backend="chroma")  # ChromaDB, written in place
+#vector_store = VectorStore("pdf_documents", "data/vector_store", backend="partitioned", retention_days=30)
+#vector_store.begin_generation(); vector_store.add_documents(docs, embeddings); vector_store.commit_generation()
+#vector_store.rollback()   # back to the previous committed generation
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_id(document: Document) -> str:
+    """Deterministic, content-addressed ID for a chunk
+
+    The hash covers the chunk text and its source, so re-ingesting the same chunk
+    maps to the same ID while identical text from two different files stays separate.
+    """
+    source = str(document.metadata.get("source", ""))
+    digest = hashlib.sha256(f"{source}\x00{document.page_content}".encode("utf-8")).hexdigest()
+    return f"chunk_{digest[:32]}"
+
 
 # Vector Store
 class VectorStore:
-    """Manages documents embedding in a chromaDB vector store """
+    """Manages documents embedding in a vector store (in-process NumPy index or ChromaDB)
+
+    The backend and the BM25 index are opened on first use (thread-safe), so
+    constructing a store is instant; warm_up() opens them ahead of time.
+
+    The NumPy backends are versioned in generations (see generations.py): a
+    refresh calls begin_generation(), writes into a copy of the index while
+    queries keep reading the current one, and commit_generation() swaps the new
+    generation in atomically. Earlier generations are kept for rollback().
+    Writes made outside begin/commit go straight to the current generation.
+    Chroma is not versioned: its writes land in the live collection, so a
+    refresh on it is not atomic and a full rebuild (fresh generation) is refused.
+    """
+    BACKENDS = ("chroma", "numpy", "partitioned")
 
-    def __init__(self, collection_name: str = "pdf_documents", persist_directory: str = "data/vector_store"):
+    def __init__(self, collection_name: str = "pdf_documents", persist_directory: str = "data/vector_store",
+                 backend: str = "numpy", lazy: bool = True, read_only: bool = False, keep_generations: int = 3,
+                 **backend_options):
+        """
+        Args:
+            collection_name: Name of the collection
+            persist_directory: Directory the store is persisted in
+            backend: "numpy", "partitioned" (per-day NumPy partitions) or "chroma" (not versioned)
+            lazy: Defer opening the backend until it is first used
+            read_only: Open the NumPy backends as a reader of files another process writes
+            keep_generations: Committed generations kept on disk for rollback (NumPy backends)
+            **backend_options: Passed to the backend (e.g. mode/n_probe for NumpyBackend,
+                retention_days/partition_hours for PartitionedBackend)
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        if keep_generations < 1:
+            raise ValueError("keep_generations must be at least 1")
         self.collection_name = collection_name
         self.persist_directory = persist_directory
-        self.client = None
-        self.collection = None
-        self._initialize_store()
+        self.backend_name = backend
+        self.backend_options = backend_options
+        self.read_only = read_only
+        self.keep_generations = keep_generations
+        self.generations = GenerationLayout(os.path.join(persist_directory, "generations", collection_name))
+        self._current: Optional[IndexGeneration] = None
+        self._staging: Optional[IndexGeneration] = None
+        self._attached_files: List[Path] = []
+        self._generation_lock = threading.RLock()
+        self._store = Lazy(self._initialize, name="vector_store")
+        if not lazy:
+            self._store.get()
+
+    def _initialize(self):
+        self._current = self._open_current()
+        return self._current
+
+    @property
+    def backend(self) -> VectorBackend:
+        """Backend writes go to: the generation being built, else the current one"""
+        return self._write_target().backend
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        return self._write_target().lexical_index
+
+    @property
+    def client(self):
+        """Chroma client, kept for callers that talk to Chroma directly (None for other backends)"""
+        return getattr(self.backend, "client", None)
+
+    @property
+    def collection(self):
+        """Chroma collection, kept for callers that talk to Chroma directly (None for other backends)"""
+        return getattr(self.backend, "collection", None)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._store.ready
+
+    @property
+    def generational(self) -> bool:
+        return self.backend_name != "chroma"
 
-    def _initialize_store(self):
-        """Initialize the ChromaDB client and collection"""
+    @property
+    def generation(self) -> int:
+        """Number of the current generation (0 before the first commit, and for Chroma)"""
+        return self.snapshot().number
+
+    @property
+    def building(self) -> bool:
+        """True while a generation is being built"""
+        return self._staging is not None
+
+    def warm_up(self):
+        """Open the backend and the BM25 index now rather than on the first query"""
+        self._store.get()
+
+    def snapshot(self) -> IndexGeneration:
+        """The current generation; a caller keeps reading it even if a refresh swaps in a newer one"""
+        self._store.get()
+        return self._current
+
+    def _write_target(self) -> IndexGeneration:
+        self._store.get()
+        staging = self._staging
+        return staging if staging is not None else self._current
+
+    def _open_current(self) -> IndexGeneration:
+        """Open the generation CURRENT points to (or the store's original layout before the first commit)"""
+        number = self.generations.current() if self.generational else None
+        if number is None:
+            backend_directory = self._legacy_backend_directory()
+            bm25_path = os.path.join(self.persist_directory, f"{self.collection_name}_bm25.json")
+            return self._open_generation(0, None, backend_directory, bm25_path, self.read_only)
+        directory = self.generations.path(number)
+        return self._open_generation(number, directory, str(directory / "backend"), str(directory / "bm25.json"),
+                                     self.read_only)
+
+    def _legacy_backend_directory(self) -> Optional[str]:
+        if self.backend_name == "numpy":
+            return os.path.join(self.persist_directory, "numpy", self.collection_name)
+        if self.backend_name == "partitioned":
+            return os.path.join(self.persist_directory, "partitions", self.collection_name)
+        return None
+
+    def _open_generation(self, number: int, directory: Optional[Path], backend_directory: Optional[str],
+                         bm25_path: str, read_only: bool) -> IndexGeneration:
+        backend = self._open_backend(backend_directory, read_only)
+        lexical_index = self._open_lexical_index(backend, bm25_path, read_only)
+        return IndexGeneration(number, directory, backend, lexical_index)
+
+    def _open_backend(self, directory: Optional[str], read_only: bool) -> VectorBackend:
         try:
-            # Create Persistent Directory
-            os.makedirs(self.persist_directory,exist_ok=True)
-            self.client = chromadb.PersistentClient(path=self.persist_directory)
-            # Get or create collection
-            print("Initializing ChromaDB Client...")
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"description":"PDF Document Collection"}
-            )
-            print(f"Collection '{self.collection_name}' is ready.")
+            os.makedirs(self.persist_directory, exist_ok=True)
+            options = dict(self.backend_options)
+            if self.backend_name != "chroma":
+                options["read_only"] = read_only
+            if self.backend_name == "chroma":
+                logger.info("Initializing ChromaDB client")
+                backend = ChromaBackend(self.persist_directory, self.collection_name, **options)
+            elif self.backend_name == "numpy":
+                logger.info("Initializing NumPy vector index")
+                backend = NumpyBackend(directory, **options)
+            elif self.backend_name == "partitioned":
+                logger.info("Initializing time-partitioned NumPy vector index")
+                backend = PartitionedBackend(directory, **options)
+            else:
+                raise ValueError(f"Unknown vector store backend: {self.backend_name}")
+            logger.info("Collection '%s' is ready", self.collection_name)
+            return backend
         except Exception as e:
-            print(f"Error initializing ChromaDB: {e}")
+            logger.error("Initializing vector store failed: %s", e)
             raise
 
+    def _open_lexical_index(self, backend: VectorBackend, path: str, read_only: bool) -> BM25Index:
+        """Load the BM25 index kept next to the store, rebuilding it if it is missing"""
+        lexical_index = BM25Index(path)
+        if len(lexical_index) == 0 and backend.count() > 0:
+            logger.info("Building BM25 index from the existing collection")
+            records = backend.get()
+            lexical_index.add(records["ids"], records["documents"], records["metadatas"])
+            if not read_only:
+                lexical_index.save()
+        return lexical_index
+
+    def reload(self, read_only: Optional[bool] = None):
+        """Re-open the current generation from disk, picking up another process's commits
+
+        Args:
+            read_only: Switch the store to read-only (follower) or writable (leader) mode
+        """
+        with self._generation_lock:
+            if read_only is not None:
+                self.read_only = read_only
+            if not self._store.ready:
+                self._store.get()
+                return
+            if self._staging is not None:
+                raise RuntimeError("Cannot reload while a generation is being built")
+            self._current = self._open_current()
+
+    # Generations
+    def attach_file(self, path: str):
+        """Version a file kept alongside the index (e.g. the ingestion manifest) with the generations
+
+        Its content at commit time is saved with the generation; discarding a
+        generation puts back the content it had at begin, and rollback() the
+        content saved with the generation rolled back to.
+        """
+        path = Path(path)
+        if path not in self._attached_files:
+            self._attached_files.append(path)
+
+    def begin_generation(self, fresh: bool = False) -> int:
+        """Start building the next generation; writes go to it until commit or discard
+
+        Args:
+            fresh: Start from an empty index (a full rebuild) instead of a copy of the current one
+
+        Returns:
+            The number of the new generation (0 for Chroma, which is not versioned)
+        """
+        with self._generation_lock:
+            if self.read_only:
+                raise RuntimeError("A read-only store cannot build generations")
+            if self._staging is not None:
+                raise RuntimeError(f"Generation {self._staging.number} is already being built")
+            current = self.snapshot()
+            if not self.generational:
+                if fresh:
+                    raise ValueError("A full rebuild needs a versioned backend (numpy or partitioned); "
+                                     "Chroma is written in place")
+                # Chroma is written in place; its "generation" is the current collection
+                self._staging = current
+                return 0
+            self.generations.root.mkdir(parents=True, exist_ok=True)
+            number = max(self.generations.numbers() + [current.number]) + 1
+            directory = self.generations.path(number)
+            shutil.rmtree(directory, ignore_errors=True)
+            directory.mkdir(parents=True)
+            if not fresh:
+                # Persist pending writes first: the new generation starts from the files
+                current.backend.flush()
+                current.lexical_index.save()
+                link_tree(Path(self._backend_directory(current)), directory / "backend")
+                link_tree(Path(current.lexical_index.path), directory / "bm25.json")
+            GenerationLayout.save_files(directory / "baseline", self._attached_files)
+            self._staging = self._open_generation(number, directory, str(directory / "backend"),
+                                                  str(directory / "bm25.json"), read_only=False)
+            logger.info("Building index generation %d (%s)", number, "fresh" if fresh else f"from {current.number}")
+            return number
+
+    def commit_generation(self) -> int:
+        """Persist the generation being built and atomically make it the current one
+
+        Returns:
+            The number of the now current generation
+        """
+        with self._generation_lock:
+            staging = self._require_staging()
+            if not self.generational:
+                self._staging = None
+                self.flush()
+                return 0
+            with stage_timer("commit"):
+                staging.backend.flush()
+                staging.lexical_index.save()
+                GenerationLayout.save_files(staging.directory / "files", self._attached_files)
+                shutil.rmtree(staging.directory / "baseline", ignore_errors=True)
+                self.generations.mark_committed(staging.number, staging.count())
+                self.generations.publish(staging.number)
+                previous, self._current, self._staging = self._current, staging, None
+            if previous.directory is None:
+                self._remove_legacy_layout()
+            self.generations.prune(self.keep_generations)
+            logger.info("Committed index generation %d (%d chunks)", staging.number, staging.count())
+            return staging.number
+
+    def discard_generation(self, unchanged: bool = False):
+        """Abandon the generation being built; the current generation and attached files stay as they were
+
+        Args:
+            unchanged: Nothing was written to the generation (a refresh that found nothing to do).
+                The attached files keep their new content and are saved with the current generation.
+        """
+        with self._generation_lock:
+            staging = self._require_staging()
+            self._staging = None
+            if not self.generational:
+                if not unchanged:
+                    logger.warning("Chroma writes are not versioned; discarding keeps what was written")
+                return
+            current = self.snapshot()
+            if not unchanged:
+                GenerationLayout.restore_files(staging.directory / "baseline", self._attached_files)
+            elif current.directory is not None:
+                GenerationLayout.save_files(current.directory / "files", self._attached_files)
+            shutil.rmtree(staging.directory, ignore_errors=True)
+            logger.info("Discarded index generation %d%s", staging.number, " (unchanged)" if unchanged else "")
+
+    def rollback(self) -> int:
+        """Make the newest committed generation older than the current one current again
+
+        Attached files are restored to the content saved with that generation.
+
+        Returns:
+            The number of the now current generation
+        """
+        with self._generation_lock:
+            if self._staging is not None:
+                raise RuntimeError("Cannot roll back while a generation is being built")
+            current = self.snapshot()
+            older = [n for n in self.generations.committed() if n < current.number]
+            if not self.generational or not older:
+                raise RuntimeError("No earlier index generation to roll back to")
+            number = older[-1]
+            self.generations.publish(number)
+            self._current = self._open_current()
+            GenerationLayout.restore_files(self.generations.path(number) / "files", self._attached_files)
+            logger.info("Rolled back the index from generation %d to %d", current.number, number)
+            return number
+
+    def list_generations(self) -> List[int]:
+        """Numbers of the committed generations on disk, oldest first"""
+        return self.generations.committed() if self.generational else []
+
+    def _require_staging(self) -> IndexGeneration:
+        if self._staging is None:
+            raise RuntimeError("No index generation is being built")
+        return self._staging
+
+    def _backend_directory(self, generation: IndexGeneration) -> Optional[str]:
+        if generation.directory is not None:
+            return str(generation.directory / "backend")
+        return self._legacy_backend_directory()
+
+    def _remove_legacy_layout(self):
+        """Delete the pre-generation files once the first generation (a copy of them) is committed"""
+        legacy = self._legacy_backend_directory()
+        if legacy is not None:
+            shutil.rmtree(legacy, ignore_errors=True)
+        bm25_path = os.path.join(self.persist_directory, f"{self.collection_name}_bm25.json")
+        if os.path.exists(bm25_path):
+            os.remove(bm25_path)
+
     def add_documents(self, documents: List[Document], embeddings: np.ndarray):
-        """Add documents to the vector store after generating embeddings"""
+        """Upsert documents into the vector store under content-addressed IDs
+
+        Every chunk gets `ingested_at` and `published_at` (epoch seconds) in its
+        metadata for time-window filters; published_at comes from the document's
+        own published_at/timestamp metadata and falls back to the ingestion time.
+        """
         if len(documents) != len(embeddings):
             raise ValueError("Number of documents must match the number of embeddings")
+        ingested_at = time.time()
 
         ids = []
         metadatas = []
         documents_text = []
         embeddings_list = []
+        seen = set()
 
         for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
-            # Generate unique ID
-            doc_id = f"doc_{uuid.uuid4().hex[:8]}_{i}"
+            # Deterministic ID, so re-adding an unchanged chunk overwrites it instead of duplicating it
+            doc_id = chunk_id(doc)
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
             ids.append(doc_id)
 
             # Prepare metadata
             metadata = dict(doc.metadata)
             metadata['doc_index'] = i
             metadata['content_length'] = len(doc.page_content)
+            metadata['ingested_at'] = ingested_at
+            try:
+                published_at = to_timestamp(metadata.get('published_at') or metadata.get('timestamp'))
+            except ValueError:
+                published_at = None
+            metadata['published_at'] = published_at if published_at is not None else ingested_at
             metadatas.append(metadata)
 
             # Document content
             documents_text.append(doc.page_content)
 
             # Embedding
-            embeddings_list.append(embedding.tolist())
+            embeddings_list.append(embedding)
 
-        # Add to collection
+        if not ids:
+            return
+
+        # Upsert into collection
         try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings_list,
-                metadatas=metadatas,
-                documents=documents_text
-            )
-            print(f"Successfully added {len(documents)} documents to vector store")
-            print(f"Total documents in collection: {self.collection.count()}")
+            with stage_timer("upsert", batch_size=len(ids)):
+                self.backend.upsert(ids, np.asarray(embeddings_list, dtype=np.float32), metadatas, documents_text)
+                self.lexical_index.add(ids, documents_text, metadatas)
+            logger.debug("Upserted %d documents into the vector store", len(ids))
 
         except Exception as e:
-            print(f"Error adding documents to vector store: {e}")
-            raise
\ No newline at end of file
+            logger.error("Adding documents to the vector store failed: %s", e)
+            raise
+
+    def delete_documents(self, ids: Iterable[str]):
+        """Delete documents from the vector store by ID"""
+        ids = list(ids)
+        if not ids:
+            return
+        try:
+            self.backend.delete(ids)
+            self.lexical_index.remove(ids)
+            logger.debug("Deleted %d documents from the vector store", len(ids))
+        except Exception as e:
+            logger.error("Deleting documents from the vector store failed: %s", e)
+            raise
+
+    def query(self, query_embeddings, n_results: int = 5,
+              filters: Optional[MetadataFilter] = None) -> Dict[str, List[List[Any]]]:
+        """Nearest neighbours of each query embedding, with cosine distances
+
+        Filters are evaluated by the backend (Chroma `where` / NumPy row mask), so
+        n_results matching chunks come back even when the filter is selective.
+        """
+        return self.snapshot().query(query_embeddings, n_results, filters=filters)
+
+    def lexical_search(self, query: str, top_k: int = 5,
+                       filters: Optional[MetadataFilter] = None) -> List[Tuple[str, float]]:
+        """BM25 (chunk_id, score) pairs for a query, best first"""
+        return self.snapshot().lexical_search(query, top_k=top_k, filters=filters)
+
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Stored records by ID, or all records"""
+        return self.snapshot().get(ids)
+
+    def count(self) -> int:
+        """Number of stored documents"""
+        return self.snapshot().count()
+
+    def flush(self):
+        """Persist buffered writes (the NumPy backend and the BM25 index write to disk here)"""
+        self.backend.flush()
+        self.lexical_index.save()
+
+    def maintain(self) -> Dict[str, List[str]]:
+        """Run the backend's retention and compaction, keeping the BM25 index in step
+
+        Returns:
+            {"expired": [...], "deduplicated": [...]} chunk IDs removed from the store
+        """
+        removed = self.backend.maintain()
+        dropped = removed["expired"] + removed["deduplicated"]
+        if dropped:
+            self.lexical_index.remove(dropped)
+            self.lexical_index.save()
+            logger.info("Maintenance removed %d expired and %d near-duplicate chunks",
+                        len(removed['expired']), len(removed['deduplicated']))
+        return removed
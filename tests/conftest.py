@@ -0,0 +1,118 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+
+class HashEmbeddingManager:
+    """Deterministic embeddings seeded by each text's CRC32, with no semantic signal
+
+    Counts the texts it encodes, so tests can tell what was (re-)embedded.
+    """
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.encoded = 0
+
+    def generate_embeddings(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.array([np.random.default_rng(zlib.crc32(t.encode())).random(self.dim) for t in texts],
+                        dtype=np.float32).reshape(len(texts), self.dim)
+
+
+class KeywordEmbeddingManager:
+    """One dimension per topic keyword, so vector and BM25 search agree
+
+    Records the texts of every encode call.
+    """
+    KEYWORDS = ("storm", "rates", "league")
+
+    def __init__(self):
+        self.calls = []
+
+    @classmethod
+    def vector(cls, text: str) -> np.ndarray:
+        return np.array([float(word in text.lower()) + 0.01 for word in cls.KEYWORDS], dtype=np.float32)
+
+    @property
+    def encoded(self) -> int:
+        return sum(len(texts) for texts in self.calls)
+
+    def generate_embeddings(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([self.vector(t) for t in texts], dtype=np.float32).reshape(len(texts), len(self.KEYWORDS))
+
+
+class KeyedEmbeddingManager:
+    """Embeds each text as the vector given for it, or `default` for texts without one"""
+    def __init__(self, vectors, default=None):
+        self.vectors = vectors
+        self.default = default
+
+    def generate_embeddings(self, texts, **kwargs):
+        return np.array([self.vectors[t] if self.default is None else self.vectors.get(t, self.default)
+                         for t in texts], dtype=np.float32)
+
+
+class FakeLLM:
+    """Chat model stand-in answering with `tokens`: whole from ainvoke, token by token from astream
+
+    `delay` (seconds, or a function of the prompt) is awaited by every ainvoke
+    call; `fail_after` makes astream raise after that many tokens. The counters
+    record calls, the peak number of overlapping ainvoke calls and how streams ended.
+    """
+    class _Message:
+        def __init__(self, content):
+            self.content = content
+
+    def __init__(self, tokens=("answer",), delay=0.0, fail_after=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay(prompt) if callable(self.delay) else self.delay)
+        self.active -= 1
+        return self._Message("".join(self.tokens))
+
+    async def astream(self, prompt):
+        self.calls += 1
+        try:
+            for i, token in enumerate(self.tokens):
+                if i == self.fail_after:
+                    raise RuntimeError("connection reset")
+                await asyncio.sleep(0)
+                yield self._Message(token)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+
+
+@pytest.fixture
+def embedder():
+    return HashEmbeddingManager()
+
+
+@pytest.fixture
+def keyword_embedder():
+    return KeywordEmbeddingManager()
+
+
+@pytest.fixture
+def keyed_embedder():
+    """Factory: keyed_embedder({"text": [1.0, 0.0]}, default=None)"""
+    return KeyedEmbeddingManager
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeLLM()
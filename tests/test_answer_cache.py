@@ -0,0 +1,34 @@
+import numpy as np
+
+from src.answer_cache import SemanticAnswerCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.put("Election results", np.array([1.0, 0.0]), 5, 0, {"summary": "s"})
+
+    assert cache.get("  election   RESULTS ", None, 5, 0) == {"summary": "s"}
+    assert cache.get("who won the election", np.array([0.99, 0.05]), 5, 0) == {"summary": "s"}
+    assert cache.get("football scores", np.array([0.0, 1.0]), 5, 0) is None
+    assert cache.get("Election results", np.array([1.0, 0.0]), 3, 0) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_ttl_size_and_corpus_version():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=10, clock=clock)
+    for i, query in enumerate(["a", "b", "c"]):
+        cache.put(query, np.eye(3)[i], 5, 0, {"summary": query})
+    assert len(cache) == 2 and cache.get("a", None, 5, 0) is None
+
+    assert cache.get("c", None, 5, 1) is None
+    clock.now = 11
+    assert cache.get("c", None, 5, 0) is None
@@ -0,0 +1,43 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+
+
+def test_batch_embeds_and_searches_once_and_streams_in_completion_order(tmp_path, keyword_embedder, fake_llm):
+    store = VectorStore(collection_name="batch", persist_directory=str(tmp_path), backend="numpy")
+    embedder = keyword_embedder
+    texts = ["Storm warnings issued along the coast.", "Markets rallied after the central bank held rates.",
+             "The league title race went to the final day."]
+    store.add_documents([Document(page_content=t, metadata={"source": "test"}) for t in texts],
+                        embedder.generate_embeddings(texts))
+    llm = fake_llm
+    llm.delay = lambda prompt: 0.05 if "storm" in prompt.lower() else 0.01   # the storm answer comes last
+    pipeline = NewsPipeline(store, embedder, data_directory=str(tmp_path), sources=[], llm_client=llm,
+                            dedup_threshold=None)
+    backend_queries = []
+    query = store.snapshot().backend.query
+    store.snapshot().backend.query = lambda embeddings, *args, **kwargs: (
+        backend_queries.append(len(embeddings)) or query(embeddings, *args, **kwargs))
+    queries = ["storm coast", "central bank rates", "league title"]
+
+    async def collect():
+        return [event async for event in pipeline.query_news_batch(queries, top_k=1)]
+
+    embedder.calls.clear()
+    events = asyncio.run(collect())
+    assert embedder.calls == [queries] and backend_queries == [3]
+    assert llm.peak > 1
+    results = [event["data"] for event in events if event["type"] == "batch_result"]
+    assert [result["query"] for result in results][-1] == "storm coast"   # the slowest answer arrives last
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    for result in results:
+        assert result["articles"][0]["content"] == texts[result["index"]]
+    assert events[-1] == {"type": "batch_done", "data": {"count": 3, "cached": 0}}
+
+    # A repeated batch is answered from the answer cache without searching again
+    events = asyncio.run(collect())
+    assert backend_queries == [3] and events[-1]["data"]["cached"] == 3
+    asyncio.run(pipeline.close())
@@ -0,0 +1,70 @@
+import asyncio
+
+import numpy as np
+
+from src.batching import EmbeddingBatcher
+from src.execution import ExecutionLayer
+
+
+class RecordingEmbeddingManager:
+    """Embeds a text as [len(text), 1] and records the texts of every encode call"""
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def generate_embeddings(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def embed_all(batcher, texts):
+    async def scenario():
+        return await asyncio.gather(*(batcher.embed(text) for text in texts), return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_queries_share_one_encode_call():
+    manager = RecordingEmbeddingManager()
+    execution = ExecutionLayer(cpu_workers=1)
+    batcher = EmbeddingBatcher(manager, execution, max_batch_size=32, max_wait_ms=20)
+    texts = ["a", "bb", "ccc"]
+
+    embeddings = embed_all(batcher, texts)
+    assert manager.calls == [texts]
+    # Every caller gets the row of its own text
+    assert [float(embedding[0]) for embedding in embeddings] == [1.0, 2.0, 3.0]
+    assert batcher.batches == 1 and batcher.largest_batch == 3 and batcher.pending() == 0
+    execution.shutdown()
+
+
+def test_a_full_batch_is_flushed_without_waiting():
+    manager = RecordingEmbeddingManager()
+    execution = ExecutionLayer(cpu_workers=1)
+    # With a 10 s wait, only reaching max_batch_size can flush the first two batches in time
+    batcher = EmbeddingBatcher(manager, execution, max_batch_size=2, max_wait_ms=10000)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.embed(text) for text in ("a", "b", "c", "d"))), 5)
+
+    embeddings = asyncio.run(scenario())
+    assert manager.calls == [["a", "b"], ["c", "d"]]
+    assert len(embeddings) == 4 and batcher.batched_queries == 4
+    execution.shutdown()
+
+
+def test_an_encode_error_reaches_every_waiting_caller():
+    manager = RecordingEmbeddingManager(error=RuntimeError("model crashed"))
+    execution = ExecutionLayer(cpu_workers=1)
+    batcher = EmbeddingBatcher(manager, execution, max_batch_size=32, max_wait_ms=20)
+
+    results = embed_all(batcher, ["a", "b", "c"])
+    assert len(manager.calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "model crashed" for result in results)
+
+    # The batcher keeps working for the next queries
+    manager.error = None
+    assert float(embed_all(batcher, ["dd"])[0][0]) == 2.0
+    execution.shutdown()
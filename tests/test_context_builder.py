@@ -0,0 +1,53 @@
+import random
+
+from langchain_core.documents import Document
+
+from src.chunking import split_documents
+from src.context_builder import ContextBuilder, estimate_tokens
+from src.retriever import RetrievalResult
+
+WORDS = ["market", "shares", "investors", "quarter", "growth", "board", "policy", "trade", "energy", "prices"]
+
+
+def article(seed, sentences=40):
+    rng = random.Random(seed)
+    return " ".join(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(sentences))
+
+
+def as_hits(chunks):
+    return [{"id": f"c{i}", "content": c.page_content, "metadata": c.metadata} for i, c in enumerate(chunks)]
+
+
+def test_adjacent_chunks_are_stitched_without_overlap():
+    text = article(0)
+    chunks = split_documents([Document(page_content=text, metadata={"source": "a.txt"})])
+    assert len(chunks) >= 3
+    hits = as_hits(chunks[:3])
+    # Retrieval order is by score, not by position in the article
+    hits = [hits[2], hits[0], hits[1]]
+
+    packed = ContextBuilder(max_tokens=None).build("market", hits)
+    assert packed.spans == 1 and packed.chunks == 3
+    assert text.startswith(packed.text)
+    assert packed.tokens < packed.input_tokens
+
+    # Chunks of another source are never merged into it
+    other = {"id": "x", "content": chunks[1].page_content, "metadata": {"source": "b.txt"}}
+    assert ContextBuilder(max_tokens=None).build("market", hits + [other]).spans == 2
+
+
+def test_budget_keeps_best_ranked_and_best_sentences():
+    first = {"id": "1", "content": article(1, sentences=3), "metadata": {"source": "a.txt"}}
+    second = {"id": "2", "content": article(2, sentences=30) + " Copper tariffs hit exporters.",
+              "metadata": {"source": "b.txt"}}
+    budget = estimate_tokens(first["content"]) + 40
+
+    packed = ContextBuilder(max_tokens=budget).build("copper tariffs", [first, second])
+    assert packed.truncated and packed.tokens <= budget
+    assert packed.text.startswith(first["content"])
+    assert "Copper tariffs hit exporters." in packed.text
+
+    result = RetrievalResult(query="copper tariffs", documents=[first, second],
+                             context_builder=ContextBuilder(max_tokens=budget))
+    assert result.context == packed.text
+    assert RetrievalResult(query="q", documents=[first, second]).context == first["content"] + "\n\n" + second["content"]
@@ -0,0 +1,71 @@
+import asyncio
+
+from src.coordination import RefreshCoordinator
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+
+
+def make_worker(tmp_path, data_dir, embedder):
+    """One serving worker: a coordinator and a pipeline on the shared store directory"""
+    coordinator = RefreshCoordinator(str(tmp_path / "store"), refresh_interval=3600, poll_interval=0)
+    store = VectorStore(collection_name="shared", persist_directory=str(tmp_path / "store"), backend="numpy",
+                        read_only=not coordinator.try_lead())
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[],
+                            llm_client=object(), dedup_threshold=None)
+    return coordinator, pipeline
+
+
+def test_one_leader_refreshes_and_followers_reload(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Markets rallied after the central bank held rates.")
+    leader, leader_pipeline = make_worker(tmp_path, data_dir, embedder)
+    follower, follower_pipeline = make_worker(tmp_path, data_dir, embedder)
+    assert leader.is_leader and not follower.is_leader
+    assert follower_pipeline.vector_store.read_only
+
+    async def scenario():
+        assert await follower.step(follower_pipeline) == "idle"
+        assert await leader.step(leader_pipeline) == "refreshed"
+        assert await leader.step(leader_pipeline) == "idle"   # not due again for an hour
+        assert await follower.step(follower_pipeline) == "reloaded"
+        assert follower_pipeline.vector_store.count() == 1 and follower.status()["index_version"] == 1
+
+        # The leader goes away: the follower takes over, writable, and refreshes
+        leader.close()
+        (data_dir / "b.txt").write_text("Storm warnings issued along the coast.")
+        assert await follower.step(follower_pipeline) == "refreshed"
+        assert follower.is_leader and not follower_pipeline.vector_store.read_only
+        assert follower_pipeline.vector_store.count() == 2
+        assert follower.status() == {"role": "leader", "index_version": 2, "reloads": 1}
+        await leader_pipeline.close()
+        await follower_pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_a_refresh_that_changes_nothing_keeps_the_version(tmp_path, embedder, fake_llm):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Markets rallied after the central bank held rates.")
+    leader, leader_pipeline = make_worker(tmp_path, data_dir, embedder)
+    follower, follower_pipeline = make_worker(tmp_path, data_dir, embedder)
+    follower_pipeline.llm = fake_llm
+    leader.refresh_interval = 0
+
+    async def scenario():
+        assert await leader.step(leader_pipeline) == "refreshed"
+        assert await follower.step(follower_pipeline) == "reloaded"
+        await follower_pipeline.query_news("central bank", 1)
+        cached = len(follower_pipeline.answer_cache)
+
+        # Nothing changed on disk: no new generation, no version bump, followers keep their cache
+        assert await leader.step(leader_pipeline) == "refreshed"
+        assert leader.version.read() == 1 and leader_pipeline.vector_store.generation == 1
+        assert await follower.step(follower_pipeline) == "idle"
+        assert follower.reloads == 1 and len(follower_pipeline.answer_cache) == cached == 1
+        leader.close()
+        await leader_pipeline.close()
+        await follower_pipeline.close()
+
+    asyncio.run(scenario())
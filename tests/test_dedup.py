@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+from langchain_core.documents import Document
+
+from src.dedup import NearDuplicateIndex
+from src.filters import MetadataFilter
+from src.pipeline import NewsPipeline
+from src.retriever import RAGRetriever
+from src.vectorstore import VectorStore
+
+STORY = ("The central bank held interest rates at five percent on Thursday, citing stubborn services "
+         "inflation and a labour market that remains tight despite a slowdown in hiring across the economy.")
+OTHER = "Heavy snow closed mountain passes and delayed hundreds of flights across the northern region overnight."
+
+
+def test_minhash_flags_syndicated_copies(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dups.npz"), threshold=0.8)
+    assert index.check_and_add("bbc_1", STORY) is None
+    assert index.check_and_add("reuters_1", STORY.replace("Thursday", "Thursday,")) == "bbc_1"
+    assert index.check_and_add("reuters_2", OTHER) is None
+    # The chunk a changed file is replacing does not count as a duplicate
+    assert index.check_and_add("bbc_1_v2", STORY + " Markets were unmoved.", ignore=["bbc_1"]) is None
+    assert len(index) == 3
+
+    index.save()
+    reopened = NearDuplicateIndex(str(tmp_path / "dups.npz"), threshold=0.8)
+    assert reopened.duplicates == {"reuters_1": "bbc_1"}
+    # Removing the original hands back its dropped copy for re-ingestion
+    assert reopened.remove(["bbc_1"]) == ["reuters_1"]
+    assert reopened.duplicates == {}
+
+
+def test_refresh_skips_copies_and_restores_them(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    store = VectorStore(collection_name="test_dedup", persist_directory=str(tmp_path / "store"))
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[], dedup_threshold=0.8)
+    (data_dir / "a.txt").write_text(STORY)
+    (data_dir / "copy.txt").write_text(STORY + " ")
+    (data_dir / "other.txt").write_text(OTHER)
+
+    stats = asyncio.run(pipeline.refresh_news())
+    assert stats["duplicates"] == 1
+    assert embedder.encoded == 2 and store.count() == 2
+
+    # Deleting whichever file was kept re-ingests the dropped copy on the next refresh
+    kept = next(os.path.basename(m["source"]) for m in store.get()["metadatas"]
+                if os.path.basename(m["source"]) in ("a.txt", "copy.txt"))
+    (data_dir / kept).unlink()
+    asyncio.run(pipeline.refresh_news())
+    asyncio.run(pipeline.refresh_news())
+    assert embedder.encoded == 3 and store.count() == 2
+
+
+def test_dedup_is_opt_in_so_every_copy_keeps_its_source(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    store = VectorStore(collection_name="test_dedup", persist_directory=str(tmp_path / "store"))
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[])
+    assert pipeline.deduplicator is None
+    (data_dir / "a.txt").write_text(STORY)
+    (data_dir / "copy.txt").write_text(STORY + " ")
+
+    assert asyncio.run(pipeline.refresh_news())["duplicates"] == 0
+    copy = str(data_dir / "copy.txt")
+    hits = pipeline.retriever.retrieve("central bank rates", top_k=2, filters=MetadataFilter.from_params(sources=[copy]))
+    assert [hit["metadata"]["source"] for hit in hits] == [copy]
+
+
+def test_mmr_diversifies_results(tmp_path, keyed_embedder):
+    vectors = {
+        "rates story": [1.0, 0.0, 0.0],
+        "rates story rewrite": [0.99, 0.14, 0.0],
+        "rates reaction abroad": [0.8, 0.0, 0.6],
+        "rates": [1.0, 0.0, 0.0],
+    }
+    embedder = keyed_embedder(vectors)
+    store = VectorStore(collection_name="test_mmr", persist_directory=str(tmp_path / "store"), backend="numpy")
+    texts = ["rates story", "rates story rewrite", "rates reaction abroad"]
+    store.add_documents([_doc(t) for t in texts], embedder.generate_embeddings(texts))
+
+    # The retrievers can only encode the query: MMR reads the candidates' vectors from the index
+    query_embedder = keyed_embedder({"rates": vectors["rates"]})
+    plain = RAGRetriever(store, query_embedder).retrieve("rates", top_k=2)
+    assert [d["content"] for d in plain] == ["rates story", "rates story rewrite"]
+    diverse = RAGRetriever(store, query_embedder, mmr_lambda=0.3).retrieve("rates", top_k=2)
+    assert [d["content"] for d in diverse] == ["rates story", "rates reaction abroad"]
+
+
+def _doc(text):
+    return Document(page_content=text, metadata={"source": "test"})
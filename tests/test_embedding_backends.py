@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from sentence_transformers import SentenceTransformer, models
+from transformers import BertConfig, BertModel, BertTokenizerFast
+
+from src.embedding import EmbeddingManager
+from src.embedding_backends import OnnxEmbeddingModel
+
+TEXTS = ["the market rose", "bank rates fell sharply", "storm news on the coast", "election vote"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small random BERT sentence encoder saved locally, so no download is needed"""
+    root = tmp_path_factory.mktemp("tiny")
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted({w for t in TEXTS for w in t.split()})
+    (root / "vocab.txt").write_text("\n".join(words))
+    BertTokenizerFast(vocab_file=str(root / "vocab.txt")).save_pretrained(str(root / "bert"))
+    torch.manual_seed(0)
+    BertModel(BertConfig(vocab_size=len(words), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                         intermediate_size=64)).save_pretrained(str(root / "bert"))
+    encoder = SentenceTransformer(modules=[models.Transformer(str(root / "bert")), models.Pooling(32),
+                                           models.Normalize()])
+    encoder.save(str(root / "sentence"))
+    return str(root / "sentence")
+
+
+def test_onnx_and_int8_backends_match_torch(tiny_model, tmp_path):
+    reference = EmbeddingManager(tiny_model, cache_dir=None).generate_embeddings(TEXTS)
+    for backend in ("onnx", "int8"):
+        manager = EmbeddingManager(tiny_model, cache_dir=None, backend=backend, threads=1,
+                                   onnx_dir=str(tmp_path / "onnx"))
+        assert isinstance(manager.model, OnnxEmbeddingModel) and manager.backend == backend
+        assert manager.model.parity["min_cosine"] >= 0.99
+        embeddings = manager.generate_embeddings(TEXTS)
+        assert embeddings.shape == reference.shape
+        assert np.all(np.sum(embeddings * reference, axis=1) >= 0.99)
+    # One export serves both backends and is reused
+    assert sorted(os.listdir(tmp_path / "onnx")) == [tiny_model.strip("/").replace("/", "__")]
+
+
+def test_failed_parity_falls_back_to_torch(tiny_model, tmp_path):
+    manager = EmbeddingManager(tiny_model, cache_dir=None, backend="int8", onnx_dir=str(tmp_path / "onnx"),
+                               parity_threshold=1.01)
+    assert not manager.is_loaded
+    assert not isinstance(manager.model, OnnxEmbeddingModel) and manager.backend == "torch"
+    with pytest.raises(ValueError):
+        EmbeddingManager(tiny_model, cache_dir=None, backend="tensorrt")
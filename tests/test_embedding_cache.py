@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.embedding_cache import DiskEmbeddingCache, LRUEmbeddingCache, text_hash
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUEmbeddingCache(max_size=2)
+    cache.put_many(["a", "b"], np.eye(2, dtype=np.float32))
+    cache.get_many(["a"])
+    cache.put_many(["c"], np.ones((1, 2), dtype=np.float32))
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.hits == 3 and cache.misses == 1
+
+
+def test_disk_cache_persists_and_recovers_partial_tail(tmp_path):
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    keys = [text_hash(t) for t in ("one", "two", "three")]
+    cache = DiskEmbeddingCache(str(tmp_path), "model/name", dim=4)
+    cache.put_many(keys[:2], vectors[:2])
+
+    # Simulate a crash after the matrix write but before the keys write
+    with open(cache.matrix_path, "ab") as f:
+        f.write(vectors[2].tobytes())
+
+    reopened = DiskEmbeddingCache(str(tmp_path), "model/name", dim=4)
+    assert len(reopened) == 2
+    reopened.put_many(keys[2:], vectors[2:])
+    found = DiskEmbeddingCache(str(tmp_path), "model/name", dim=4).get_many(keys)
+    np.testing.assert_array_equal(np.stack([found[k] for k in keys]), vectors)
+
+
+def test_disk_cache_shared_by_two_processes_numbers_rows_from_the_files(tmp_path):
+    # Two instances on one directory stand for the refresh leader and a follower
+    first = DiskEmbeddingCache(str(tmp_path), "model", dim=4)
+    second = DiskEmbeddingCache(str(tmp_path), "model", dim=4)
+    first.put_many(["a"], np.ones((1, 4), dtype=np.float32))
+    second.put_many(["b"], np.full((1, 4), 2, dtype=np.float32))
+    first.put_many(["b", "c"], np.full((2, 4), 3, dtype=np.float32))   # "b" is already on disk
+
+    np.testing.assert_array_equal(second.get_many(["b"])["b"], np.full(4, 2))
+    reopened = DiskEmbeddingCache(str(tmp_path), "model", dim=4)
+    found = reopened.get_many(["a", "b", "c"])
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(np.stack([found[k][0] for k in "abc"]), [1, 2, 3])
+
+    read_only = DiskEmbeddingCache(str(tmp_path), "model", dim=4, read_only=True)
+    read_only.put_many(["d"], np.zeros((1, 4), dtype=np.float32))
+    assert len(read_only) == 3 and len(DiskEmbeddingCache(str(tmp_path), "model", dim=4)) == 3
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+from src.execution import ExecutionLayer
+
+
+class BlockingCounter:
+    """Blocking call that records its thread and the peak number of overlapping calls"""
+    def __init__(self, seconds: float = 0.05):
+        self.seconds = seconds
+        self.active = 0
+        self.peak = 0
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.active -= 1
+
+
+def test_each_resource_limit_bounds_its_own_calls():
+    execution = ExecutionLayer(cpu_workers=4, io_workers=4, limits={"narrow": 1, "wide": 3})
+    narrow, wide = BlockingCounter(), BlockingCounter()
+
+    async def scenario():
+        await asyncio.gather(*(execution.run_cpu("narrow", narrow) for _ in range(4)),
+                             *(execution.run_cpu("wide", wide) for _ in range(6)))
+
+    asyncio.run(scenario())
+    # Both share the 4 CPU threads, yet each stays within its own limit
+    assert narrow.peak == 1 and wide.peak == 3
+    execution.shutdown()
+
+
+def test_semaphores_are_kept_per_event_loop():
+    execution = ExecutionLayer(limits={"narrow": 1})
+
+    async def semaphore():
+        return execution.limit("narrow")
+
+    first, second = asyncio.run(semaphore()), asyncio.run(semaphore())
+    assert first is not second
+
+    async def same_loop():
+        return execution.limit("narrow") is execution.limit("narrow")
+
+    assert asyncio.run(same_loop())
+    execution.shutdown()
+
+
+def test_cpu_and_io_work_run_on_their_own_pools():
+    execution = ExecutionLayer(cpu_workers=1, io_workers=2, limits={"encode": 2, "disk": 2})
+    cpu, io = BlockingCounter(0.2), BlockingCounter(0.01)
+
+    async def scenario():
+        started = time.perf_counter()
+        encodes = [asyncio.ensure_future(execution.run_cpu("encode", cpu)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # With the only CPU thread busy, I/O calls still run right away on the I/O pool
+        await asyncio.gather(*(execution.run_io("disk", io) for _ in range(2)))
+        io_done = time.perf_counter() - started
+        await asyncio.gather(*encodes)
+        return io_done
+
+    io_done = asyncio.run(scenario())
+    assert io_done < 0.2
+    assert all(name.startswith("newsrag-cpu") for name in cpu.threads) and len(cpu.threads) == 1
+    assert all(name.startswith("newsrag-io") for name in io.threads)
+    assert cpu.peak == 1   # a limit above the pool size still queues on the single CPU thread
+    execution.shutdown()
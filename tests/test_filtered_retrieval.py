@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.filters import MetadataFilter, message_query_options, query_options
+from src.retriever import RAGRetriever
+from src.vector_backends import ChromaBackend, NumpyBackend, normalize_rows
+from src.vectorstore import VectorStore
+
+HOUR = 3600
+
+
+def test_metadata_filter_params():
+    assert MetadataFilter.from_params() is None
+    filters = MetadataFilter.from_params(sources="BBC", since="2024-05-01T00:00:00+00:00", last_hours=24)
+    assert filters.sources == ("BBC",)
+    assert filters.since == 1714521600.0
+    since, until = filters.window(now=1714521600.0 + 48 * HOUR)
+    assert since == 1714521600.0 + 24 * HOUR and until is None
+    assert filters.to_chroma_where(now=1714521600.0) == {"$and": [
+        {"source": {"$in": ["BBC"]}}, {"published_at": {"$gte": 1714521600.0}},
+    ]}
+    with pytest.raises(ValueError):
+        MetadataFilter.from_params(since=100, until=50)
+
+    # Both servers build their query options with the same validation
+    assert query_options(sources=["BBC"], recency_half_life_hours=12) == {
+        "filters": MetadataFilter(sources=("BBC",)), "recency_half_life_hours": 12.0}
+    assert message_query_options({"type": "query", "query": "q", "last_hours": 6}) == {
+        "filters": MetadataFilter(last_hours=6.0), "recency_half_life_hours": None}
+    for half_life in (0, -1):
+        with pytest.raises(ValueError):
+            message_query_options({"recency_half_life_hours": half_life})
+
+
+@pytest.mark.parametrize("backend_name", ["chroma", "numpy"])
+def test_filters_are_applied_before_top_k(tmp_path, backend_name):
+    rng = np.random.default_rng(0)
+    n = 300
+    vectors = normalize_rows(rng.standard_normal((n, 16)))
+    now = time.time()
+    ids = [f"chunk_{i}" for i in range(n)]
+    # Only every 30th record is a recent BBC story
+    metadatas = [{"source": "BBC" if i % 30 == 0 else "Reuters",
+                  "published_at": now - (HOUR if i % 30 == 0 else 72 * HOUR)} for i in range(n)]
+    if backend_name == "chroma":
+        backend = ChromaBackend(str(tmp_path / "chroma"), "filters")
+    else:
+        backend = NumpyBackend(str(tmp_path / "numpy"), mode="exact")
+    backend.upsert(ids, vectors, metadatas, [f"doc {i}" for i in range(n)])
+
+    filters = MetadataFilter.from_params(sources=["BBC"], last_hours=24)
+    results = backend.query(vectors[1:2], n_results=5, filters=filters)
+    assert len(results["ids"][0]) == 5
+    assert all(m["source"] == "BBC" and m["published_at"] > now - 24 * HOUR for m in results["metadatas"][0])
+
+    old_only = MetadataFilter.from_params(until=now - 48 * HOUR)
+    results = backend.query(vectors[:1], n_results=3, filters=old_only)
+    assert all(m["source"] == "Reuters" for m in results["metadatas"][0])
+
+
+def test_timestamps_filters_and_recency_decay(tmp_path, keyed_embedder):
+    now = time.time()
+    old = Document(page_content="Central bank raises rates", metadata={"source": "BBC", "published_at": now - 96 * HOUR})
+    fresh = Document(page_content="Central bank holds rates", metadata={"source": "Reuters"})
+    embedder = keyed_embedder({
+        old.page_content: np.array([1.0, 0.0, 0.0, 0.0]),
+        fresh.page_content: np.array([0.8, 0.6, 0.0, 0.0]),
+        "central bank rates": np.array([1.0, 0.0, 0.0, 0.0]),
+    }, default=np.ones(4))
+    store = VectorStore(collection_name="test_filters", persist_directory=str(tmp_path / "store"), backend="numpy")
+    store.add_documents([old, fresh], embedder.generate_embeddings([old.page_content, fresh.page_content]))
+
+    # published_at defaults to the ingestion time when the document carries none
+    metadatas = {m["source"]: m for m in store.get()["metadatas"]}
+    assert metadatas["BBC"]["published_at"] == pytest.approx(now - 96 * HOUR)
+    assert metadatas["Reuters"]["published_at"] == metadatas["Reuters"]["ingested_at"] >= now
+
+    retriever = RAGRetriever(store, embedder, mode="hybrid")
+    plain = retriever.retrieve("central bank rates", top_k=2, mode="vector")
+    assert [d["metadata"]["source"] for d in plain] == ["BBC", "Reuters"]
+
+    decayed = retriever.retrieve("central bank rates", top_k=2, mode="vector", recency_half_life_hours=12)
+    assert [d["metadata"]["source"] for d in decayed] == ["Reuters", "BBC"]
+    assert decayed[0]["recency_weight"] > 0.99 > decayed[1]["recency_weight"]
+    # A zero half-life is rejected, not mistaken for "use the default"
+    with pytest.raises(ValueError):
+        retriever.retrieve("central bank rates", top_k=2, recency_half_life_hours=0)
+
+    last_day = MetadataFilter.from_params(last_hours=24)
+    for mode in ("vector", "lexical", "hybrid"):
+        hits = retriever.retrieve("central bank rates", top_k=2, mode=mode, filters=last_day)
+        assert [d["metadata"]["source"] for d in hits] == ["Reuters"]
@@ -0,0 +1,128 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+
+
+def add(store, embedder, *texts):
+    docs = [Document(page_content=text, metadata={"source": "test"}) for text in texts]
+    store.add_documents(docs, embedder.generate_embeddings(texts))
+
+
+def test_readers_keep_their_generation_until_the_swap(tmp_path, embedder):
+    store = VectorStore(collection_name="gen", persist_directory=str(tmp_path), backend="numpy")
+    add(store, embedder, "Markets rallied after the central bank held rates.")
+    store.begin_generation()
+    assert store.commit_generation() == 1
+
+    pinned = store.snapshot()
+    store.begin_generation()
+    add(store, embedder, "Storm warnings issued along the coast.")
+    # Queries do not see the generation being built
+    assert store.count() == 1 and store.lexical_search("storm") == []
+    assert store.commit_generation() == 2
+    assert store.count() == 2 and len(store.lexical_search("storm")) == 1
+    # A reader that started before the swap still sees the generation it started with
+    assert pinned.count() == 1 and pinned.lexical_search("storm") == []
+
+    # A reopened store serves the committed generation; rollback goes back one
+    reopened = VectorStore(collection_name="gen", persist_directory=str(tmp_path), backend="numpy", read_only=True)
+    assert reopened.generation == 2 and reopened.count() == 2
+    assert store.list_generations() == [1, 2]
+    assert store.rollback() == 1 and store.count() == 1
+    reopened.reload()
+    assert reopened.generation == 1 and reopened.count() == 1
+
+
+def test_failed_refresh_leaves_the_index_and_manifest_untouched(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Markets rallied after the central bank held rates.")
+    store = VectorStore(collection_name="gen", persist_directory=str(tmp_path / "store"), backend="numpy")
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[],
+                            llm_client=object())
+    manifest_path = tmp_path / "store" / "ingestion_manifest.json"
+
+    async def scenario():
+        await pipeline.refresh_news()
+        assert store.generation == 1 and store.count() == 1
+        manifest = manifest_path.read_text()
+
+        (data_dir / "b.txt").write_text("Storm warnings issued along the coast.")
+        original_maintain = store.maintain
+
+        def failing_maintain():
+            raise OSError("disk full")
+
+        store.maintain = failing_maintain
+        try:
+            await pipeline.refresh_news()
+        except OSError:
+            pass
+        else:
+            raise AssertionError("refresh should have failed")
+        assert pipeline.refresh_state == "failed"
+        assert store.generation == 1 and store.count() == 1 and not store.building
+        assert manifest_path.read_text() == manifest
+        assert store.list_generations() == [1]
+
+        store.maintain = original_maintain
+        assert (await pipeline.refresh_news())["added"] == 1
+        assert store.generation == 2 and store.count() == 2
+
+        # Rolling back restores the manifest saved with generation 1, so b.txt is ingested again
+        assert await pipeline.rollback_index() == 1
+        assert store.count() == 1 and manifest_path.read_text() == manifest
+        assert (await pipeline.refresh_news())["added"] == 1 and store.count() == 2
+
+        stats = await pipeline.refresh_news(rebuild=True)
+        assert stats["added"] == 2 and store.count() == 2
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_default_store_is_versioned_and_rebuilds(tmp_path, embedder):
+    store = VectorStore(collection_name="gen", persist_directory=str(tmp_path / "default"))
+    assert store.backend_name == "numpy" and store.generational
+    add(store, embedder, "Markets rallied after the central bank held rates.")
+    store.begin_generation(fresh=True)
+    add(store, embedder, "Storm warnings issued along the coast.")
+    assert store.count() == 1 and store.commit_generation() == 1
+    assert store.count() == 1 and len(store.lexical_search("storm")) == 1
+
+    chroma = VectorStore(collection_name="gen", persist_directory=str(tmp_path / "chroma"), backend="chroma")
+    try:
+        chroma.begin_generation(fresh=True)
+        raise AssertionError("a Chroma rebuild should be refused")
+    except ValueError:
+        assert not chroma.building
+
+
+def test_a_refresh_with_nothing_to_do_keeps_the_generation_and_its_files(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Markets rallied after the central bank held rates.")
+    store = VectorStore(collection_name="gen", persist_directory=str(tmp_path / "store"), backend="numpy")
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[], llm_client=object())
+
+    async def scenario():
+        await pipeline.refresh_news()
+        vectors = store.generations.path(1) / "backend" / "vectors.npy"
+        written = vectors.stat().st_ino, vectors.stat().st_mtime_ns
+        version = pipeline.corpus_version
+
+        stats = await pipeline.refresh_news()
+        assert stats["added"] == stats["deleted"] == 0
+        assert store.generation == 1 and store.list_generations() == [1] and not store.building
+        assert (vectors.stat().st_ino, vectors.stat().st_mtime_ns) == written
+        assert not store.generations.path(2).exists() and pipeline.corpus_version == version
+
+        # A clean backend is not rewritten by flush
+        store.backend.flush()
+        assert (vectors.stat().st_ino, vectors.stat().st_mtime_ns) == written
+        await pipeline.close()
+
+    asyncio.run(scenario())
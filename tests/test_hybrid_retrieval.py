@@ -0,0 +1,86 @@
+import os
+
+from langchain_core.documents import Document
+
+from src.lexical_index import BM25Index, tokenize
+from src.retriever import RAGRetriever, reciprocal_rank_fusion
+from src.vectorstore import VectorStore, chunk_id
+
+
+def test_bm25_index_updates_and_persists(tmp_path):
+    assert tokenize("BRK.B closed at $412 on 2024-05-22") == ["brk.b", "closed", "412", "2024-05-22"]
+
+    index = BM25Index(str(tmp_path / "bm25.json"))
+    index.add(["a", "b", "c"], [
+        "Nvidia shares jumped after earnings",
+        "Storm warnings issued along the coast",
+        "Nvidia and AMD chip exports restricted",
+    ])
+    assert [doc_id for doc_id, _ in index.search("nvidia earnings")] == ["a", "c"]
+
+    index.add(["a"], ["Markets closed flat"])
+    index.remove(["c"])
+    assert index.search("nvidia") == []
+    index.save()
+
+    reloaded = BM25Index(str(tmp_path / "bm25.json"))
+    assert len(reloaded) == 2
+    assert [doc_id for doc_id, _ in reloaded.search("storm coast")] == ["b"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]], k=60)
+    assert fused[0][0] == "y"
+    assert {doc_id for doc_id, _ in fused} == {"x", "y", "z", "w"}
+
+
+def test_hybrid_retrieval_finds_exact_terms(tmp_path, embedder):
+    docs = [Document(page_content=f"General market update number {i} with no particular company named",
+                     metadata={"source": f"update_{i}.txt"}) for i in range(40)]
+    docs.append(Document(page_content="TSLA deliveries beat estimates on 2024-07-02", metadata={"source": "tsla.txt"}))
+    store = VectorStore(collection_name="test_hybrid", persist_directory=str(tmp_path / "store"))
+    store.add_documents(docs, embedder.generate_embeddings([d.page_content for d in docs]))
+    store.flush()
+    target = chunk_id(docs[-1])
+
+    retriever = RAGRetriever(store, embedder, mode="hybrid")
+    query = "TSLA deliveries 2024-07-02"
+    vector_ids = [doc["id"] for doc in retriever.retrieve(query, top_k=3, score_threshold=-1.0, mode="vector")]
+    hybrid = retriever.retrieve(query, top_k=3, score_threshold=-1.0)
+    assert target not in vector_ids
+    hit = next(doc for doc in hybrid if doc["id"] == target)
+    assert hit["bm25_score"] > 0 and hit["content"].startswith("TSLA")
+
+    lexical = retriever.retrieve("tsla", top_k=3, mode="lexical")
+    assert [doc["id"] for doc in lexical] == [target]
+
+    # A store opened without its BM25 file rebuilds it from the collection
+    os.remove(tmp_path / "store" / "test_hybrid_bm25.json")
+    reopened = VectorStore(collection_name="test_hybrid", persist_directory=str(tmp_path / "store"))
+    assert reopened.lexical_search("tsla", top_k=1)[0][0] == target
+
+
+def test_hybrid_legs_fetch_candidate_depth_once(tmp_path, embedder):
+    docs = [Document(page_content=f"Market update number {i}", metadata={"source": f"update_{i}.txt"})
+            for i in range(100)]
+    store = VectorStore(collection_name="test_hybrid", persist_directory=str(tmp_path / "store"))
+    store.add_documents(docs, embedder.generate_embeddings([d.page_content for d in docs]))
+    index = store.snapshot()
+    depths = []
+    backend_query, lexical_search = index.backend.query, index.lexical_index.search
+    index.backend.query = lambda embeddings, n_results, **kwargs: (
+        depths.append(("vector", n_results)) or backend_query(embeddings, n_results, **kwargs))
+    index.lexical_index.search = lambda query, top_k=5, **kwargs: (
+        depths.append(("bm25", top_k)) or lexical_search(query, top_k=top_k, **kwargs))
+
+    retriever = RAGRetriever(store, embedder, mode="hybrid", candidate_depth=4)
+    for recency_half_life_hours in (None, 12):
+        depths.clear()
+        hits = retriever.retrieve("market update", top_k=2, recency_half_life_hours=recency_half_life_hours)
+        # Recency re-scores top_k * candidate_depth fused candidates; each leg still fetches only that many
+        assert len(hits) == 2 and sorted(depths) == [("bm25", 8), ("vector", 8)]
+
+    depths.clear()
+    retriever.search_batch(["market update", "update number"], embedder.generate_embeddings(["a", "b"]), top_k=2,
+                           recency_half_life_hours=12)
+    assert ("vector", 8) in depths and all(depth == 8 for _, depth in depths)
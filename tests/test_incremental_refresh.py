@@ -0,0 +1,71 @@
+import asyncio
+
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+
+
+def make_pipeline(tmp_path, embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    store = VectorStore(collection_name="test_refresh", persist_directory=str(tmp_path / "store"))
+    pipeline = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[])
+    return pipeline, data_dir, store, embedder
+
+
+def test_refresh_only_embeds_new_or_changed_chunks(tmp_path, embedder):
+    pipeline, data_dir, store, embedder = make_pipeline(tmp_path, embedder)
+    (data_dir / "a.txt").write_text("Markets rallied after the central bank held rates.")
+    (data_dir / "b.txt").write_text("Storm warnings issued along the coast.")
+
+    asyncio.run(pipeline.refresh_news())
+    assert store.count() == 2
+    assert embedder.encoded == 2
+
+    # Nothing changed: no embedding work and no growth
+    stats = asyncio.run(pipeline.refresh_news())
+    assert stats["added"] == 0 and stats["skipped_files"] == 2
+    assert embedder.encoded == 2
+    assert store.count() == 2
+
+    # Changed file replaces its chunk, removed file drops its chunk
+    (data_dir / "a.txt").write_text("Markets fell sharply after the surprise rate rise.")
+    (data_dir / "b.txt").unlink()
+    asyncio.run(pipeline.refresh_news())
+    assert embedder.encoded == 3
+    assert store.get()["documents"] == ["Markets fell sharply after the surprise rate rise."]
+
+
+def test_manifest_survives_restart(tmp_path, embedder):
+    pipeline, data_dir, store, embedder = make_pipeline(tmp_path, embedder)
+    (data_dir / "a.txt").write_text("Election results due tonight.")
+    asyncio.run(pipeline.refresh_news())
+
+    restarted = NewsPipeline(store, embedder, data_directory=str(data_dir), sources=[])
+    asyncio.run(restarted.refresh_news())
+    assert embedder.encoded == 1
+    assert store.count() == 1
+
+
+def test_failed_batch_only_fails_its_file(tmp_path, embedder):
+    pipeline, data_dir, store, embedder = make_pipeline(tmp_path, embedder)
+    pipeline.ingestion.batch_size = 1
+    (data_dir / "good.txt").write_text("Rail strike called off.")
+    (data_dir / "bad.txt").write_text("POISON chunk that fails to embed.")
+
+    generate = embedder.generate_embeddings
+
+    def flaky(texts, **kwargs):
+        if any("POISON" in t for t in texts):
+            raise RuntimeError("encoder crashed")
+        return generate(texts, **kwargs)
+
+    embedder.generate_embeddings = flaky
+    stats = asyncio.run(pipeline.refresh_news())
+    assert stats["added"] == 1 and stats["failed"] == 1
+    assert set(pipeline.manifest.known_paths()) == {str(data_dir / "good.txt")}
+
+    # The failed file is retried on the next refresh, the good one is skipped
+    embedder.generate_embeddings = generate
+    stats = asyncio.run(pipeline.refresh_news())
+    assert stats["added"] == 1 and stats["skipped_files"] == 1
+    assert store.count() == 2
@@ -0,0 +1,111 @@
+import asyncio
+import gc
+import logging
+import threading
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.batching import EmbeddingBatcher
+from src.execution import ExecutionLayer
+from src.metrics import MetricsRegistry, REGISTRY, stage_timer
+from src.pipeline import NewsPipeline
+from src.utils.logging_config import JsonFormatter
+from src.vectorstore import VectorStore
+
+
+def test_render_and_stage_timer():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    errors = registry.counter("test_errors", "Errors", ["stage"])
+    latency.observe(0.1, stage="embed")
+    latency.observe(0.5, stage="embed")
+    errors.inc(stage="embed")
+    text = registry.render()
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="embed",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="embed",le="+Inf"} 2' in text
+    assert 'test_seconds_count{stage="embed"} 2' in text
+    assert 'test_errors_total{stage="embed"} 1' in text
+
+    try:
+        with stage_timer("test_failing_stage", batch_size=3):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    text = REGISTRY.render()
+    assert 'newsrag_stage_errors_total{stage="test_failing_stage"} 1' in text
+    assert 'newsrag_batch_size_count{stage="test_failing_stage"} 1' in text
+
+
+def test_collectors_are_dropped_with_their_owner():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("test_depth", "Depth")
+
+    class Owner:
+        def collect(self):
+            gauge.set(7)
+
+    owner = Owner()
+    registry.register_collector(owner.collect)
+    assert "test_depth 7" in registry.render()
+    del owner
+    gc.collect()
+    registry.render()
+    assert registry._collectors == []
+
+
+class CountingEmbeddingManager:
+    def generate_embeddings(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def cache_stats(self):
+        return {"query_hits": 3, "query_misses": 1, "document_hits": 0, "document_misses": 0}
+
+
+def test_metrics_endpoint_reports_pipeline_state(tmp_path):
+    store = VectorStore(collection_name="test_metrics", persist_directory=str(tmp_path / "store"), backend="numpy")
+    pipeline = NewsPipeline(store, CountingEmbeddingManager(), data_directory=str(tmp_path), sources=[],
+                            llm_client=object(), dedup_threshold=None)
+    asyncio.run(pipeline.refresh_news())
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'newsrag_cache_hit_ratio{cache="query_embedding"} 0.75' in response.text
+    assert 'newsrag_queue_depth{queue="query_embed"} 0' in response.text
+    assert 'newsrag_refresh_seconds_count{status="ok"}' in response.text
+    asyncio.run(pipeline.close())
+    # A closed pipeline no longer reports
+    assert all(reference() != pipeline._collect_metrics for reference in REGISTRY._collectors)
+
+
+def test_queue_depths_count_calls_waiting_for_a_thread():
+    execution = ExecutionLayer(cpu_workers=1, limits={"blocking": 3})
+    batcher = EmbeddingBatcher(CountingEmbeddingManager(), execution, max_wait_ms=50)
+    release = threading.Event()
+
+    async def scenario():
+        calls = [asyncio.ensure_future(execution.run_cpu("blocking", release.wait)) for _ in range(3)]
+        queries = [asyncio.ensure_future(batcher.embed(text)) for text in ("a", "b")]
+        await asyncio.sleep(0.01)
+        # One call runs on the only CPU thread, two wait for it; both queries wait for their batch
+        assert execution.queue_depth("cpu") == 2 and execution.queue_depth("io") == 0
+        assert batcher.pending() == 2
+        release.set()
+        await asyncio.gather(*calls, *queries)
+        assert execution.queue_depth("cpu") == 0 and batcher.pending() == 0
+
+    asyncio.run(scenario())
+    execution.shutdown()
+
+
+def test_json_log_lines_carry_extra_fields():
+    record = logging.LogRecord("src.metrics", logging.DEBUG, __file__, 1, "stage %s took %.2f ms",
+                               ("embed", 1.5), None)
+    record.stage = "embed"
+    record.batch_size = 8
+    line = JsonFormatter().format(record)
+    assert '"message": "stage embed took 1.50 ms"' in line
+    assert '"stage": "embed"' in line and '"batch_size": 8' in line
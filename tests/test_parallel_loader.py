@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.data_ingestion import ParallelDocumentLoader, list_local_files
+from src.manifest import IngestionManifest
+
+
+def write_files(directory, count):
+    directory.mkdir(exist_ok=True)
+    for i in range(count):
+        (directory / f"story_{i:02d}.txt").write_text(f"Story number {i} about the coast.")
+    return list_local_files(directory)
+
+
+class CountingPool(ThreadPoolExecutor):
+    """Thread pool standing in for the process pool that records how many loads were submitted"""
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.submitted = 0
+        self.lock = threading.Lock()
+
+    def submit(self, *args, **kwargs):
+        with self.lock:
+            self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_process_pool_loads_every_file_and_isolates_a_failing_one(tmp_path):
+    write_files(tmp_path / "files", 9)
+    (tmp_path / "files" / "broken.pdf").write_bytes(b"not a pdf")
+    paths = list_local_files(tmp_path / "files")
+    loader = ParallelDocumentLoader(max_workers=2, min_parallel_files=4)
+    try:
+        loaded = {os.path.basename(result.path): result for result in loader.iter_load(paths)}
+        assert loader._pool is not None   # loaded by the worker processes
+        assert len(loaded) == 10
+        assert loaded["broken.pdf"].error and loaded["broken.pdf"].documents == []
+        assert loaded["story_03.txt"].error is None
+        assert loaded["story_03.txt"].documents[0].page_content == "Story number 3 about the coast."
+
+        async def aload():
+            return [result async for result in loader.aload(paths)]
+
+        assert sorted(result.path for result in asyncio.run(aload())) == sorted(map(str, paths))
+    finally:
+        loader.shutdown()
+
+
+def test_at_most_max_in_flight_files_are_submitted_ahead_of_the_consumer(tmp_path):
+    paths = write_files(tmp_path / "files", 20)
+    loader = ParallelDocumentLoader(max_workers=2, min_parallel_files=4, max_in_flight=3)
+    loader._pool = pool = CountingPool()
+    try:
+        results = loader.iter_load(paths)
+        next(results)
+        time.sleep(0.1)
+        # The consumer stopped after one file: only the in-flight window was submitted
+        assert pool.submitted <= 3 + 1
+        assert len(list(results)) == 19 and pool.submitted == 20
+
+        async def consume_slowly():
+            pool.submitted = 0
+            seen = 0
+            async for _ in loader.aload(paths):
+                seen += 1
+                assert pool.submitted <= seen + 3
+                await asyncio.sleep(0.005)
+            return seen
+
+        assert asyncio.run(consume_slowly()) == 20 and pool.submitted == 20
+    finally:
+        loader.shutdown()
+
+
+def test_files_with_an_unchanged_mtime_and_size_are_skipped(tmp_path):
+    paths = write_files(tmp_path / "files", 3)
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    loader = ParallelDocumentLoader(max_workers=1, manifest=manifest)
+    assert [path for path, _ in loader.changed_files(paths)] == paths
+
+    for path in paths:
+        manifest.update_file(str(path), path.stat(), [f"chunk_{path.name}"])
+    assert loader.changed_files(paths) == []
+
+    # A new modification time (even with the same size) makes a file load again
+    stat = paths[1].stat()
+    os.utime(paths[1], (stat.st_atime, stat.st_mtime + 10))
+    assert [path for path, _ in loader.changed_files(paths)] == [paths[1]]
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+from src.filters import MetadataFilter
+from src.partitions import PartitionedBackend
+from src.vector_backends import normalize_rows
+
+DAY = 86400
+NOW = 1_717_200_000.0  # fixed clock, 2024-06-01
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def add_days(backend, days, per_day, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    added = {}
+    for day in days:
+        ids = [f"d{day}_{i}" for i in range(per_day)]
+        vectors = normalize_rows(rng.standard_normal((per_day, dim)))
+        metadatas = [{"source": "BBC", "published_at": NOW - day * DAY + 60 * i} for i in range(per_day)]
+        backend.upsert(ids, vectors, metadatas, [f"story {i} from {day} days ago" for i in range(per_day)])
+        added.update(zip(ids, zip(vectors, metadatas)))
+    return added
+
+
+def test_time_filters_prune_partitions(tmp_path):
+    clock = Clock(NOW)
+    backend = PartitionedBackend(str(tmp_path / "parts"), clock=clock, mode="exact")
+    add_days(backend, days=range(1, 11), per_day=5)
+    backend.flush()
+    assert len(backend.partitions()) == 10
+
+    query = normalize_rows(np.ones((1, 8)))
+    backend.query(query, n_results=3)
+    assert backend.last_partitions_searched == 10
+
+    results = backend.query(query, n_results=3, filters=MetadataFilter(since=NOW - 2 * DAY, last_hours=None))
+    assert backend.last_partitions_searched <= 3
+    assert all(m["published_at"] >= NOW - 2 * DAY for m in results["metadatas"][0])
+
+    # Reopening reads partitions.json and every partition back
+    reopened = PartitionedBackend(str(tmp_path / "parts"), clock=clock, mode="exact")
+    assert reopened.count() == 50
+    assert reopened.query(query, n_results=3)["ids"] == backend.query(query, n_results=3)["ids"]
+
+
+def test_retention_archives_and_compaction_merges(tmp_path):
+    clock = Clock(NOW)
+    backend = PartitionedBackend(str(tmp_path / "parts"), clock=clock, retention_days=7,
+                                 archive_directory=str(tmp_path / "archive"), min_partition_size=12,
+                                 dedup_threshold=0.99, mode="exact")
+    added = add_days(backend, days=range(1, 11), per_day=4)
+    # A near-identical copy of an existing chunk, published the same day
+    vector, metadata = added["d2_0"]
+    backend.upsert(["d2_copy"], [vector * 1.0001], [dict(metadata, published_at=metadata["published_at"] + 1)], ["copy"])
+    # The same story carried by another outlet keeps its copy
+    backend.upsert(["d2_syndicated"], [vector * 1.0002],
+                   [dict(metadata, source="Reuters", published_at=metadata["published_at"] + 2)], ["syndicated"])
+    backend.flush()
+
+    removed = backend.maintain()
+    # Days 8-10 ended more than 7 days ago
+    assert len(removed["expired"]) == 12
+    assert len(os.listdir(tmp_path / "archive")) == 3
+    assert removed["deduplicated"] == ["d2_copy"]
+    assert backend.count() == 29
+    reuters = backend.query([vector], n_results=1, filters=MetadataFilter.from_params(sources=["Reuters"]))
+    assert reuters["ids"] == [["d2_syndicated"]]
+
+    # Closed days of 4 chunks are merged three at a time (12 = min_partition_size)
+    sizes = [p["count"] for p in backend.partitions()]
+    assert sum(sizes) == 29 and len(sizes) < 7
+    assert max(sizes) <= 12
+
+    reopened = PartitionedBackend(str(tmp_path / "parts"), clock=clock, mode="exact")
+    assert reopened.count() == 29
+    assert sorted(os.listdir(tmp_path / "parts")) == sorted([p["name"] for p in backend.partitions()] + ["partitions.json"])
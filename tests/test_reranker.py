@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import sentence_transformers
+from langchain_core.documents import Document
+
+from src.pipeline import NewsPipeline
+from src.reranker import CrossEncoderReranker
+from src.retriever import RAGRetriever
+from src.vectorstore import VectorStore
+
+
+class OverlapCrossEncoder:
+    """Scores a pair by the share of query words found in the passage"""
+    loaded = 0
+
+    def __init__(self, model_name=None, delay=0.0, **kwargs):
+        OverlapCrossEncoder.loaded += 1
+        self.delay = delay
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        time.sleep(self.delay)
+        return np.array([len(set(q.split()) & set(p.split())) / len(q.split()) for q, p in pairs])
+
+
+def docs(*texts):
+    return [{"id": str(i), "content": text, "rank": i + 1} for i, text in enumerate(texts)]
+
+
+def test_rerank_orders_by_cross_encoder_and_loads_lazily(monkeypatch):
+    monkeypatch.setattr(sentence_transformers, "CrossEncoder", OverlapCrossEncoder)
+    OverlapCrossEncoder.loaded = 0
+    reranker = CrossEncoderReranker("stub", latency_budget_ms=None)
+    assert OverlapCrossEncoder.loaded == 0
+
+    ranked = reranker.rerank("rate cut fed", docs("weather warning", "fed holds", "fed rate cut"), top_k=2)
+    assert [d["content"] for d in ranked] == ["fed rate cut", "fed holds"]
+    assert ranked[0]["rerank_score"] == 1.0 and ranked[0]["rank"] == 1
+    reranker.rerank("fed", docs("fed"))
+    assert OverlapCrossEncoder.loaded == 1
+
+
+def test_over_budget_falls_back_to_retrieval_order():
+    model = OverlapCrossEncoder(delay=0.05)
+    reranker = CrossEncoderReranker(model=model, batch_size=2, latency_budget_ms=30)
+    candidates = docs("a", "b", "fed", "c", "d", "fed fed")
+    ranked = reranker.rerank("fed", candidates, top_k=3)
+    assert ranked == candidates[:3]
+    # The remaining batches are skipped once the budget is gone
+    assert model.calls == [2]
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_concurrent_calls_share_model_batches():
+    model = OverlapCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, batch_size=64, max_wait_ms=100, latency_budget_ms=None)
+    results = {}
+
+    def run(i):
+        results[i] = reranker.rerank(f"q{i}", docs(f"q{i} match", "other"))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results[i][0]["content"] == f"q{i} match" for i in range(4))
+    assert len(model.calls) < 4 and sum(model.calls) == 8
+
+
+class UniformEmbeddingManager:
+    def generate_embeddings(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32) + np.arange(len(texts))[:, None] * 0.01
+
+
+def test_retriever_reranks_deeper_candidate_set(tmp_path):
+    texts = [f"filler story {i}" for i in range(9)] + ["fed rate cut announced"]
+    store = VectorStore(collection_name="test_rerank", persist_directory=str(tmp_path / "store"), backend="numpy")
+    embedder = UniformEmbeddingManager()
+    store.add_documents([Document(page_content=t, metadata={"source": "s"}) for t in texts],
+                        embedder.generate_embeddings(texts))
+    model = OverlapCrossEncoder()
+    retriever = RAGRetriever(store, embedder, reranker=CrossEncoderReranker(model=model, latency_budget_ms=None),
+                             rerank_candidates=10)
+    hits = retriever.retrieve("fed rate cut", top_k=2, mode="vector")
+    assert hits[0]["content"] == "fed rate cut announced"
+    assert model.calls == [10]
+
+
+class LogitCrossEncoder:
+    """Returns a fixed raw logit per passage, like cross-encoders without a sigmoid"""
+    def __init__(self, logits):
+        self.logits = logits
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        return np.array([self.logits[passage] for _, passage in pairs])
+
+
+def test_recency_and_mmr_scale_raw_cross_encoder_logits(tmp_path, keyed_embedder):
+    now = time.time()
+    vectors = {"fed cuts rates": [1.0, 0.0], "fed cuts rates again": [1.0, 0.0], "jobs report": [0.6, 0.8],
+               "weather": [0.0, 1.0], "fed": [1.0, 0.0]}
+    published = {"fed cuts rates": now - 96 * 3600, "fed cuts rates again": now, "jobs report": now, "weather": now}
+    embedder = keyed_embedder(vectors)
+    store = VectorStore(collection_name="test_rerank", persist_directory=str(tmp_path / "store"), backend="numpy")
+    texts = list(published)
+    store.add_documents([Document(page_content=t, metadata={"source": "s", "published_at": published[t]})
+                         for t in texts], embedder.generate_embeddings(texts))
+    reranker = CrossEncoderReranker(model=LogitCrossEncoder(
+        {"fed cuts rates": -1.0, "fed cuts rates again": -1.2, "jobs report": -2.0, "weather": -6.0}),
+        latency_budget_ms=None)
+
+    # Negative logits times a recency weight below 1 would rank the 4-day-old chunk first
+    retriever = RAGRetriever(store, embedder, reranker=reranker, rerank_candidates=4)
+    hits = retriever.retrieve("fed", top_k=1, mode="vector", recency_half_life_hours=12)
+    assert [hit["content"] for hit in hits] == ["fed cuts rates again"]
+
+    # On the logit scale relevance swamps redundancy; scaled to [0, 1], MMR picks the distinct chunk
+    retriever = RAGRetriever(store, embedder, reranker=reranker, rerank_candidates=4, mmr_lambda=0.5)
+    hits = retriever.retrieve("fed", top_k=2, mode="vector")
+    assert [hit["content"] for hit in hits] == ["fed cuts rates", "jobs report"]
+
+
+def test_budget_holds_while_the_scorer_works_on_another_callers_pairs():
+    model = OverlapCrossEncoder(delay=0.05)
+    reranker = CrossEncoderReranker(model=model, batch_size=2, max_wait_ms=50, latency_budget_ms=None)
+    timings = {}
+
+    def run(name, passages, budget):
+        started = time.perf_counter()
+        result = reranker.score("fed", passages, latency_budget_ms=budget)
+        timings[name] = (time.perf_counter() - started, result)
+
+    # Both callers land in one batch and the tight-budget caller's pair is in the first model batch;
+    # the other caller's four remaining model batches must not hold it past its budget
+    tight = threading.Thread(target=run, args=("tight", ["fed"], 150))
+    tight.start()
+    time.sleep(0.005)
+    patient = threading.Thread(target=run, args=("patient", ["other"] * 8, 10000))
+    patient.start()
+    tight.join()
+    elapsed, scores = timings["tight"]
+    assert elapsed < 0.15 and list(scores) == [1.0]
+    patient.join()
+    assert len(timings["patient"][1]) == 8
+
+    # A single call whose only model batch overruns its budget gets None, not late scores
+    assert reranker.score("fed", ["fed"], latency_budget_ms=30) is None
+
+
+def test_pipeline_reranks_on_the_cpu_pool_after_an_io_lookup(tmp_path, embedder, fake_llm):
+    texts = ["fed rate cut announced", "storm on the coast", "league final"]
+    store = VectorStore(collection_name="test_rerank", persist_directory=str(tmp_path / "store"), backend="numpy")
+    store.add_documents([Document(page_content=t, metadata={"source": "s"}) for t in texts],
+                        embedder.generate_embeddings(texts))
+    reranker = CrossEncoderReranker(model=OverlapCrossEncoder(), latency_budget_ms=None)
+    pipeline = NewsPipeline(store, embedder, data_directory=str(tmp_path), sources=[], llm_client=fake_llm,
+                            reranker=reranker, mmr_lambda=0.5, dedup_threshold=None)
+    threads = {}
+    retriever = pipeline.retriever
+    for stage in ("lookup", "rank"):
+        def record(*args, _stage=stage, _method=getattr(retriever, stage), **kwargs):
+            threads[_stage] = threading.current_thread().name
+            return _method(*args, **kwargs)
+        setattr(retriever, stage, record)
+
+    result = asyncio.run(pipeline.query_news("fed rate cut", 2))
+    assert result["articles"][0]["content"] == "fed rate cut announced"
+    # Index lookups are I/O; the cross-encoder and MMR hold a CPU slot like query encoding
+    assert threads["lookup"].startswith("newsrag-io") and threads["rank"].startswith("newsrag-cpu")
+    asyncio.run(pipeline.close())
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+import src.api.main as api
+from src.mcp.server import NewsServer
+from src.pipeline import NewsPipeline
+from src.serialization import available_encodings, decode, encode, negotiate, parse_fields, project
+from src.vectorstore import VectorStore
+
+needs_msgpack = pytest.mark.skipif("msgpack" not in available_encodings(),
+                                   reason="ormsgpack or msgpack is not installed")
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(frame)
+
+
+def make_pipeline(tmp_path, embedder, llm):
+    store = VectorStore(collection_name="serialization", persist_directory=str(tmp_path), backend="numpy")
+    texts = ["Storm warnings issued along the coast.", "The league title race went to the final day."]
+    store.add_documents([Document(page_content=t, metadata={"source": "BBC", "title": t[:10]}) for t in texts],
+                        embedder.generate_embeddings(texts))
+    return NewsPipeline(store, embedder, data_directory=str(tmp_path), sources=[], llm_client=llm,
+                        dedup_threshold=None)
+
+
+def test_negotiation_and_field_projection():
+    assert negotiate(None) == "json" and negotiate("*/*") == "json"
+    assert negotiate("application/msgpack;q=0.2, application/json") == "json"
+    assert parse_fields(["score", "id,metadata.source"]) == ("id", "metadata.source", "score")
+    assert parse_fields("") is None
+
+    result = {"summary": "s", "articles": [{"id": "a", "content": "long text", "similarity_score": np.float32(0.5),
+                                            "metadata": {"source": "BBC", "url": "u"}}]}
+    projected = project(result, parse_fields("id,similarity_score,metadata.source"))
+    assert projected["articles"] == [{"id": "a", "similarity_score": 0.5, "metadata": {"source": "BBC"}}]
+    assert projected["summary"] == "s" and "content" in result["articles"][0]
+    assert json.loads(encode(projected)) == projected
+
+
+@needs_msgpack
+def test_msgpack_round_trip():
+    assert negotiate("application/json;q=0.5, application/msgpack") == "msgpack"
+    assert decode(encode({"articles": [{"id": "a", "rank": 1}]}, "msgpack"), "msgpack") == {
+        "articles": [{"id": "a", "rank": 1}]}
+
+
+@needs_msgpack
+def test_http_query_negotiates_msgpack_and_serves_cached_bytes(tmp_path, embedder, fake_llm):
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm)
+    api.pipeline = pipeline
+    client = TestClient(api.app)
+    try:
+        body = {"query": "storm coast", "top_k": 2, "fields": ["id", "metadata.source"]}
+        response = client.post("/api/query", json=body, headers={"Accept": "application/msgpack"})
+        assert response.status_code == 200 and response.headers["content-type"] == "application/msgpack"
+        result = decode(response.content, "msgpack")
+        assert result["query"] == "storm coast" and len(result["articles"]) == 2
+        assert all(set(article) == {"id", "metadata"} and article["metadata"] == {"source": "BBC"}
+                   for article in result["articles"])
+
+        plain = client.post("/api/query", json={"query": "storm coast", "top_k": 2})
+        assert plain.headers["content-type"] == "application/json"
+        assert "content" in plain.json()["articles"][0]
+        assert pipeline.llm.calls == 1   # both served from the answer cache after the first
+
+        # The schema documents both encodings instead of promising a validated JSON body
+        documented = client.get("/openapi.json").json()["paths"]["/api/query"]["post"]["responses"]["200"]
+        assert set(documented["content"]) == {"application/json", "application/msgpack"}
+
+        # A repeated query in the same format reuses the bytes stored with the cached answer
+        async def payloads():
+            return [await pipeline.query_news_payload("storm coast", 2, encoding="msgpack") for _ in range(2)]
+
+        first, second = asyncio.run(payloads())
+        assert first is second
+    finally:
+        api.pipeline = None
+        asyncio.run(pipeline.close())
+
+
+@needs_msgpack
+def test_news_server_configures_encoding_and_sends_the_cache_serialized_once(tmp_path, embedder, fake_llm):
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm)
+
+    async def scenario():
+        server = NewsServer(pipeline)
+        await pipeline.query_news("storm coast", 5)
+        sockets = [FakeWebSocket() for _ in range(2)]
+        for websocket in sockets:
+            server.clients[websocket] = server.hub.connect(websocket.send)
+            await server.send_cache(websocket)
+        assert sockets[0].frames[0] is sockets[1].frames[0]
+        assert list(json.loads(sockets[0].frames[0])["data"]) == ["storm coast"]
+
+        websocket = sockets[0]
+        await server.process_message(websocket, json.dumps(
+            {"type": "configure", "encoding": "msgpack", "fields": "id,rank"}))
+        configured = decode(websocket.frames[-1], "msgpack")
+        assert configured["data"]["encoding"] == "msgpack" and configured["data"]["fields"] == ["id", "rank"]
+
+        await server.process_message(websocket, encode({"type": "query", "query": "storm coast"}, "msgpack"))
+        reply = decode(websocket.frames[-1], "msgpack")
+        assert reply["type"] == "query_result" and set(reply["data"]["articles"][0]) == {"id", "rank"}
+
+        await server.process_message(websocket, json.dumps(
+            {"type": "query", "query": "storm coast", "recency_half_life_hours": 0}))
+        assert decode(websocket.frames[-1], "msgpack") == {
+            "type": "error", "data": "recency_half_life_hours must be positive"}
+        for websocket in sockets:
+            server.hub.disconnect(server.clients.pop(websocket))
+        await pipeline.close()
+
+    asyncio.run(scenario())
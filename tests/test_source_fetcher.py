@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from src.data_ingestion import NewsSource, SourceFetcher, aprocess_all_docs, process_all_docs
+
+PAGE = b"<html><body><h3>Storm hits coast</h3><h3>Markets rally</h3><h2>Ignored</h2></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        StubHandler.requests.append((self.path, time.monotonic(), self.headers.get("If-None-Match")))
+        if self.path == "/slow":
+            # The client gives up long before this; just drop the connection
+            time.sleep(1)
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_fetches_sources_concurrently_and_skips_unchanged(stub_server):
+    sources = [
+        NewsSource(name="A", url=f"{stub_server}/a"),
+        NewsSource(name="B", url=f"{stub_server}/b"),
+        NewsSource(name="Broken", url=f"{stub_server}/missing"),
+    ]
+
+    async def run():
+        fetcher = SourceFetcher(sources, min_host_interval=0)
+        try:
+            first = await fetcher.fetch_all()
+            second = await fetcher.fetch_all()
+        finally:
+            await fetcher.aclose()
+        return fetcher, first, second
+
+    fetcher, first, second = asyncio.run(run())
+    assert sorted((d.metadata["source"], d.page_content) for d in first) == [
+        ("A", "Markets rally"), ("A", "Storm hits coast"),
+        ("B", "Markets rally"), ("B", "Storm hits coast"),
+    ]
+    assert second == []
+    assert fetcher.not_modified == 2
+
+
+def test_timeout_and_per_host_spacing(stub_server):
+    sources = [
+        NewsSource(name="Slow", url=f"{stub_server}/slow", timeout=0.2),
+        NewsSource(name="A", url=f"{stub_server}/a"),
+        NewsSource(name="B", url=f"{stub_server}/b"),
+    ]
+    starts = []
+
+    async def record(request):
+        starts.append(time.monotonic())
+
+    async def run():
+        client = httpx.AsyncClient(event_hooks={"request": [record]})
+        fetcher = SourceFetcher(sources, per_host_concurrency=3, min_host_interval=0.1, client=client)
+        try:
+            return await fetcher.fetch_all()
+        finally:
+            await fetcher.aclose()
+
+    docs = asyncio.run(run())
+    assert {d.metadata["source"] for d in docs} == {"A", "B"}
+    assert len(starts) == 3
+    assert all(b - a >= 0.09 for a, b in zip(starts, starts[1:]))
+
+
+def test_process_all_docs_loads_files_and_fetches_sources(stub_server, tmp_path):
+    (tmp_path / "a.txt").write_text("Election results due tonight.")
+    sources = [NewsSource(name="A", url=f"{stub_server}/a"), NewsSource(name="Broken", url=f"{stub_server}/missing")]
+
+    documents = process_all_docs(str(tmp_path), sources=sources)
+    assert [(d.metadata["source"], d.page_content) for d in documents] == [
+        (str(tmp_path / "a.txt"), "Election results due tonight."),
+        ("A", "Storm hits coast"), ("A", "Markets rally"),
+    ]
+    assert process_all_docs(str(tmp_path / "missing"), sources=sources) == []
+
+    async def from_a_loop():
+        with pytest.raises(RuntimeError, match="aprocess_all_docs"):
+            process_all_docs(str(tmp_path), sources=sources)
+        return await aprocess_all_docs(str(tmp_path), sources=sources)
+
+    assert sorted(d.page_content for d in asyncio.run(from_a_loop())) == sorted(d.page_content for d in documents)
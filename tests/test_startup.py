@@ -0,0 +1,85 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from src.lazy import Lazy
+from src.pipeline import NewsPipeline
+from src.vectorstore import VectorStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_lazy_builds_once_and_retries_failures():
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    value = Lazy(slow_factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(value.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(r) for r in results}) == 1
+    assert value.ready and value.status()["init_seconds"] > 0
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("not yet")
+        return "ok"
+
+    value = Lazy(flaky)
+    try:
+        value.get()
+    except RuntimeError:
+        pass
+    assert not value.ready and value.status()["error"] == "not yet"
+    assert value.get() == "ok"
+
+
+def test_importing_the_package_needs_no_api_key():
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    code = "import src.pipeline, src.llm_interface as l; print(l.llm_status()['ready'])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("False")
+
+
+class WarmableEmbeddingManager:
+    def __init__(self):
+        self.is_loaded = False
+
+    def warm_up(self):
+        self.is_loaded = True
+
+    def generate_embeddings(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_readiness_reports_components(tmp_path, fake_llm):
+    store = VectorStore(collection_name="test_ready", persist_directory=str(tmp_path / "store"), backend="numpy")
+    assert not store.is_loaded and not (tmp_path / "store").exists()
+    pipeline = NewsPipeline(store, WarmableEmbeddingManager(), data_directory=str(tmp_path), sources=[],
+                            llm_client=fake_llm)
+    report = pipeline.readiness()
+    assert report["ready"] is False
+    assert report["components"] == {"embedding_model": False, "vector_store": False, "llm": True}
+    assert report["refresh"]["state"] == "pending"
+
+    asyncio.run(pipeline.warm_up())
+    assert pipeline.readiness()["ready"] is True
+    asyncio.run(pipeline.refresh_news())
+    assert pipeline.readiness()["refresh"]["completed"] == 1
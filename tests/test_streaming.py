@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+import src.api.main as api
+from src.execution import ExecutionLayer
+from src.llm_interface import ERROR_RESPONSE_PREFIX
+from src.pipeline import NewsPipeline
+from src.subscriptions import SubscriptionHub
+from src.vectorstore import VectorStore
+
+
+def make_pipeline(tmp_path, embedder, llm, execution=None):
+    llm.tokens = ("Storms ", "hit ", "the coast.")
+    store = VectorStore(collection_name="streaming", persist_directory=str(tmp_path), backend="numpy")
+    texts = ["Storm warnings issued along the coast.", "The league title race went to the final day."]
+    store.add_documents([Document(page_content=t, metadata={"source": "BBC"}) for t in texts],
+                        embedder.generate_embeddings(texts))
+    return NewsPipeline(store, embedder, data_directory=str(tmp_path), sources=[],
+                        execution=execution, llm_client=llm, dedup_threshold=None)
+
+
+def sse(text):
+    """(event, data) pairs of a Server-Sent Events body"""
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_articles_then_deltas_then_the_result(tmp_path, embedder, fake_llm):
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm)
+
+    async def collect():
+        return [event async for event in pipeline.query_news_stream("storm coast", 2)]
+
+    events = asyncio.run(collect())
+    assert [event["type"] for event in events] == ["articles"] + ["summary_delta"] * 3 + ["query_result"]
+    assert len(events[0]["data"]["articles"]) == 2
+    result = events[-1]["data"]
+    assert result["summary"] == "".join(event["data"]["delta"] for event in events[1:-1]) == "Storms hit the coast."
+    assert result["articles"] == events[0]["data"]["articles"]
+
+    # The finished answer is cached and comes back as a single delta
+    events = asyncio.run(collect())
+    assert fake_llm.calls == 1
+    assert [event["type"] for event in events] == ["articles", "summary_delta", "query_result"]
+    assert events[1]["data"]["delta"] == "Storms hit the coast."
+    asyncio.run(pipeline.close())
+
+
+def test_stream_releases_the_llm_slot_before_a_slow_consumer_reads(tmp_path, embedder, fake_llm):
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm, execution=ExecutionLayer(limits={"llm": 1}))
+
+    async def scenario():
+        stream = pipeline.query_news_stream("storm coast", 2)
+        assert (await stream.__anext__())["type"] == "articles"
+        assert (await stream.__anext__())["data"]["delta"] == "Storms "
+        # The consumer stalls here; the answer finishes into the buffer and frees the only slot
+        slot = pipeline.execution.limit("llm")
+        await asyncio.wait_for(slot.acquire(), timeout=1)
+        slot.release()
+        assert fake_llm.finished == 1
+        rest = [event async for event in stream]
+        assert [event["type"] for event in rest] == ["summary_delta", "summary_delta", "query_result"]
+
+        # A consumer that goes away mid-answer stops the LLM call
+        fake_llm.tokens = ("a ",) * 50
+        pipeline.answer_cache.invalidate()
+        stream = pipeline.query_news_stream("storm coast", 2)
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        assert fake_llm.cancelled == 1
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_stream_error_is_sent_as_a_delta_and_not_cached(tmp_path, embedder, fake_llm):
+    fake_llm.fail_after = 1
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm)
+
+    async def collect():
+        return [event async for event in pipeline.query_news_stream("storm coast", 2)]
+
+    events = asyncio.run(collect())
+    deltas = [event["data"]["delta"] for event in events if event["type"] == "summary_delta"]
+    assert deltas[0] == "Storms " and deltas[-1].startswith(ERROR_RESPONSE_PREFIX)
+    assert events[-1]["type"] == "query_result" and ERROR_RESPONSE_PREFIX in events[-1]["data"]["summary"]
+    asyncio.run(collect())
+    assert fake_llm.calls == 2
+    asyncio.run(pipeline.close())
+
+
+def test_sse_and_websocket_streams(tmp_path, embedder, fake_llm):
+    pipeline = make_pipeline(tmp_path, embedder, fake_llm)
+    api.pipeline = pipeline
+    api.hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution)
+    client = TestClient(api.app)
+    try:
+        response = client.get("/api/query/stream", params={"query": "storm coast", "top_k": 2, "fields": "id"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = sse(response.text)
+        assert [name for name, _ in events] == ["articles"] + ["summary_delta"] * 3 + ["query_result"]
+        assert all(set(article) == {"id"} for article in events[-1][1]["articles"])
+
+        response = client.post("/api/query/stream", json={"query": "league title", "top_k": 1})
+        events = sse(response.text)
+        assert events[0][0] == "articles" and events[-1][0] == "query_result"
+        assert events[-1][1]["query"] == "league title"
+
+        assert client.get("/api/query/stream", params={"query": "q", "last_hours": -1}).status_code == 400
+
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "query", "query": "storm coast", "top_k": 2, "stream": True})
+            frames = [websocket.receive_json()]
+            while frames[-1]["type"] != "query_result":
+                frames.append(websocket.receive_json())
+        # Answered from the cache after the SSE stream: one delta with the whole summary
+        assert [frame["type"] for frame in frames] == ["articles", "summary_delta", "query_result"]
+        assert frames[1]["data"]["delta"] == frames[-1]["data"]["summary"] == "Storms hit the coast."
+
+        # A failure after the stream started ends it with an error event
+        async def failing_search(*args, **kwargs):
+            raise RuntimeError("index unavailable")
+
+        pipeline._search = failing_search
+        events = sse(client.get("/api/query/stream", params={"query": "new question"}).text)
+        assert events == [("error", "index unavailable")]
+    finally:
+        api.pipeline = api.hub = None
+        asyncio.run(pipeline.close())
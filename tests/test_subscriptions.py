@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+from src.pipeline import NewsPipeline
+from src.subscriptions import ClientQueue, CorpusDelta, SubscriptionHub
+from src.vectorstore import VectorStore
+
+class RecordingClient:
+    def __init__(self):
+        self.frames = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send(self, payload):
+        await self.gate.wait()
+        self.frames.append(payload)
+
+    def messages(self, kind):
+        return [json.loads(frame)["data"] for frame in self.frames if json.loads(frame)["type"] == kind]
+
+
+def test_hub_matches_new_chunks_and_serializes_each_update_once(keyword_embedder):
+    async def scenario():
+        async def embed(text):
+            return keyword_embedder.vector(text)
+
+        hub = SubscriptionHub(embed=embed)
+        clients = [RecordingClient() for _ in range(3)]
+        ids = [hub.connect(client.send) for client in clients]
+        first = await hub.subscribe(ids[0], query="interest rates", top_k=1)
+        second = await hub.subscribe(ids[1], query="interest rates", top_k=1)
+        await hub.subscribe(ids[2], topic="League")
+        assert first is second and len(hub.subscriptions) == 2
+
+        texts = ["Storm warnings along the coast.", "Bank held rates.", "The league title race."]
+        await hub.publish(CorpusDelta(4, ["a", "b", "c"], texts, [{"source": "BBC"}] * 3,
+                                      keyword_embedder.generate_embeddings(texts), deleted=1))
+        await asyncio.sleep(0)
+        assert [update["articles"][0]["id"] for update in clients[0].messages("subscription_update")] == ["b"]
+        assert clients[0].frames[0] is clients[1].frames[0]   # one serialization for both subscribers
+        assert [update["articles"][0]["id"] for update in clients[2].messages("subscription_update")] == ["c"]
+        assert clients[2].messages("corpus_update") == [{"generation": 4, "added": 3, "deleted": 1, "resync": False}]
+
+        hub.disconnect(ids[2])
+        assert len(hub.subscriptions) == 1
+        for client_id in ids[:2]:
+            hub.disconnect(client_id)
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_queue_is_bounded_and_coalesces():
+    async def scenario():
+        slow = RecordingClient()
+        slow.gate.clear()
+        queue = ClientQueue(slow.send, max_pending=3)
+        queue.start()
+        for i in range(5):
+            queue.offer(json.dumps({"type": "update", "data": i}))
+            queue.offer(json.dumps({"type": "corpus_update", "data": i}), key="corpus_update")
+        slow.gate.set()
+        await asyncio.sleep(0.01)
+        # Only the latest three were kept, corpus updates coalesced into the newest one
+        assert [json.loads(frame) for frame in slow.frames] == [
+            {"type": "dropped", "data": {"messages": 4}}, {"type": "update", "data": 3},
+            {"type": "corpus_update", "data": 4}, {"type": "update", "data": 4}]
+        assert queue.dropped == 4 and queue.coalesced == 3
+        queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_refresh_pushes_only_the_new_chunks(tmp_path, keyword_embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Storm warnings issued along the coast.")
+    store = VectorStore(collection_name="subs", persist_directory=str(tmp_path / "store"), backend="numpy")
+    pipeline = NewsPipeline(store, keyword_embedder, data_directory=str(data_dir), sources=[],
+                            llm_client=object(), dedup_threshold=None)
+
+    async def scenario():
+        hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution)
+        pipeline.add_delta_listener(hub.publish)
+        await pipeline.refresh_news()
+        client = RecordingClient()
+        client_id = hub.connect(client.send)
+        reply = await hub.handle(client_id, {"type": "subscribe", "query": "storm", "min_score": 0.9})
+        assert reply["type"] == "subscribed"
+
+        (data_dir / "b.txt").write_text("Another storm is expected to reach the coast tomorrow.")
+        await pipeline.refresh_news()
+        await asyncio.sleep(0.01)
+        updates = client.messages("subscription_update")
+        assert len(updates) == 1 and [a["content"] for a in updates[0]["articles"]] == [
+            "Another storm is expected to reach the coast tomorrow."]
+        assert updates[0]["generation"] == store.generation
+        hub.disconnect(client_id)
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_follower_reload_publishes_stored_vectors_without_embedding(tmp_path, keyword_embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Bank held rates steady.")
+    store_dir = str(tmp_path / "store")
+    leader = NewsPipeline(VectorStore(collection_name="subs", persist_directory=store_dir, backend="numpy"),
+                          keyword_embedder, data_directory=str(data_dir), sources=[],
+                          llm_client=object(), dedup_threshold=None)
+    follower = NewsPipeline(VectorStore(collection_name="subs", persist_directory=store_dir, backend="numpy",
+                                        read_only=True),
+                            keyword_embedder, data_directory=str(data_dir), sources=[],
+                            llm_client=object(), dedup_threshold=None)
+
+    async def scenario():
+        await leader.refresh_news()
+        await follower.reload_index()
+        hub = SubscriptionHub(embed=follower.query_batcher.embed, execution=follower.execution)
+        follower.add_delta_listener(hub.publish)
+        client = RecordingClient()
+        client_id = hub.connect(client.send)
+        await hub.subscribe(client_id, query="storm", min_score=0.9)
+
+        (data_dir / "b.txt").write_text("A storm is expected to reach the coast.")
+        await leader.refresh_news()
+        encoded = keyword_embedder.encoded
+        await follower.reload_index()
+        await asyncio.sleep(0.01)
+        assert keyword_embedder.encoded == encoded   # vectors came from the index
+        updates = client.messages("subscription_update")
+        assert [a["content"] for a in updates[0]["articles"]] == ["A storm is expected to reach the coast."]
+        assert client.messages("corpus_update")[-1]["added"] == 1
+        hub.disconnect(client_id)
+        await leader.close()
+        await follower.close()
+
+    asyncio.run(scenario())
+
+
+def test_refresh_past_the_delta_cap_sends_a_resync(tmp_path, keyword_embedder):
+    data_dir = tmp_path / "all_files"
+    data_dir.mkdir()
+    store = VectorStore(collection_name="subs", persist_directory=str(tmp_path / "store"), backend="numpy")
+    pipeline = NewsPipeline(store, keyword_embedder, data_directory=str(data_dir), sources=[],
+                            llm_client=object(), dedup_threshold=None)
+    pipeline.max_delta_chunks = 1
+
+    async def scenario():
+        hub = SubscriptionHub(embed=pipeline.query_batcher.embed, execution=pipeline.execution)
+        pipeline.add_delta_listener(hub.publish)
+        client = RecordingClient()
+        client_id = hub.connect(client.send)
+        await hub.subscribe(client_id, query="storm", min_score=0.5)
+        for name, text in (("a", "Storm warnings issued."), ("b", "Another storm arrives."), ("c", "Storm over.")):
+            (data_dir / f"{name}.txt").write_text(text)
+        await pipeline.refresh_news()
+        await asyncio.sleep(0.01)
+        assert client.messages("subscription_update") == []
+        assert client.messages("corpus_update") == [
+            {"generation": store.generation, "added": None, "deleted": 0, "resync": True}]
+        hub.disconnect(client_id)
+        await pipeline.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.vector_backends import ChromaBackend, NumpyBackend, normalize_rows
+
+
+def random_records(n, dim=16, seed=0, topics=None):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim))
+    if topics:
+        # Embeddings of real text cluster around topics
+        centers = rng.standard_normal((topics, dim)) * 3
+        vectors += centers[rng.integers(topics, size=n)]
+    vectors = normalize_rows(vectors)
+    ids = [f"chunk_{i}" for i in range(n)]
+    metadatas = [{"source": f"file_{i % 7}.txt"} for i in range(n)]
+    documents = [f"document {i}" for i in range(n)]
+    return ids, vectors, metadatas, documents
+
+
+def test_numpy_exact_matches_brute_force_and_persists(tmp_path):
+    ids, vectors, metadatas, documents = random_records(500)
+    backend = NumpyBackend(str(tmp_path / "index"), mode="exact")
+    backend.upsert(ids, vectors, metadatas, documents)
+    backend.delete(ids[:10])
+    backend.flush()
+
+    queries = vectors[20:25]
+    expected = np.argsort(-(vectors[10:] @ queries.T), axis=0)[:5].T + 10
+    results = backend.query(queries, n_results=5)
+    assert results["ids"] == [[ids[i] for i in row] for row in expected]
+    assert np.isclose(results["distances"][0][0], 0.0, atol=1e-5)
+
+    # A fresh instance reads the flushed files back
+    reloaded = NumpyBackend(str(tmp_path / "index"), mode="exact")
+    assert reloaded.count() == 490
+    assert reloaded.query(queries, n_results=5)["ids"] == results["ids"]
+    assert reloaded.get(["chunk_0", "chunk_42"])["documents"] == ["document 42"]
+
+
+def test_numpy_ivf_recall_against_exact(tmp_path):
+    ids, vectors, metadatas, documents = random_records(4000, dim=32, seed=1, topics=40)
+    exact = NumpyBackend(str(tmp_path / "exact"), mode="exact")
+    ivf = NumpyBackend(str(tmp_path / "ivf"), mode="ivf", n_lists=32, n_probe=8)
+    for backend in (exact, ivf):
+        backend.upsert(ids, vectors, metadatas, documents)
+        backend.flush()
+
+    queries = normalize_rows(vectors[:50] + 0.05)
+    truth = exact.query(queries, n_results=10)["ids"]
+    approx = ivf.query(queries, n_results=10)["ids"]
+    recall = np.mean([len(set(t) & set(a)) / 10 for t, a in zip(truth, approx)])
+    assert recall >= 0.9
+
+
+def test_chroma_and_numpy_agree(tmp_path):
+    ids, vectors, metadatas, documents = random_records(200)
+    chroma = ChromaBackend(str(tmp_path / "chroma"), "agree")
+    numpy_backend = NumpyBackend(str(tmp_path / "numpy"), mode="exact")
+    for backend in (chroma, numpy_backend):
+        backend.upsert(ids, vectors, metadatas, documents)
+
+    queries = vectors[:3]
+    chroma_results = chroma.query(queries, n_results=3)
+    numpy_results = numpy_backend.query(queries, n_results=3)
+    assert chroma_results["ids"] == numpy_results["ids"]
+    assert np.allclose(chroma_results["distances"], numpy_results["distances"], atol=1e-4)